@@ -0,0 +1,160 @@
+from fastapi import APIRouter, Form, HTTPException, Request, Depends
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+import zipfile
+from typing import List, Optional
+
+from api.tools import TOOLS, run_tool, validate_params
+from core.config import BATCH_MAX_FILES
+from core.utils import cleanup_file, cleanup_dir
+from core.timing import span
+from core.metrics import observe_pages
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, batch_input_files
+from core.scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+UPLOAD_DIR = "uploads"
+OUTPUT_DIR = "outputs"
+
+
+def run_batch_item(tool: str, input_path: str, output_dir: str, stem: str, params: dict) -> dict:
+    """Runs one file of a batch inside a pool process and reports its outputs and timing."""
+    start = time.perf_counter()
+    outputs = run_tool(tool, input_path, output_dir, stem, params)
+    return {
+        "outputs": outputs,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+@router.post("/{tool}")
+async def batch_convert(
+    tool: str,
+    request: Request,
+    files: List[InputFile] = Depends(batch_input_files),
+    password: Optional[str] = Form(None),
+    pages: Optional[str] = Form(None),
+    merge: bool = Form(True),
+    skip_blank: bool = Form(False),
+):
+    """
+    Runs one tool over many files in parallel and returns a ZIP with every result
+    plus a manifest.json describing the outcome of each input file.
+    """
+    if tool not in TOOLS:
+        raise HTTPException(status_code=404, detail=f"Unknown batch tool: {tool}")
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded.")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. The limit is {BATCH_MAX_FILES} per batch.")
+
+    params = {"password": password, "pages": pages, "merge": merge, "skip_blank": skip_blank}
+    try:
+        validate_params(tool, params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    extension, _ = TOOLS[tool]
+
+    batch_id = uuid.uuid4().hex
+    work_in = os.path.join(UPLOAD_DIR, f"batch_{batch_id}")
+    work_out = os.path.join(OUTPUT_DIR, f"batch_{batch_id}")
+    os.makedirs(work_in, exist_ok=True)
+    os.makedirs(work_out, exist_ok=True)
+
+    zip_filename = f"batch_{tool}.zip"
+    zip_path = os.path.join(OUTPUT_DIR, f"batch_{batch_id}.zip")
+
+    try:
+        manifest = []
+        pending = []
+        item_pages = {}
+
+        for index, file in enumerate(files):
+            entry = {"index": index, "filename": file.filename, "status": "pending"}
+            manifest.append(entry)
+
+            if not file.filename.lower().endswith(extension):
+                entry["status"] = "error"
+                entry["error"] = f"Invalid file type. Expected {extension}."
+                continue
+            if file.preflight_error is not None:
+                entry["status"] = "error"
+                entry["error"] = file.preflight_error.detail
+                continue
+
+            # Each input gets its own folder so equal filenames never collide
+            input_path = os.path.join(work_in, f"{index}_{os.path.basename(file.filename)}")
+            with span("save"):
+                file.save(input_path)
+            entry["input_bytes"] = os.path.getsize(input_path)
+            item_pages[index] = (file.preflight or {}).get("pages") or 0
+
+            stem = os.path.splitext(os.path.basename(file.filename))[0]
+            output_dir = os.path.join(work_out, str(index))
+            estimate = get_scheduler().estimate(tool, input_path, file.preflight)
+            pending.append((entry, get_scheduler().run(estimate, run_batch_item, tool, input_path, output_dir, stem, params)))
+
+        with span("convert"):
+            results = await asyncio.gather(*(job for _, job in pending), return_exceptions=True)
+
+        used_names = set()
+        # The items ran in pool processes, where observe_pages() has no request
+        # to record into, so the pages of the items that succeeded come from preflight
+        pages = 0
+        with span("zip"), zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+            for (entry, _), result in zip(pending, results):
+                if isinstance(result, BaseException):
+                    entry["status"] = "error"
+                    entry["error"] = str(result) or result.__class__.__name__
+                    continue
+
+                entry["status"] = "ok"
+                pages += item_pages[entry["index"]]
+                entry["duration_ms"] = result["duration_ms"]
+                entry["outputs"] = []
+                entry["output_bytes"] = 0
+                for output_path in result["outputs"]:
+                    arcname = os.path.basename(output_path)
+                    if arcname in used_names:
+                        arcname = f"{entry['index']}_{arcname}"
+                    used_names.add(arcname)
+                    zipf.write(output_path, arcname)
+                    entry["outputs"].append(arcname)
+                    entry["output_bytes"] += os.path.getsize(output_path)
+
+            zipf.writestr("manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False))
+
+        observe_pages(pages)
+        succeeded = sum(1 for entry in manifest if entry["status"] == "ok")
+        if succeeded == 0:
+            cleanup_file(zip_path)
+            raise HTTPException(status_code=422, detail=manifest)
+
+        return serve_result(
+            request,
+            retain_result(zip_path, "application/zip", zip_filename),
+            headers={
+                "X-Batch-Succeeded": str(succeeded),
+                "X-Batch-Failed": str(len(manifest) - succeeded),
+            },
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch error: {e}")
+        cleanup_file(zip_path)
+        raise HTTPException(status_code=500, detail=f"Batch failed: {str(e)}")
+
+    finally:
+        cleanup_dir(work_in)
+        cleanup_dir(work_out)
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Form, HTTPException, Request, Depends
 import os
-import shutil
 import io
 import logging
 
-import fitz  # PyMuPDF
-from PIL import Image
-
+from core.blank import blank_pages
+from core.config import COMPRESS_MEMORY_BUDGET, RENDER_MAX_PIXELS
 from core.utils import cleanup_file
+from core.metrics import observe_pages
+from core.timing import span
+from core.results import retain_result, serve_result
+from core.quality import current_tier
+from core.render import render_rgb
+from core.uploads import InputFile, input_file
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -16,13 +21,123 @@ UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 
 
+# parâmetros de compressão
+TARGET_DPI = 72          # 72 dpi ≈ resolução de tela, já reduz bem
+JPEG_QUALITY = 70        # 0–100 (60 = bem comprimido, ainda legível)
+JPEG_RATIO_ESTIMATE = 8  # bitmap RGB / JPEG, estimativa conservadora pro orçamento de memória
+
+
+def _compress_page(page, dst_doc, dpi: int, quality: int, optimize: bool):
+    """Acrescenta a dst_doc uma página só com a imagem JPEG de `page`."""
+    # renderiza a página como bitmap RGB (sem alpha); páginas gigantes têm o
+    # DPI reduzido e são renderizadas em faixas (core.render)
+    # 72 pontos = 1 polegada; usamos isso pra controlar DPI
+    img = render_rgb(page, dpi / 72.0)
+
+    with span("encode"):
+        # exporta como JPEG comprimido em memória
+        img_buf = io.BytesIO()
+        img.save(
+            img_buf,
+            format="JPEG",
+            quality=quality,
+            optimize=optimize,
+        )
+        img.close()
+        img_bytes = img_buf.getvalue()
+        img_buf.close()
+
+    # cria nova página com o MESMO tamanho em pontos do original
+    new_page = dst_doc.new_page(
+        width=page.rect.width,
+        height=page.rect.height,
+    )
+
+    # coloca a imagem ocupando a página inteira
+    new_page.insert_image(new_page.rect, stream=img_bytes)
+
+
+def window_size(src_doc, dpi: int, memory_budget: int) -> int:
+    """
+    Quantas páginas comprimidas cabem em memory_budget bytes: um bitmap RGB
+    (mais a cópia PIL) por vez, mais os JPEGs da janela até serem gravados.
+    """
+    if not len(src_doc):
+        return 1
+    rect = src_doc[0].rect
+    pixmap_bytes = min((rect.width * dpi / 72) * (rect.height * dpi / 72), RENDER_MAX_PIXELS) * 3
+    jpeg_bytes = pixmap_bytes / JPEG_RATIO_ESTIMATE
+    return max(1, int((memory_budget - 2 * pixmap_bytes) // jpeg_bytes))
+
+
+def compress_file(input_path: str, output_path: str, dpi: int = TARGET_DPI, quality: int = JPEG_QUALITY, progress=None,
+                  optimize: bool = True, memory_budget: int = COMPRESS_MEMORY_BUDGET, skip_blank: bool = False):
+    """
+    Comprime input_path e grava o resultado em output_path com memória limitada
+    (ver compress_open_document).
+    Com skip_blank, páginas em branco (core.blank) nem chegam a ser renderizadas.
+    """
+    import fitz  # PyMuPDF
+
+    with span("parse"):
+        src_doc = fitz.open(input_path)
+    observe_pages(len(src_doc))
+
+    try:
+        compress_open_document(src_doc, output_path, dpi, quality, progress, optimize, memory_budget, skip_blank)
+    finally:
+        src_doc.close()
+
+
+def compress_open_document(src_doc, output_path: str, dpi: int = TARGET_DPI, quality: int = JPEG_QUALITY, progress=None,
+                           optimize: bool = True, memory_budget: int = COMPRESS_MEMORY_BUDGET, skip_blank: bool = False):
+    """
+    Comprime um documento já aberto (o upload em compress_file, o documento em
+    memória no pipeline) para output_path: as páginas são processadas em janelas
+    que cabem em memory_budget bytes, e cada janela é anexada ao arquivo
+    (gravação incremental) e liberada antes da próxima, então o pico de memória
+    não cresce com o número de páginas.
+    """
+    import fitz  # PyMuPDF
+
+    pages = list(range(len(src_doc)))
+    if skip_blank:
+        blank = set(blank_pages(src_doc))
+        pages = [page_index for page_index in pages if page_index not in blank]
+        if not pages:
+            raise ValueError("Every page of the PDF is blank.")
+
+    window = window_size(src_doc, dpi, memory_budget)
+    for start in range(0, max(len(pages), 1), window):
+        # a primeira janela cria o arquivo, as seguintes são anexadas a ele
+        dst_doc = fitz.open() if start == 0 else fitz.open(output_path)
+        try:
+            for done, page_index in enumerate(pages[start:start + window], start=start + 1):
+                _compress_page(src_doc[page_index], dst_doc, dpi, quality, optimize)
+                # cada página é renderizada uma vez só: as imagens decodificadas
+                # que o MuPDF guarda em cache não servem pra próxima
+                fitz.TOOLS.store_shrink(100)
+                if progress:
+                    progress(done, len(pages))
+
+            # salva o PDF comprimido (sem fallback pro original)
+            with span("write"):
+                if start == 0:
+                    dst_doc.save(output_path)
+                else:
+                    dst_doc.saveIncr()
+        finally:
+            dst_doc.close()
+
+
 @router.post("/compress-pdf")
-async def compress_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def compress_pdf(request: Request, file: InputFile = Depends(input_file), skip_blank: bool = Form(False)):
     """
     Compressão "à prova de bug":
     - Renderiza cada página como imagem
     - Reduz DPI e aplica JPEG
     - Reconstrói um novo PDF só com essas imagens
+    - skip_blank: descarta as páginas em branco antes de renderizar
     """
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(
@@ -37,75 +152,36 @@ async def compress_pdf(background_tasks: BackgroundTasks, file: UploadFile = Fil
     output_filename = f"compressed_{file.filename}"
     output_path = os.path.join(OUTPUT_DIR, output_filename)
 
-    # parâmetros de compressão
-    TARGET_DPI = 72          # 72 dpi ≈ resolução de tela, já reduz bem
-    JPEG_QUALITY = 70        # 0–100 (60 = bem comprimido, ainda legível)
-
     try:
         # salva upload
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with span("save"):
+            file.save(input_path)
 
         original_size = os.path.getsize(input_path)
-        logging.info(f"[PDF COMPRESS] Original size: {original_size} bytes")
-
-        # abre PDF de origem
-        src_doc = fitz.open(input_path)
-        dst_doc = fitz.open()  # novo PDF
-
-        # 72 pontos = 1 polegada; usamos isso pra controlar DPI
-        zoom = TARGET_DPI / 72.0
-        matrix = fitz.Matrix(zoom, zoom)
-
-        for page_index in range(len(src_doc)):
-            page = src_doc[page_index]
-
-            # renderiza a página como bitmap (sem alpha)
-            pix = page.get_pixmap(matrix=matrix, alpha=False)
-
-            # PyMuPDF -> PIL
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-
-            # exporta como JPEG comprimido em memória
-            img_buf = io.BytesIO()
-            img.save(
-                img_buf,
-                format="JPEG",
-                quality=JPEG_QUALITY,
-                optimize=True,
-            )
-            img_bytes = img_buf.getvalue()
-
-            # cria nova página com o MESMO tamanho em pontos do original
-            new_page = dst_doc.new_page(
-                width=page.rect.width,
-                height=page.rect.height,
-            )
-
-            # coloca a imagem ocupando a página inteira
-            new_page.insert_image(new_page.rect, stream=img_bytes)
-
-        # salva o PDF comprimido (sem fallback pro original)
-        dst_doc.save(output_path)
-        dst_doc.close()
-        src_doc.close()
+        logger.info(f"[PDF COMPRESS] Original size: {original_size} bytes")
+
+        # Sob carga alta a resolução e o esforço do encoder caem (core.quality)
+        tier = current_tier()
+        compress_file(
+            input_path, output_path,
+            dpi=round(tier.zoom(TARGET_DPI)),
+            quality=tier.jpeg_quality(JPEG_QUALITY),
+            optimize=tier.optimize,
+            skip_blank=skip_blank,
+        )
 
         compressed_size = os.path.getsize(output_path)
-        logging.info(
+        logger.info(
             f"[PDF COMPRESS] Compressed size: {compressed_size} bytes "
             f"({compressed_size / original_size:.2%} do original)"
         )
 
-        background_tasks.add_task(cleanup_file, output_path)
-
-        return FileResponse(
-            output_path,
-            media_type="application/pdf",
-            filename=output_filename,
-        )
+        return serve_result(request, retain_result(output_path, "application/pdf", output_filename), headers=tier.headers)
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logging.error(f"[PDF COMPRESS] Fatal error: {e}")
+        logger.error(f"[PDF COMPRESS] Fatal error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
     finally:
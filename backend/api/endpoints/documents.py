@@ -0,0 +1,135 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from starlette.concurrency import run_in_threadpool
+import logging
+import os
+import uuid
+from typing import Optional
+
+from core.documents import delete_document, purge_documents, read_document, render_preview, store_document
+from core.metrics import observe_pages
+from core.text_index import forget_index, get_index, tokenize
+from core.timing import span
+from core.uploads import InputFile, input_file
+from core.utils import cleanup_file
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+UPLOAD_DIR = "uploads"
+
+PREVIEW_SCALE = 1.0
+SEARCH_LIMIT = 200
+
+
+def get_document_or_404(document_id: str) -> dict:
+    state = read_document(document_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    return state
+
+
+def get_pdf_or_400(document_id: str) -> dict:
+    state = get_document_or_404(document_id)
+    if state["preflight"].get("kind") != "pdf":
+        raise HTTPException(status_code=400, detail="This is only available for PDFs.")
+    return state
+
+
+def check_query(query: str):
+    if not tokenize(query):
+        raise HTTPException(status_code=400, detail="The query has no searchable words.")
+
+
+def describe(state: dict) -> dict:
+    return {
+        "document_id": state["id"],
+        "filename": state["filename"],
+        "size": state["size"],
+        "pages": state["preflight"].get("pages"),
+        "preflight": state["preflight"],
+    }
+
+
+@router.post("", status_code=201)
+def upload_document(response: Response, file: InputFile = Depends(input_file)):
+    """
+    Stores a file once and returns its document_id (the SHA-256 of its content),
+    which any tool endpoint accepts instead of `file`. Sending the same bytes
+    again returns the existing document with 200.
+    """
+    purge_documents()
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    input_path = os.path.join(UPLOAD_DIR, f"document_in_{uuid.uuid4().hex}")
+    try:
+        with span("save"):
+            file.save(input_path)
+        state, created = store_document(input_path, file.filename, file.preflight)
+    except Exception as e:
+        logger.exception(f"Document store error: {e}")
+        raise HTTPException(status_code=500, detail=f"Could not store the file: {str(e)}")
+    finally:
+        cleanup_file(input_path)
+
+    if created:
+        observe_pages(state["preflight"].get("pages") or 0)
+    else:
+        response.status_code = 200
+    return describe(state)
+
+
+@router.get("/{document_id}")
+def document_status(document_id: str):
+    return describe(get_document_or_404(document_id))
+
+
+@router.get("/{document_id}/search")
+async def search_document(document_id: str, q: str, prefix: bool = False, limit: int = SEARCH_LIMIT):
+    """
+    Pages of a stored PDF that contain q (a word or phrase; case and accents
+    are ignored) and the rectangles of the first `limit` hits, in points. With
+    prefix=true the last word also matches longer words ("fatur" finds
+    "faturação"). The first search builds the document's text index; later ones
+    reuse it.
+    """
+    state = get_pdf_or_400(document_id)
+    check_query(q)
+    if not 0 <= limit <= 10000:
+        raise HTTPException(status_code=400, detail="Limit must be between 0 and 10000.")
+    index = await get_index(document_id, state["preflight"]["pages"])
+    with span("search"):
+        return {"document_id": document_id, "query": q, **index.search(q, prefix, limit)}
+
+
+@router.get("/{document_id}/pages/{page_index}/preview")
+async def page_preview(
+    document_id: str, page_index: int, scale: float = PREVIEW_SCALE,
+    highlight: Optional[str] = None, prefix: bool = False,
+):
+    """
+    PNG of one page of a stored PDF, rendered from the worker's cached handle.
+    `highlight` tints the hits of that search on the page.
+    """
+    if not 0.1 <= scale <= 4:
+        raise HTTPException(status_code=400, detail="Scale must be between 0.1 and 4.")
+    state = get_pdf_or_400(document_id)
+    rects = []
+    if highlight:
+        check_query(highlight)
+        index = await get_index(document_id, state["preflight"]["pages"])
+        rects = index.page_rects(page_index, highlight, prefix)
+    try:
+        png = await run_in_threadpool(render_preview, document_id, page_index, scale, rects)
+    except IndexError:
+        raise HTTPException(status_code=404, detail=f"Page {page_index} does not exist.")
+    # The content never changes under this id
+    return Response(content=png, media_type="image/png", headers={"Cache-Control": "private, max-age=3600"})
+
+
+@router.delete("/{document_id}", status_code=204)
+def remove_document(document_id: str):
+    get_document_or_404(document_id)
+    delete_document(document_id)
+    forget_index(document_id)
+    return Response(status_code=204)
@@ -1,14 +1,23 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Depends
 import os
-import fitz  # PyMuPDF
+import logging
+import hashlib
 import json
+import math
+import sys
+from collections import defaultdict
 from typing import List, Optional
-from pydantic import BaseModel, Json
+from pydantic import BaseModel, Json, model_validator
 import io
 from PIL import Image
 from core.utils import cleanup_file
+from core.timing import span
+from core.metrics import observe_pages
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_file
+from api.endpoints.split import parse_page_range
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -45,21 +54,276 @@ class RectangleEdit(BaseModel):
     color: str = "#FFFFFF" # Default white for eraser
     fill: bool = True
 
+class StampEdit(BaseModel):
+    """A text or uploaded image repeated on many pages (watermark, logo, "CONFIDENTIAL")."""
+    id: str
+    pages: str = "all"  # "all" or a 1-based range like "1-3,5", as in split
+    text: Optional[str] = None
+    fileIndex: Optional[int] = None  # an uploaded image instead of text
+    x: float = 0.1
+    y: float = 0.4
+    width: float = 0.8
+    height: float = 0.2
+    color: str = "#FF0000"
+    opacity: float = 0.3
+    rotation: float = 0  # degrees, counter-clockwise
+
+    @model_validator(mode="after")
+    def _check(self):
+        if (self.text is None) == (self.fileIndex is None):
+            raise ValueError("A stamp needs either 'text' or 'fileIndex'.")
+        if not 0 <= self.opacity <= 1:
+            raise ValueError("Stamp opacity must be between 0 and 1.")
+        if self.width <= 0 or self.height <= 0:
+            raise ValueError("Stamp width and height must be positive.")
+        if self.pages.strip().lower() != "all":
+            # The same parser that applies the stamp (and split's), with no page
+            # count yet: a range that selects nothing is what split calls invalid
+            try:
+                valid = bool(parse_page_range(self.pages, sys.maxsize))
+            except ValueError:
+                valid = False
+            if not valid:
+                raise ValueError(f"Invalid page range: {self.pages!r}.")
+        return self
+
 class EditOperations(BaseModel):
     texts: List[TextEdit] = []
     images: List[ImageEdit] = []
     rectangles: List[RectangleEdit] = []
+    stamps: List[StampEdit] = []
+
+def _hex_to_rgb(value: str, default):
+    if value.startswith("#") and len(value) == 7:
+        return tuple(int(value[i:i + 2], 16) / 255 for i in (1, 3, 5))
+    return default
+
+def draw_rectangle(page, rect_op: RectangleEdit):
+    """Draws a rectangle (eraser/shape); coordinates are fractions of the page size."""
+    import fitz  # PyMuPDF
+
+    rect_page = page.rect
+    x = rect_op.x * rect_page.width
+    y = rect_op.y * rect_page.height
+    w = rect_op.width * rect_page.width
+    h = rect_op.height * rect_page.height
+
+    color = _hex_to_rgb(rect_op.color, (1, 1, 1))  # Default white
+    shape = page.new_shape()
+    shape.draw_rect(fitz.Rect(x, y, x + w, y + h))
+    if rect_op.fill:
+        shape.finish(color=color, fill=color)
+    else:
+        shape.finish(color=color)
+    shape.commit()
+
+def draw_text(page, text_op: TextEdit):
+    rect = page.rect
+    pos_x = text_op.x * rect.width
+    pos_y = text_op.y * rect.height
+    page.insert_text(
+        (pos_x, pos_y + text_op.fontSize),
+        text_op.text,
+        fontsize=text_op.fontSize,
+        color=_hex_to_rgb(text_op.color, (0, 0, 0)),
+        fontname="helv"
+    )
+
+def draw_image(page, img_op: ImageEdit, img_bytes: Optional[bytes] = None, xref: int = 0) -> int:
+    """
+    Places an image on the page and returns its xref. Pass the xref of an image
+    already in the document instead of img_bytes to reuse it (no second copy).
+    """
+    import fitz  # PyMuPDF
+
+    rect = page.rect
+    x = img_op.x * rect.width
+    y = img_op.y * rect.height
+    w = img_op.width * rect.width
+    h = img_op.height * rect.height
+    return page.insert_image(fitz.Rect(x, y, x + w, y + h), stream=img_bytes, xref=xref)
+
+def stamp_page_indexes(stamp: StampEdit, page_count: int) -> List[int]:
+    if stamp.pages.strip().lower() == "all":
+        return list(range(page_count))
+    return parse_page_range(stamp.pages, page_count)
+
+def build_stamp(doc, stamp: StampEdit, width: float, height: float, img_bytes: Optional[bytes] = None) -> int:
+    """
+    Draws the stamp once, on a scratch page of width x height points, and turns
+    it into a form XObject of doc. Returns its xref.
+    """
+    import fitz  # PyMuPDF
+
+    scratch = doc.new_page(width=width, height=height)
+    try:
+        if stamp.text is not None:
+            # Largest font size at which the text fits the box
+            length = fitz.get_text_length(stamp.text, "helv", 1)
+            font_size = min(0.95 * width / max(length, 1e-6), 0.8 * height)
+            scratch.insert_text(
+                ((width - length * font_size) / 2, (height + 0.7 * font_size) / 2),
+                stamp.text,
+                fontsize=font_size,
+                color=_hex_to_rgb(stamp.color, (1, 0, 0)),
+                fontname="helv",
+            )
+        else:
+            scratch.insert_image(scratch.rect, stream=img_bytes)
+
+        resources = int(doc.xref_get_key(scratch.xref, "Resources")[1].split()[0])
+        doc.xref_set_key(resources, "ExtGState/KPStampAlpha", f"<</ca {stamp.opacity:g}/CA {stamp.opacity:g}>>")
+        form = doc.get_new_xref()
+        doc.update_object(form, f"<</Type/XObject/Subtype/Form/BBox[0 0 {width:g} {height:g}]/Resources {resources} 0 R>>")
+        doc.update_stream(form, b"/KPStampAlpha gs\n" + scratch.read_contents())
+        return form
+    finally:
+        doc.delete_page(scratch.number)
+
+def _add_xobject(doc, page, name: str, xref: int):
+    """Adds /name -> xref to the page's /XObject resources, wherever they live."""
+    owner, kind, value = page.xref, *doc.xref_get_key(page.xref, "Resources")
+    while kind == "null":
+        # Inherited from the page tree: give the page its own entry first
+        parent_kind, parent = doc.xref_get_key(owner, "Parent")
+        if parent_kind != "xref":
+            kind, value = "dict", "<<>>"
+            break
+        owner = int(parent.split()[0])
+        kind, value = doc.xref_get_key(owner, "Resources")
+    if owner != page.xref:
+        doc.xref_set_key(page.xref, "Resources", value)
+
+    if kind == "xref":
+        target, prefix = int(value.split()[0]), ""
+    else:
+        target, prefix = page.xref, "Resources/"
+    kind, value = doc.xref_get_key(target, prefix + "XObject")
+    if kind == "xref":
+        target, prefix = int(value.split()[0]), ""
+    else:
+        prefix += "XObject/"
+    doc.xref_set_key(target, prefix + name, f"{xref} 0 R")
+
+def _new_stream(doc, content: bytes) -> int:
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.update_stream(xref, content)
+    return xref
+
+def place_stamp(doc, page, stamp: StampEdit, form: int, form_size, streams: dict):
+    """
+    Shows the stamp's form XObject on the page, fitted (rotated, proportions
+    kept) into the stamp's box. Pages with the same geometry share one content
+    stream, kept in `streams`, so each page only gains two references.
+    """
+    import fitz  # PyMuPDF
+
+    width, height = form_size
+    rect = page.rect
+    box = fitz.Rect(
+        rect.x0 + stamp.x * rect.width, rect.y0 + stamp.y * rect.height,
+        rect.x0 + (stamp.x + stamp.width) * rect.width, rect.y0 + (stamp.y + stamp.height) * rect.height,
+    )
+    angle = math.radians(stamp.rotation)
+    rotated_w = abs(width * math.cos(angle)) + abs(height * math.sin(angle))
+    rotated_h = abs(width * math.sin(angle)) + abs(height * math.cos(angle))
+    scale = min(box.width / rotated_w, box.height / rotated_h)
+
+    # Form space (y up, origin at its corner) -> centred and y down -> rotated
+    # (counter-clockwise as seen) -> scaled into the box -> PDF space of this page
+    matrix = (
+        fitz.Matrix(1, 0, 0, -1, -width / 2, height / 2)
+        * fitz.Matrix(-stamp.rotation)
+        * fitz.Matrix(scale, scale)
+        * fitz.Matrix(1, 0, 0, 1, (box.x0 + box.x1) / 2, (box.y0 + box.y1) / 2)
+        * page.derotation_matrix
+        * ~page.transformation_matrix
+    )
+    name = f"KPStamp{form}"
+    key = (name, tuple(round(value, 4) for value in matrix))
+    if key not in streams:
+        # The page's own content is wrapped in q ... Q so no state it leaves
+        # behind (a transformation, a clip) applies to the stamp
+        if "q" not in streams:
+            streams["q"] = _new_stream(doc, b"q\n")
+        streams[key] = _new_stream(doc, "Q\nq {:g} {:g} {:g} {:g} {:g} {:g} cm /{} Do Q\n".format(*key[1], name).encode())
+
+    _add_xobject(doc, page, name, form)
+    contents = [streams["q"]] + page.get_contents() + [streams[key]]
+    doc.xref_set_key(page.xref, "Contents", "[" + " ".join(f"{xref} 0 R" for xref in contents) + "]")
+
+def apply_edits(doc, edits_model: EditOperations, loaded_images: List[bytes]):
+    """
+    Stamps rectangles, texts and images from edits_model onto the open document.
+    Operations are grouped by page, so each page is loaded once, and each
+    distinct image is embedded once and placed again by xref everywhere else.
+    A stamp is drawn once as a form XObject that every page it covers refers to.
+    """
+    by_page = defaultdict(lambda: ([], [], [], []))
+    for rect_op in edits_model.rectangles:
+        if 0 <= rect_op.pageIndex < len(doc):
+            by_page[rect_op.pageIndex][0].append(rect_op)
+    for text_op in edits_model.texts:
+        if 0 <= text_op.pageIndex < len(doc):
+            by_page[text_op.pageIndex][1].append(text_op)
+    for img_op in edits_model.images:
+        if 0 <= img_op.pageIndex < len(doc) and 0 <= img_op.fileIndex < len(loaded_images):
+            by_page[img_op.pageIndex][2].append(img_op)
+
+    # Stamps are built before any page is visited (the scratch page shifts nothing)
+    stamps = []
+    for stamp in edits_model.stamps:
+        if stamp.fileIndex is not None and not 0 <= stamp.fileIndex < len(loaded_images):
+            continue
+        indexes = stamp_page_indexes(stamp, len(doc))
+        if not indexes:
+            continue
+        rect = doc[indexes[0]].rect
+        size = (stamp.width * rect.width, stamp.height * rect.height)
+        img_bytes = loaded_images[stamp.fileIndex] if stamp.fileIndex is not None else None
+        stamps.append((stamp, build_stamp(doc, stamp, *size, img_bytes), size))
+        for page_index in indexes:
+            by_page[page_index][3].append(len(stamps) - 1)
+
+    # The same upload sent twice (e.g. a logo per page) still gets one image object
+    digests = {}
+    image_xrefs = {}
+    stamp_streams = {}
+
+    for page_index in sorted(by_page):
+        rect_ops, text_ops, img_ops, stamp_ops = by_page[page_index]
+        page = doc[page_index]
+
+        # Rectangles (eraser/shapes) first, then texts and images on top, then stamps
+        for rect_op in rect_ops:
+            draw_rectangle(page, rect_op)
+        for text_op in text_ops:
+            draw_text(page, text_op)
+        for img_op in img_ops:
+            if img_op.fileIndex not in digests:
+                digests[img_op.fileIndex] = hashlib.sha256(loaded_images[img_op.fileIndex]).digest()
+            digest = digests[img_op.fileIndex]
+            if digest in image_xrefs:
+                draw_image(page, img_op, xref=image_xrefs[digest])
+            else:
+                image_xrefs[digest] = draw_image(page, img_op, loaded_images[img_op.fileIndex])
+        for stamp_index in stamp_ops:
+            stamp, form, size = stamps[stamp_index]
+            place_stamp(doc, page, stamp, form, size, stamp_streams)
 
 @router.post("/edit-pdf")
 def edit_pdf(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    request: Request,
+    file: InputFile = Depends(input_file),
     edits: str = Form(...),
     image_files: List[UploadFile] = File(default=[])
 ):
     """
     Edits a PDF by stamping text, images, and shapes.
     """
+    import fitz  # PyMuPDF
+
     try:
         edits_data = json.loads(edits)
         edits_model = EditOperations(**edits_data)
@@ -81,8 +345,8 @@ def edit_pdf(
 
     try:
         # Save main PDF
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with span("save"):
+            file.save(input_path)
 
         # Process image files into a list of bytes
         loaded_images = []
@@ -90,93 +354,21 @@ def edit_pdf(
             content = img_file.file.read()
             loaded_images.append(content)
 
-        doc = fitz.open(input_path)
-
-        # Apply Rectangle Edits (Eraser/Shapes)
-        for rect_op in edits_model.rectangles:
-            if 0 <= rect_op.pageIndex < len(doc):
-                page = doc[rect_op.pageIndex]
-                rect_page = page.rect
-                
-                x = rect_op.x * rect_page.width
-                y = rect_op.y * rect_page.height
-                w = rect_op.width * rect_page.width
-                h = rect_op.height * rect_page.height
-                
-                shape_rect = fitz.Rect(x, y, x + w, y + h)
-                
-                # Parse color
-                r, g, b = 1, 1, 1 # Default white
-                if rect_op.color.startswith("#") and len(rect_op.color) == 7:
-                    r = int(rect_op.color[1:3], 16) / 255
-                    g = int(rect_op.color[3:5], 16) / 255
-                    b = int(rect_op.color[5:7], 16) / 255
-                
-                # Draw rectangle
-                shape = page.new_shape()
-                shape.draw_rect(shape_rect)
-                if rect_op.fill:
-                    shape.finish(color=(r, g, b), fill=(r, g, b))
-                else:
-                    shape.finish(color=(r, g, b))
-                shape.commit()
-
-        # Apply Text Edits
-        for text_op in edits_model.texts:
-            if 0 <= text_op.pageIndex < len(doc):
-                page = doc[text_op.pageIndex]
-                
-                rect = page.rect
-                
-                # Calculate position
-                pos_x = text_op.x * rect.width
-                pos_y = text_op.y * rect.height
-                
-                # Parse hex color
-                r, g, b = 0, 0, 0
-                if text_op.color.startswith("#") and len(text_op.color) == 7:
-                    r = int(text_op.color[1:3], 16) / 255
-                    g = int(text_op.color[3:5], 16) / 255
-                    b = int(text_op.color[5:7], 16) / 255
-
-                # Insert Text
-                page.insert_text(
-                    (pos_x, pos_y + text_op.fontSize), 
-                    text_op.text,
-                    fontsize=text_op.fontSize,
-                    color=(r, g, b),
-                    fontname="helv"
-                )
-
-        # Apply Image Edits
-        for img_op in edits_model.images:
-            if 0 <= img_op.pageIndex < len(doc) and 0 <= img_op.fileIndex < len(loaded_images):
-                page = doc[img_op.pageIndex]
-                rect = page.rect
-                
-                img_bytes = loaded_images[img_op.fileIndex]
-                
-                x = img_op.x * rect.width
-                y = img_op.y * rect.height
-                w = img_op.width * rect.width
-                h = img_op.height * rect.height
-                
-                # Define rectangle for image
-                img_rect = fitz.Rect(x, y, x + w, y + h)
-                
-                page.insert_image(img_rect, stream=img_bytes)
-
-        doc.save(output_path)
-        doc.close()
+        with span("parse"):
+            doc = fitz.open(input_path)
+        observe_pages(len(doc))
 
-        background_tasks.add_task(cleanup_file, output_path)
+        with span("edit"):
+            apply_edits(doc, edits_model, loaded_images)
+
+        with span("write"):
+            doc.save(output_path)
+        doc.close()
 
-        return FileResponse(output_path, media_type="application/pdf", filename=output_filename)
+        return serve_result(request, retain_result(output_path, "application/pdf", output_filename))
 
     except Exception as e:
-        print(f"Edit PDF Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Edit PDF Error: {e}")
         raise HTTPException(status_code=500, detail=f"Error editing PDF: {str(e)}")
     
     finally:
@@ -0,0 +1,241 @@
+from fastapi import APIRouter, Body, Depends, File, Form, HTTPException, Request, Response, UploadFile
+import json
+import logging
+import os
+import uuid
+from typing import Optional
+
+from api.endpoints.edit_pdf import ImageEdit, RectangleEdit, TextEdit, draw_image, draw_rectangle, draw_text
+from core.edit_sessions import (
+    SessionNotFound, create_session, delete_session, draw_tracked, export_session, locked_session,
+    purge_expired_sessions, read_session, remove_streams, render_preview,
+)
+from core.metrics import observe_pages
+from core.results import retain_result, serve_result
+from core.timing import span
+from core.uploads import InputFile, input_file
+from core.utils import cleanup_file
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+UPLOAD_DIR = "uploads"
+OUTPUT_DIR = "outputs"
+
+# Same operation shapes as /convert/edit-pdf, tagged with a "type"
+OPERATION_MODELS = {"text": TextEdit, "image": ImageEdit, "rectangle": RectangleEdit}
+
+PREVIEW_SCALE = 1.0
+
+
+def get_session_or_404(session_id: str) -> dict:
+    state = read_session(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Edit session not found.")
+    return state
+
+
+def find_operation(state: dict, operation_id: str) -> dict:
+    for operation in state["operations"]:
+        if operation["id"] == operation_id:
+            return operation
+    raise HTTPException(status_code=404, detail=f"Operation {operation_id} not found.")
+
+
+def public_operation(operation: dict) -> dict:
+    return {"id": operation["id"], "type": operation["type"], **operation["spec"]}
+
+
+def describe(state: dict) -> dict:
+    return {
+        "session_id": state["id"],
+        "filename": state["filename"],
+        "pages": state["pages"],
+        "version": state["version"],
+        "operations": [public_operation(operation) for operation in state["operations"]],
+    }
+
+
+def changed(state: dict, operation: Optional[dict], pages) -> dict:
+    """Response to a delta: the pages to refresh and where to fetch their previews."""
+    pages = sorted(set(pages))
+    return {
+        "session_id": state["id"],
+        "version": state["version"],
+        "operation": public_operation(operation) if operation else None,
+        "pages": pages,
+        "previews": [f"/edit-sessions/{state['id']}/pages/{page}/preview" for page in pages],
+    }
+
+
+def parse_operation(spec: dict):
+    kind = spec.pop("type", None)
+    if kind not in OPERATION_MODELS:
+        raise HTTPException(status_code=422, detail=f"Unknown operation type: {kind}. Use one of {sorted(OPERATION_MODELS)}.")
+    if kind == "image":
+        spec.setdefault("fileIndex", 0)  # the image sent with the operation
+    try:
+        return kind, OPERATION_MODELS[kind](**spec)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Validation error: {e}")
+
+
+def draw_operation(doc, operation: dict, model, image: Optional[bytes] = None):
+    """Draws the operation and records which content streams (and image) it owns."""
+    if not 0 <= model.pageIndex < len(doc):
+        raise HTTPException(status_code=400, detail=f"Page {model.pageIndex} does not exist.")
+
+    def draw(page):
+        if operation["type"] == "text":
+            draw_text(page, model)
+        elif operation["type"] == "rectangle":
+            draw_rectangle(page, model)
+        else:
+            # Moving an image places the same image object again
+            return draw_image(page, model, image, operation.get("image_xref", 0))
+
+    with span("edit"):
+        streams, image_xref = draw_tracked(doc, model.pageIndex, draw)
+    operation.update(page=model.pageIndex, streams=streams, spec=model.model_dump(exclude={"id", "fileIndex"}))
+    if image_xref:
+        operation["image_xref"] = image_xref
+
+
+@router.post("", status_code=201)
+def open_session(file: InputFile = Depends(input_file)):
+    """
+    Opens a PDF for editing. Send changes to /{session_id}/operations one at a
+    time; each is saved incrementally, and only the pages it touched need a new preview.
+    """
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
+
+    purge_expired_sessions()
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    input_path = os.path.join(UPLOAD_DIR, f"session_in_{uuid.uuid4().hex}.pdf")
+    try:
+        with span("save"):
+            file.save(input_path)
+        state = create_session(file.filename, input_path)
+    except Exception as e:
+        logger.exception(f"Edit session error: {e}")
+        raise HTTPException(status_code=400, detail=f"Could not open PDF: {str(e)}")
+    finally:
+        cleanup_file(input_path)
+
+    observe_pages(state["pages"])
+    return describe(state)
+
+
+@router.get("/{session_id}")
+def session_status(session_id: str):
+    return describe(get_session_or_404(session_id))
+
+
+@router.post("/{session_id}/operations", status_code=201)
+def add_operation(
+    session_id: str,
+    operation: str = Form(...),
+    image: Optional[UploadFile] = File(None),
+):
+    """
+    Adds one operation: {"type": "text" | "image" | "rectangle", ...} with the
+    fields of /convert/edit-pdf's texts/images/rectangles. Image operations
+    carry their picture in `image`.
+    """
+    try:
+        spec = json.loads(operation)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=422, detail="Invalid JSON in 'operation' field")
+    kind, model = parse_operation(spec)
+    image_bytes = image.file.read() if image is not None else None
+    if kind == "image" and not image_bytes:
+        raise HTTPException(status_code=422, detail="Image operations need an 'image' file.")
+
+    get_session_or_404(session_id)
+    try:
+        with locked_session(session_id, write=True) as (state, doc):
+            if any(existing["id"] == model.id for existing in state["operations"]):
+                raise HTTPException(status_code=409, detail=f"Operation {model.id} already exists.")
+            entry = {"id": model.id, "type": kind}
+            draw_operation(doc, entry, model, image_bytes)
+            state["operations"].append(entry)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Edit session not found.")
+    return changed(state, entry, [entry["page"]])
+
+
+@router.patch("/{session_id}/operations/{operation_id}")
+def update_operation(session_id: str, operation_id: str, changes: dict = Body(...)):
+    """
+    Moves or changes an operation, e.g. {"x": 0.4, "y": 0.1} or {"pageIndex": 2}.
+    Its old drawing is removed and it is drawn again with the new fields.
+    """
+    get_session_or_404(session_id)
+    try:
+        with locked_session(session_id, write=True) as (state, doc):
+            entry = find_operation(state, operation_id)
+            spec = {**entry["spec"], **changes, "id": entry["id"], "type": entry["type"]}
+            _, model = parse_operation(spec)
+            old_page = entry["page"]
+            with span("edit"):
+                remove_streams(doc, old_page, entry["streams"])
+            draw_operation(doc, entry, model)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Edit session not found.")
+    return changed(state, entry, [old_page, entry["page"]])
+
+
+@router.delete("/{session_id}/operations/{operation_id}")
+def delete_operation(session_id: str, operation_id: str):
+    get_session_or_404(session_id)
+    try:
+        with locked_session(session_id, write=True) as (state, doc):
+            entry = find_operation(state, operation_id)
+            with span("edit"):
+                remove_streams(doc, entry["page"], entry["streams"])
+            state["operations"].remove(entry)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Edit session not found.")
+    return changed(state, None, [entry["page"]])
+
+
+@router.get("/{session_id}/pages/{page_index}/preview")
+def page_preview(session_id: str, page_index: int, scale: float = PREVIEW_SCALE):
+    """PNG of one page as it currently looks; only this page is rendered."""
+    if not 0.1 <= scale <= 4:
+        raise HTTPException(status_code=400, detail="Scale must be between 0.1 and 4.")
+    get_session_or_404(session_id)
+    try:
+        png = render_preview(session_id, page_index, scale)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Edit session not found.")
+    except IndexError:
+        raise HTTPException(status_code=404, detail=f"Page {page_index} does not exist.")
+    return Response(content=png, media_type="image/png", headers={"Cache-Control": "no-store"})
+
+
+@router.post("/{session_id}/export")
+def export(request: Request, session_id: str):
+    """The edited PDF, compacted (dropped drawings removed) and served like any tool result."""
+    state = get_session_or_404(session_id)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_path = os.path.join(OUTPUT_DIR, f"session_{uuid.uuid4().hex}.pdf")
+    try:
+        export_session(session_id, output_path)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Edit session not found.")
+    except Exception as e:
+        cleanup_file(output_path)
+        logger.exception(f"Edit session export error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error exporting PDF: {str(e)}")
+    return serve_result(request, retain_result(output_path, "application/pdf", f"edited_{state['filename']}"))
+
+
+@router.delete("/{session_id}", status_code=204)
+def close_session(session_id: str):
+    get_session_or_404(session_id)
+    delete_session(session_id)
+    return Response(status_code=204)
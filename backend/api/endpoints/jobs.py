@@ -0,0 +1,189 @@
+from fastapi import APIRouter, Form, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+import logging
+import os
+import zipfile
+from typing import Optional
+
+from api.tools import TOOLS, MEDIA_TYPES, run_tool, validate_params
+from core.config import JOB_PROGRESS_INTERVAL
+from core.jobs import (
+    TERMINAL_STATES, ProgressReporter, create_job, job_dir, purge_expired_jobs, read_job, update_job,
+)
+from core.utils import cleanup_file
+from core.timing import span
+from core.results import get_result, result_url, retain_result, serve_result
+from core.uploads import InputFile, input_file
+from core.scheduler import get_scheduler, submit_scheduled
+from core.metrics import observe_pages
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def execute_job(job_id: str, tool: str, input_path: str, stem: str, params: dict):
+    """Runs a job inside a pool process and records its outcome in the job state."""
+    output_dir = os.path.join(job_dir(job_id), "result")
+    try:
+        update_job(job_id, status="running")
+        outputs = run_tool(tool, input_path, output_dir, stem, params, progress=ProgressReporter(job_id))
+
+        if len(outputs) == 1:
+            result_path = outputs[0]
+        else:
+            # e.g. pdf-to-jpg on a multi-page document
+            result_path = os.path.join(job_dir(job_id), f"{stem}_{tool}.zip")
+            with zipfile.ZipFile(result_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+                for output_path in outputs:
+                    zipf.write(output_path, os.path.basename(output_path))
+                    cleanup_file(output_path)
+
+        result = retain_result(
+            result_path,
+            MEDIA_TYPES.get(os.path.splitext(result_path)[1], "application/octet-stream"),
+            os.path.basename(result_path),
+        )
+
+        job = read_job(job_id)
+        progress = job["progress"]
+        if progress["total"]:
+            progress["done"] = progress["total"]
+
+        update_job(job_id, status="done", progress=progress, result_id=result["id"])
+    except Exception as e:
+        logger.error(f"[JOBS] {tool} job {job_id} failed: {e}")
+        update_job(job_id, status="error", error=str(e) or e.__class__.__name__)
+        # Raised on so the scheduler does not record the failure as a duration
+        raise
+    finally:
+        cleanup_file(input_path)
+
+
+def public_view(job: dict) -> dict:
+    view = {
+        "job_id": job["id"],
+        "tool": job["tool"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "estimated_seconds": job.get("estimated_seconds"),
+    }
+    if job["status"] == "done":
+        view["result_url"] = result_url(job["result_id"])
+    return view
+
+
+def get_job_or_404(job_id: str) -> dict:
+    job = read_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@router.post("/{tool}", status_code=202)
+async def submit_job(
+    tool: str,
+    file: InputFile = Depends(input_file),
+    password: Optional[str] = Form(None),
+    pages: Optional[str] = Form(None),
+    merge: bool = Form(True),
+    skip_blank: bool = Form(False),
+):
+    """
+    Queues a conversion and returns immediately with the job id. The job keeps
+    running in the worker pool even if the client disconnects.
+    """
+    if tool not in TOOLS:
+        raise HTTPException(status_code=404, detail=f"Unknown tool: {tool}")
+
+    extension, _ = TOOLS[tool]
+    if not file.filename.lower().endswith(extension):
+        raise HTTPException(status_code=400, detail=f"Invalid file type. Expected {extension}.")
+
+    params = {"password": password, "pages": pages, "merge": merge, "skip_blank": skip_blank}
+    try:
+        validate_params(tool, params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    purge_expired_jobs()
+
+    job = create_job(tool, file.filename)
+    job_id = job["id"]
+    input_path = os.path.join(job_dir(job_id), f"input{extension}")
+    with span("save"):
+        file.save(input_path)
+
+    stem = os.path.splitext(os.path.basename(file.filename))[0]
+    with span("estimate"):
+        estimate = get_scheduler().estimate(tool, input_path, file.preflight)
+    job = update_job(job_id, estimated_seconds=round(estimate.seconds, 2))
+    # The job runs in the pool after this response, out of reach of observe_pages()
+    observe_pages((file.preflight or {}).get("pages") or 0, in_request=False)
+
+    def on_error(exc):
+        # execute_job has recorded its own errors; this covers the pool itself failing
+        if read_job(job_id)["status"] != "error":
+            update_job(job_id, status="error", error=str(exc) or exc.__class__.__name__)
+
+    submit_scheduled(estimate, execute_job, job_id, tool, input_path, stem, params, on_error=on_error)
+
+    return {
+        **public_view(job),
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+    }
+
+
+@router.get("/{job_id}")
+async def job_status(job_id: str):
+    return public_view(get_job_or_404(job_id))
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events stream with the job state, ending when the job finishes."""
+    get_job_or_404(job_id)
+
+    async def event_stream():
+        last_payload = None
+        while True:
+            job = read_job(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job not found.'})}\n\n"
+                return
+
+            payload = json.dumps(public_view(job))
+            if payload != last_payload:
+                event = job["status"] if job["status"] in TERMINAL_STATES else "progress"
+                yield f"event: {event}\ndata: {payload}\n\n"
+                last_payload = payload
+
+            if job["status"] in TERMINAL_STATES:
+                return
+            await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{job_id}/result")
+async def job_result(job_id: str, request: Request):
+    job = get_job_or_404(job_id)
+    if job["status"] == "error":
+        raise HTTPException(status_code=422, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail="Job is not finished yet.")
+
+    result = get_result(job["result_id"])
+    if result is None:
+        raise HTTPException(status_code=410, detail="Job result has expired.")
+
+    return serve_result(request, result)
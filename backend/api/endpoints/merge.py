@@ -1,18 +1,37 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi import APIRouter, HTTPException, Request, Depends
 import os
-from pypdf import PdfWriter
+import logging
 from core.utils import cleanup_file
+from core.metrics import observe_pages
+from core.timing import span
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_files
 from typing import List
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 
+def merge_files(input_paths: List[str], output_path: str):
+    """Concatenates the PDFs in input_paths, in order, into output_path."""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+
+    with span("parse"):
+        for path in input_paths:
+            writer.append(path)
+
+    observe_pages(len(writer.pages))
+
+    with span("write"), open(output_path, "wb") as f:
+        writer.write(f)
+
 @router.post("/merge-pdf")
-async def merge_pdf(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...)):
+async def merge_pdf(request: Request, files: List[InputFile] = Depends(input_files)):
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded.")
     
@@ -27,33 +46,20 @@ async def merge_pdf(background_tasks: BackgroundTasks, files: List[UploadFile] =
     temp_files = []
 
     try:
-        writer = PdfWriter()
-
         for file in files:
             temp_path = os.path.join(UPLOAD_DIR, f"merge_in_{file.filename}")
             temp_files.append(temp_path)
             
             # Save uploaded file temporarily
-            with open(temp_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Append to writer
-            writer.append(temp_path)
-
-        # Write merged PDF
-        with open(output_path, "wb") as f:
-            writer.write(f)
+            with span("save"):
+                file.save(temp_path)
 
-        background_tasks.add_task(cleanup_file, output_path)
+        merge_files(temp_files, output_path)
 
-        return FileResponse(
-            output_path, 
-            media_type="application/pdf", 
-            filename=merged_filename
-        )
+        return serve_result(request, retain_result(output_path, "application/pdf", merged_filename))
 
     except Exception as e:
-        print(f"Merge error: {e}")
+        logger.error(f"Merge error: {e}")
         raise HTTPException(status_code=500, detail=f"Merge failed: {str(e)}")
     
     finally:
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+
+from core.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("")
+def metrics():
+    """Prometheus scrape endpoint, aggregated over every worker process."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,18 +1,45 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi import APIRouter, HTTPException, Request, Depends
 import os
-import tabula
-import pandas as pd
+import logging
 from core.utils import cleanup_file
+from core.timing import span
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_file
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 
+def pdf_to_excel_file(input_path: str, output_path: str):
+    """Extracts the tables of input_path with tabula and writes them to an .xlsx."""
+    import pandas as pd
+    import tabula
+
+    # Extract tables from PDF using tabula
+    # pages='all' will extract from all pages
+    # multiple_tables=True returns a list of DataFrames
+    with span("extract"):
+        dfs = tabula.read_pdf(input_path, pages='all', multiple_tables=True)
+
+    if not dfs or len(dfs) == 0:
+        raise ValueError("No tables found in the PDF.")
+
+    # Create Excel writer
+    with span("write"), pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        # If single table found, save to single sheet
+        if len(dfs) == 1:
+            dfs[0].to_excel(writer, sheet_name='Sheet1', index=False)
+        else:
+            # Multiple tables - save each to a separate sheet
+            for idx, df in enumerate(dfs):
+                sheet_name = f'Table_{idx+1}'
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+
 @router.post("/pdf-to-excel")
-async def pdf_to_excel(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def pdf_to_excel(request: Request, file: InputFile = Depends(input_file)):
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
 
@@ -22,38 +49,17 @@ async def pdf_to_excel(background_tasks: BackgroundTasks, file: UploadFile = Fil
 
     try:
         # Save uploaded file
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Extract tables from PDF using tabula
-        # pages='all' will extract from all pages
-        # multiple_tables=True returns a list of DataFrames
-        dfs = tabula.read_pdf(input_path, pages='all', multiple_tables=True)
-
-        if not dfs or len(dfs) == 0:
-            raise HTTPException(status_code=400, detail="No tables found in the PDF.")
-
-        # Create Excel writer
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            # If single table found, save to single sheet
-            if len(dfs) == 1:
-                dfs[0].to_excel(writer, sheet_name='Sheet1', index=False)
-            else:
-                # Multiple tables - save each to a separate sheet
-                for idx, df in enumerate(dfs):
-                    sheet_name = f'Table_{idx+1}'
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+        with span("save"):
+            file.save(input_path)
 
-        background_tasks.add_task(cleanup_file, output_path)
+        pdf_to_excel_file(input_path, output_path)
 
-        return FileResponse(
-            output_path, 
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
-            filename=output_filename
-        )
+        return serve_result(request, retain_result(output_path, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", output_filename))
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Conversion error: {e}")
+        logger.error(f"Conversion error: {e}")
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
     
     finally:
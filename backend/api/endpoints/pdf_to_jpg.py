@@ -1,20 +1,117 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi import APIRouter, Form, HTTPException, Request, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 import os
-import fitz  # PyMuPDF
-from PIL import Image
+import json
+import uuid
+import base64
 import zipfile
 import io
+import logging
+import threading
+from urllib.parse import quote
 from core.utils import cleanup_file
+from core.metrics import observe_pages
+from core.timing import span
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_file
+from core.quality import QualityTier, FULL, current_tier
+from core.render import render_rgb
+from core.blank import is_blank_page
+from typing import List
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 
+JPG_ZOOM = 3          # 3x zoom for better quality
+JPG_QUALITY = 95
+
+def render_jpg_pages(pdf_document, zoom: float = JPG_ZOOM, quality: int = JPG_QUALITY, optimize: bool = True,
+                     skip_blank: bool = False):
+    """
+    Yields (page_number, jpg_bytes) for every page of an open document. Pages
+    are rendered one at a time, only when the consumer asks for the next one.
+    With skip_blank, blank pages (core.blank) are skipped before rendering.
+    """
+    total_pages = len(pdf_document)
+    
+    # Convert each page to JPG
+    for page_num in range(total_pages):
+        try:
+            page = pdf_document[page_num]
+            if skip_blank and is_blank_page(page):
+                continue
+            
+            # Render page to an RGB image; oversized pages get a lower zoom
+            # and are rendered in bands (core.render)
+            img = render_rgb(page, zoom)
+            
+            with span("encode"):
+                # Encode as JPG
+                jpg_buffer = io.BytesIO()
+                img.save(jpg_buffer, 'JPEG', quality=quality, optimize=optimize)
+                img.close()
+            
+        except Exception as page_error:
+            logger.error(f"Error converting page {page_num + 1}: {page_error}")
+            raise
+
+        yield page_num + 1, jpg_buffer.getvalue()
+
+def pdf_to_jpg_file(input_path: str, output_dir: str, base_name: str, progress=None, tier: QualityTier = FULL,
+                    skip_blank: bool = False) -> List[str]:
+    """
+    Renders every page of input_path as a JPG in output_dir and returns the image paths.
+    `progress(done, total)` is called after each page; `tier` lowers zoom and encoder effort under load;
+    `skip_blank` leaves blank pages out.
+    """
+    import fitz  # PyMuPDF
+
+    # Open PDF with PyMuPDF
+    with span("parse"):
+        pdf_document = fitz.open(input_path)
+    total_pages = len(pdf_document)
+    observe_pages(total_pages)
+    
+    # Create list to store image paths
+    image_paths = []
+    
+    try:
+        pages = render_jpg_pages(
+            pdf_document, zoom=tier.zoom(JPG_ZOOM), quality=tier.jpeg_quality(JPG_QUALITY), optimize=tier.optimize,
+            skip_blank=skip_blank,
+        )
+        for page_number, jpg_bytes in pages:
+            jpg_path = os.path.join(output_dir, f"{base_name}_page_{page_number}.jpg")
+            with span("write"), open(jpg_path, "wb") as f:
+                f.write(jpg_bytes)
+            image_paths.append(jpg_path)
+            
+            if progress:
+                progress(page_number, total_pages)
+    finally:
+        pdf_document.close()
+    
+    return image_paths
+
+def content_disposition(filename: str, disposition: str = "inline") -> str:
+    """
+    Content-Disposition value for a multipart part, built the way Starlette's
+    FileResponse (serve_result) builds it: RFC 5987 filename* whenever the name
+    needs quoting, so quotes, CR/LF or non-ASCII in an upload's name cannot
+    break the part headers.
+    """
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
 @router.post("/pdf-to-jpg")
-def pdf_to_jpg(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+def pdf_to_jpg(request: Request, file: InputFile = Depends(input_file), skip_blank: bool = Form(False)):
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
 
@@ -27,59 +124,15 @@ def pdf_to_jpg(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
 
     try:
         # Save uploaded file
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with span("save"):
+            file.save(input_path)
 
-        print(f"Converting PDF: {file.filename}")
-        
-        # Open PDF with PyMuPDF
-        pdf_document = fitz.open(input_path)
-        total_pages = len(pdf_document)
-        
-        print(f"PDF has {total_pages} pages")
-        
-        # Create list to store image paths
-        image_paths = []
-        
-        # Convert each page to JPG
-        for page_num in range(total_pages):
-            try:
-                page = pdf_document[page_num]
-                
-                # Render page to image with high quality (3x zoom for better quality)
-                mat = fitz.Matrix(3, 3)  # 3x zoom for better quality
-                pix = page.get_pixmap(matrix=mat)
-                
-                print(f"Page {page_num + 1} rendered: {pix.width}x{pix.height}")
-                
-                # Convert to PIL Image
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
-                
-                # Convert to RGB (remove alpha channel if present)
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'RGBA':
-                        rgb_img.paste(img, mask=img.split()[3])
-                    else:
-                        rgb_img.paste(img)
-                    img = rgb_img
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Save as JPG
-                jpg_path = os.path.join(OUTPUT_DIR, f"{base_name}_page_{page_num + 1}.jpg")
-                img.save(jpg_path, 'JPEG', quality=95, optimize=True)
-                image_paths.append(jpg_path)
-                
-                print(f"Saved JPG: {jpg_path}")
-                
-            except Exception as page_error:
-                print(f"Error converting page {page_num + 1}: {page_error}")
-                raise
-        
-        pdf_document.close()
+        tier = current_tier()
+        image_paths = pdf_to_jpg_file(input_path, OUTPUT_DIR, base_name, tier=tier, skip_blank=skip_blank)
+        total_pages = len(image_paths)
         
+        if not image_paths and skip_blank:
+            raise HTTPException(status_code=400, detail="Every page of the PDF is blank.")
         if not image_paths:
             raise HTTPException(status_code=500, detail="No pages could be converted")
         
@@ -92,24 +145,13 @@ def pdf_to_jpg(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
             if not os.path.exists(output_path):
                 raise HTTPException(status_code=500, detail="Converted file not found")
             
-            file_size = os.path.getsize(output_path)
-            print(f"Returning single JPG: {output_filename} ({file_size} bytes)")
-            
-            background_tasks.add_task(cleanup_file, output_path)
-
-            return FileResponse(
-                output_path,
-                media_type="image/jpeg",
-                filename=output_filename
-            )
+            return serve_result(request, retain_result(output_path, "image/jpeg", output_filename), headers=tier.headers)
         else:
             # Multiple pages - create a ZIP file
             zip_filename = f"{base_name}_images.zip"
             zip_path = os.path.join(OUTPUT_DIR, zip_filename)
             
-            print(f"Creating ZIP with {len(image_paths)} images")
-            
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            with span("zip"), zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
                 for img_path in image_paths:
                     zipf.write(img_path, os.path.basename(img_path))
             
@@ -120,23 +162,12 @@ def pdf_to_jpg(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
                 except:
                     pass
             
-            zip_size = os.path.getsize(zip_path)
-            print(f"Returning ZIP: {zip_filename} ({zip_size} bytes)")
-            
-            background_tasks.add_task(cleanup_file, zip_path)
-
-            return FileResponse(
-                zip_path,
-                media_type="application/zip",
-                filename=zip_filename
-            )
+            return serve_result(request, retain_result(zip_path, "application/zip", zip_filename), headers=tier.headers)
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Conversion error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Conversion error: {e}")
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
     
     finally:
@@ -145,3 +176,123 @@ def pdf_to_jpg(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
             cleanup_file(input_path)
         except:
             pass
+
+
+@router.post("/pdf-to-jpg/stream")
+def pdf_to_jpg_stream(
+    file: InputFile = Depends(input_file),
+    format: str = Form("ndjson"),  # "ndjson" or "multipart"
+    scale: float = Form(JPG_ZOOM),  # lower values give thumbnails
+    skip_blank: bool = Form(False),  # blank pages are not sent
+):
+    """
+    Streams each page as soon as it is encoded instead of waiting for the whole
+    ZIP. The next page is only rendered when the client has consumed the previous
+    one, so a slow reader throttles the rendering.
+
+    - ndjson: one JSON object per line: a "start" line, one "page" line per page
+      with the JPG in base64, and an "end" (or "error") line.
+    - multipart: multipart/mixed with one binary image/jpeg part per page.
+    """
+    import fitz  # PyMuPDF
+
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
+    if format not in ("ndjson", "multipart"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use 'ndjson' or 'multipart'.")
+    if not 0.1 <= scale <= JPG_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Scale must be between 0.1 and {JPG_ZOOM}.")
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    input_path = os.path.join(UPLOAD_DIR, f"jpg_stream_in_{uuid.uuid4().hex}.pdf")
+    base_name = os.path.splitext(file.filename)[0]
+
+    with span("save"):
+        file.save(input_path)
+
+    try:
+        with span("parse"):
+            pdf_document = fitz.open(input_path)
+    except Exception as e:
+        cleanup_file(input_path)
+        raise HTTPException(status_code=400, detail=f"Could not open PDF: {str(e)}")
+
+    total_pages = len(pdf_document)
+    observe_pages(total_pages)
+    tier = current_tier()
+
+    lock = threading.Lock()
+    closed = False
+
+    def close():
+        # Reached from the generator's finally and from the response's background
+        # task (which also runs when the body was never iterated); whichever comes first
+        nonlocal closed
+        with lock:
+            if closed:
+                return
+            closed = True
+            pdf_document.close()
+            cleanup_file(input_path)
+
+    def pages():
+        rendered = render_jpg_pages(
+            pdf_document, zoom=tier.zoom(scale), quality=tier.jpeg_quality(JPG_QUALITY), optimize=tier.optimize,
+            skip_blank=skip_blank,
+        )
+        try:
+            while True:
+                # The document is never closed in the middle of a page
+                with lock:
+                    if closed:
+                        return
+                    page = next(rendered, None)
+                if page is None:
+                    return
+                yield page
+        finally:
+            close()
+
+    if format == "ndjson":
+        def ndjson_stream():
+            yield json.dumps({"type": "start", "filename": file.filename, "pages": total_pages}) + "\n"
+            try:
+                for page_number, jpg_bytes in pages():
+                    yield json.dumps({
+                        "type": "page",
+                        "page": page_number,
+                        "total": total_pages,
+                        "filename": f"{base_name}_page_{page_number}.jpg",
+                        "content_type": "image/jpeg",
+                        "data": base64.b64encode(jpg_bytes).decode("ascii"),
+                    }) + "\n"
+            except Exception as e:
+                yield json.dumps({"type": "error", "detail": f"Conversion failed: {str(e)}"}) + "\n"
+                return
+            yield json.dumps({"type": "end"}) + "\n"
+
+        return StreamingResponse(
+            ndjson_stream(), media_type="application/x-ndjson", headers=tier.headers, background=BackgroundTask(close),
+        )
+
+    boundary = uuid.uuid4().hex
+
+    def multipart_stream():
+        for page_number, jpg_bytes in pages():
+            yield (
+                f"--{boundary}\r\n"
+                f"Content-Type: image/jpeg\r\n"
+                f"Content-Disposition: {content_disposition(f'{base_name}_page_{page_number}.jpg')}\r\n"
+                f"Content-Length: {len(jpg_bytes)}\r\n"
+                f"X-Page: {page_number}\r\n"
+                f"X-Total-Pages: {total_pages}\r\n\r\n"
+            ).encode() + jpg_bytes + b"\r\n"
+        yield f"--{boundary}--\r\n".encode()
+
+    return StreamingResponse(
+        multipart_stream(),
+        media_type=f"multipart/mixed; boundary={boundary}",
+        headers={"X-Total-Pages": str(total_pages), **tier.headers},
+        background=BackgroundTask(close),
+    )
@@ -1,21 +1,81 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi import APIRouter, HTTPException, Request, Depends
 import os
-import fitz  # PyMuPDF
-from pptx import Presentation
-from pptx.util import Inches
+import logging
 from core.utils import cleanup_file
-from PIL import Image
+from core.timing import span
+from core.metrics import observe_pages
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_file
+from core.quality import QualityTier, FULL, current_tier
+from core.render import capped_zoom
 import io
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 
+PPTX_ZOOM = 2  # 2x zoom for better quality
+
+def pdf_to_pptx_file(input_path: str, output_path: str, progress=None, tier: QualityTier = FULL):
+    """
+    Renders every page of input_path onto its own slide and saves the deck to output_path.
+    `progress(done, total)` is called after each page; `tier` lowers the zoom under load.
+    """
+    import fitz  # PyMuPDF
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    # Open PDF with PyMuPDF
+    with span("parse"):
+        pdf_document = fitz.open(input_path)
+    observe_pages(len(pdf_document))
+    
+    # Create PowerPoint presentation
+    prs = Presentation()
+    prs.slide_width = Inches(10)
+    prs.slide_height = Inches(7.5)
+
+    # Convert each PDF page to an image and add to PowerPoint
+    for page_num in range(len(pdf_document)):
+        page = pdf_document[page_num]
+        
+        # Render page to image (matrix for higher resolution)
+        with span("render"):
+            # oversized pages get a lower zoom (core.render)
+            zoom = capped_zoom(page.rect, tier.zoom(PPTX_ZOOM))
+            mat = fitz.Matrix(zoom, zoom)
+            pix = page.get_pixmap(matrix=mat)
+        
+        # Keep the PNG in memory (a shared temp file would collide across parallel conversions)
+        with span("encode"):
+            img_stream = io.BytesIO(pix.tobytes("png"))
+        
+        # Add blank slide
+        blank_slide_layout = prs.slide_layouts[6]  # Blank layout
+        slide = prs.slides.add_slide(blank_slide_layout)
+        
+        # Add image to slide (fill the entire slide)
+        slide.shapes.add_picture(
+            img_stream,
+            0, 0,
+            width=prs.slide_width,
+            height=prs.slide_height
+        )
+
+        if progress:
+            progress(page_num + 1, len(pdf_document))
+
+    pdf_document.close()
+
+    # Save PowerPoint
+    with span("write"):
+        prs.save(output_path)
+
 @router.post("/pdf-to-pptx")
-def pdf_to_pptx(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+def pdf_to_pptx(request: Request, file: InputFile = Depends(input_file)):
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
 
@@ -25,63 +85,16 @@ def pdf_to_pptx(background_tasks: BackgroundTasks, file: UploadFile = File(...))
 
     try:
         # Save uploaded file
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with span("save"):
+            file.save(input_path)
 
-        # Open PDF with PyMuPDF
-        pdf_document = fitz.open(input_path)
-        
-        # Create PowerPoint presentation
-        prs = Presentation()
-        prs.slide_width = Inches(10)
-        prs.slide_height = Inches(7.5)
-
-        # Convert each PDF page to an image and add to PowerPoint
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            
-            # Render page to image (matrix for higher resolution)
-            mat = fitz.Matrix(2, 2)  # 2x zoom for better quality
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to PIL Image
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
-            
-            # Save temporary image
-            temp_img_path = os.path.join(OUTPUT_DIR, f"temp_slide_{page_num}.png")
-            img.save(temp_img_path)
-            
-            # Add blank slide
-            blank_slide_layout = prs.slide_layouts[6]  # Blank layout
-            slide = prs.slides.add_slide(blank_slide_layout)
-            
-            # Add image to slide (fill the entire slide)
-            slide.shapes.add_picture(
-                temp_img_path,
-                0, 0,
-                width=prs.slide_width,
-                height=prs.slide_height
-            )
-            
-            # Clean up temporary image
-            cleanup_file(temp_img_path)
-
-        pdf_document.close()
-
-        # Save PowerPoint
-        prs.save(output_path)
+        tier = current_tier()
+        pdf_to_pptx_file(input_path, output_path, tier=tier)
 
-        background_tasks.add_task(cleanup_file, output_path)
-
-        return FileResponse(
-            output_path, 
-            media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation", 
-            filename=output_filename
-        )
+        return serve_result(request, retain_result(output_path, "application/vnd.openxmlformats-officedocument.presentationml.presentation", output_filename), headers=tier.headers)
 
     except Exception as e:
-        print(f"Conversion error: {e}")
+        logger.error(f"Conversion error: {e}")
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
     
     finally:
@@ -0,0 +1,201 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Depends
+import os
+import json
+import uuid
+import logging
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from api.endpoints.compress import compress_open_document, TARGET_DPI, JPEG_QUALITY
+from api.endpoints.edit_pdf import EditOperations, apply_edits
+from api.endpoints.split import parse_page_range
+from core.blank import remove_blank_pages
+from core.utils import cleanup_file
+from core.timing import span
+from core.metrics import observe_pages
+from core.quality import QualityTier, current_tier
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_files
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+OUTPUT_DIR = "outputs"
+
+class PipelineStep(BaseModel):
+    op: Literal["merge", "edit", "split", "remove-blank", "compress", "protect"]
+    # split
+    pages: Optional[str] = None
+    # compress
+    dpi: int = Field(TARGET_DPI, ge=10, le=600)
+    quality: int = Field(JPEG_QUALITY, ge=1, le=100)
+    # edit
+    edits: Optional[EditOperations] = None
+    # protect
+    password: Optional[str] = None
+
+def validate_steps(steps: List[PipelineStep], file_count: int):
+    """Rejects step lists that cannot run before any document is opened."""
+    if not steps:
+        raise HTTPException(status_code=400, detail="The pipeline needs at least one step.")
+
+    for index, step in enumerate(steps):
+        if step.op == "merge" and index != 0:
+            raise HTTPException(status_code=400, detail="'merge' can only be the first step.")
+        if step.op == "protect":
+            if index != len(steps) - 1:
+                raise HTTPException(status_code=400, detail="'protect' must be the last step.")
+            if not step.password or len(step.password) < 4:
+                raise HTTPException(status_code=400, detail="Password must be at least 4 characters long.")
+        if step.op == "split" and not step.pages:
+            raise HTTPException(status_code=400, detail="'split' needs a 'pages' range.")
+        if step.op == "edit" and step.edits is None:
+            raise HTTPException(status_code=400, detail="'edit' needs an 'edits' object.")
+
+    if file_count > 1 and steps[0].op != "merge":
+        raise HTTPException(status_code=400, detail="Several files were uploaded but the first step is not 'merge'.")
+
+def run_step(doc, step: PipelineStep, others: List, loaded_images: List[bytes], tier: QualityTier, scratch: List[str]):
+    """
+    Applies one step to the open document and returns the document for the next
+    step (the same handle, or a new one for operations that rebuild the file).
+    Files the step leaves on disk are added to scratch.
+    """
+    if step.op == "merge":
+        for other in others:
+            doc.insert_pdf(other)
+        return doc
+
+    if step.op == "edit":
+        apply_edits(doc, step.edits, loaded_images)
+        return doc
+
+    if step.op == "split":
+        try:
+            selected_pages = parse_page_range(step.pages, len(doc))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid page range format.")
+        if not selected_pages:
+            raise HTTPException(status_code=400, detail="No valid pages selected.")
+        doc.select(selected_pages)
+        return doc
+
+    if step.op == "remove-blank":
+        try:
+            remove_blank_pages(doc)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return doc
+
+    if step.op == "compress":
+        import fitz  # PyMuPDF
+
+        # Same windowed, incremental path and quality tier as /compress-pdf, so
+        # memory stays bounded on long scans; later steps read the result from disk
+        path = os.path.join(OUTPUT_DIR, f"pipeline_compressed_{uuid.uuid4().hex}.pdf")
+        scratch.append(path)
+        compress_open_document(
+            doc, path, dpi=round(tier.zoom(step.dpi)), quality=tier.jpeg_quality(step.quality), optimize=tier.optimize,
+        )
+        doc.close()
+        return fitz.open(path)
+
+    # "protect" only changes how the final document is written; see save_options
+    return doc
+
+def save_options(steps: List[PipelineStep]) -> dict:
+    import fitz  # PyMuPDF
+
+    options = {"garbage": 3, "deflate": True}
+    if steps[-1].op == "protect":
+        password = steps[-1].password
+        options.update(
+            encryption=fitz.PDF_ENCRYPT_AES_256,
+            user_pw=password,
+            owner_pw=password,
+        )
+    return options
+
+@router.post("/run")
+def run_pipeline(
+    request: Request,
+    files: List[InputFile] = Depends(input_files),
+    steps: str = Form(...),
+    image_files: List[UploadFile] = File(default=[])
+):
+    """
+    Runs an ordered list of operations (merge, edit, split, remove-blank, compress, protect) on
+    the uploaded PDF(s). The document stays open in memory between steps and is
+    serialized once at the end.
+    """
+    import fitz  # PyMuPDF
+
+    try:
+        step_models = [PipelineStep(**step) for step in json.loads(steps)]
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=422, detail="Invalid JSON in 'steps' field")
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Validation error: {e}")
+
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded.")
+    for file in files:
+        if not file.filename.lower().endswith(".pdf"):
+            raise HTTPException(status_code=400, detail=f"Invalid file type: {file.filename}. Please upload only PDFs.")
+
+    validate_steps(step_models, len(files))
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    base_name = os.path.splitext(files[0].filename)[0]
+    output_filename = f"pipeline_{base_name}.pdf"
+    # Unique on disk so concurrent pipelines never overwrite each other
+    output_path = os.path.join(OUTPUT_DIR, f"pipeline_{uuid.uuid4().hex}.pdf")
+
+    docs = []
+    doc = None
+    scratch = []
+    try:
+        loaded_images = [img_file.file.read() for img_file in image_files]
+
+        # Preflight already spooled and checked each upload; this is the one
+        # parse the steps work on
+        with span("parse"):
+            for file in files:
+                docs.append(fitz.open(stream=file.read(), filetype="pdf"))
+
+        doc = docs[0]
+        tier = current_tier()
+        for step in step_models:
+            logger.info(f"[PIPELINE] {step.op} ({len(doc)} pages)")
+            with span(step.op):
+                doc = run_step(doc, step, docs[1:], loaded_images, tier, scratch)
+
+        observe_pages(len(doc))
+        with span("write"):
+            doc.save(output_path, **save_options(step_models))
+
+        compressed = any(step.op == "compress" for step in step_models)
+        return serve_result(
+            request, retain_result(output_path, "application/pdf", output_filename),
+            headers=tier.headers if compressed else None,
+        )
+
+    except HTTPException:
+        cleanup_file(output_path)
+        raise
+    except Exception as e:
+        logger.error(f"[PIPELINE] Fatal error: {e}")
+        cleanup_file(output_path)
+        raise HTTPException(status_code=500, detail=f"Pipeline failed: {str(e)}")
+
+    finally:
+        if doc is not None and not doc.is_closed:
+            doc.close()
+        for opened in docs:
+            if not opened.is_closed:
+                opened.close()
+        for path in scratch:
+            cleanup_file(path)
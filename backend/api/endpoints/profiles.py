@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+import os
+from typing import Optional
+
+from core.config import PROFILE_ALL_REQUESTS, PROFILE_TOKEN
+from core.profiling import profile_dir, read_summary, token_matches
+
+router = APIRouter()
+
+def check_access(token: Optional[str]):
+    """Profiles expose internals of customer files, so they need the same token that enables profiling."""
+    if not (PROFILE_TOKEN or PROFILE_ALL_REQUESTS):
+        raise HTTPException(status_code=404, detail="Profiling is disabled.")
+    if PROFILE_TOKEN and not token_matches(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token.")
+
+def get_summary_or_404(request_id: str) -> dict:
+    summary = read_summary(request_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return summary
+
+@router.get("/{request_id}")
+async def profile_summary(request_id: str, x_profile_token: Optional[str] = Header(None)):
+    """Peak traced memory and the functions with the highest cumulative time."""
+    check_access(x_profile_token)
+    return get_summary_or_404(request_id)
+
+@router.get("/{request_id}/pstats")
+async def profile_pstats(request_id: str, x_profile_token: Optional[str] = Header(None)):
+    """The raw cProfile data, for `python -m pstats` or snakeviz."""
+    check_access(x_profile_token)
+    get_summary_or_404(request_id)
+    path = os.path.join(profile_dir(request_id), "profile.pstats")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="The request ran no profiled code.")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{request_id}.pstats")
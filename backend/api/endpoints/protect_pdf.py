@@ -1,19 +1,44 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi import APIRouter, HTTPException, Form, Request, Depends
 import os
-import pikepdf
+import logging
 from core.utils import cleanup_file
+from core.metrics import observe_pages
+from core.timing import span
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_file
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 
+def protect_file(input_path: str, output_path: str, password: str):
+    """Encrypts input_path with AES-256 using password and writes it to output_path."""
+    import pikepdf
+
+    # Open the PDF with pikepdf
+    with span("parse"):
+        pdf = pikepdf.open(input_path)
+    with pdf:
+        observe_pages(len(pdf.pages))
+        # Save with password protection
+        # R=6 means AES-256 encryption (most secure)
+        with span("write"):
+            pdf.save(
+                output_path,
+                encryption=pikepdf.Encryption(
+                    user=password,
+                    owner=password,
+                    R=6  # AES-256
+                )
+            )
+
 @router.post("/protect-pdf")
 async def protect_pdf(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    request: Request,
+    file: InputFile = Depends(input_file),
     password: str = Form(...)
 ):
     if not file.filename.endswith(".pdf"):
@@ -32,47 +57,21 @@ async def protect_pdf(
 
     try:
         # Save uploaded file
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with span("save"):
+            file.save(input_path)
 
-        print(f"Protecting PDF: {file.filename} with password")
-        
-        # Open the PDF with pikepdf
-        with pikepdf.open(input_path) as pdf:
-            # Save with password protection
-            # R=6 means AES-256 encryption (most secure)
-            pdf.save(
-                output_path,
-                encryption=pikepdf.Encryption(
-                    user=password,
-                    owner=password,
-                    R=6  # AES-256
-                )
-            )
-        
-        print(f"PDF protected successfully: {output_filename}")
+        protect_file(input_path, output_path, password)
         
         # Check if file was created
         if not os.path.exists(output_path):
             raise HTTPException(status_code=500, detail="Protected file could not be created.")
         
-        file_size = os.path.getsize(output_path)
-        print(f"Protected PDF size: {file_size} bytes")
-        
-        background_tasks.add_task(cleanup_file, output_path)
-
-        return FileResponse(
-            output_path,
-            media_type="application/pdf",
-            filename=output_filename
-        )
+        return serve_result(request, retain_result(output_path, "application/pdf", output_filename))
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Protection error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Protection error: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao proteger: {str(e)}")
     
     finally:
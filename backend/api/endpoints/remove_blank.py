@@ -0,0 +1,80 @@
+from fastapi import APIRouter, HTTPException, Request, Depends
+import os
+import uuid
+import logging
+from typing import List
+from core import blank
+from core.utils import cleanup_file
+from core.metrics import observe_pages
+from core.timing import span
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_file
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+UPLOAD_DIR = "uploads"
+OUTPUT_DIR = "outputs"
+
+def remove_blank_file(input_path: str, output_path: str, progress=None) -> List[int]:
+    """
+    Writes input_path without its blank pages (core.blank) to output_path and
+    returns the removed page numbers (1-based). `progress(done, total)` is called
+    after each page is checked.
+    """
+    import fitz  # PyMuPDF
+
+    with span("parse"):
+        doc = fitz.open(input_path)
+    try:
+        observe_pages(len(doc))
+        removed = blank.remove_blank_pages(doc, progress)
+        # garbage drops the images and fonts only the removed pages used
+        with span("write"):
+            doc.save(output_path, garbage=3, deflate=True)
+        return [page_index + 1 for page_index in removed]
+    finally:
+        doc.close()
+
+@router.post("/remove-blank-pages")
+def remove_blank_pages(request: Request, file: InputFile = Depends(input_file)):
+    """
+    Drops blank pages (empty pages, blank scans, separator sheets). The removed
+    page numbers are sent in X-Removed-Pages.
+    """
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    input_path = os.path.join(UPLOAD_DIR, f"blank_in_{uuid.uuid4().hex}.pdf")
+    output_filename = f"{os.path.splitext(file.filename)[0]}_no_blank.pdf"
+    output_path = os.path.join(OUTPUT_DIR, f"blank_{uuid.uuid4().hex}.pdf")
+
+    try:
+        with span("save"):
+            file.save(input_path)
+
+        try:
+            removed = remove_blank_file(input_path, output_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return serve_result(
+            request,
+            retain_result(output_path, "application/pdf", output_filename),
+            headers={"X-Removed-Pages": ",".join(map(str, removed))},
+        )
+
+    except HTTPException:
+        cleanup_file(output_path)
+        raise
+    except Exception as e:
+        logger.exception(f"Remove blank pages error: {e}")
+        cleanup_file(output_path)
+        raise HTTPException(status_code=500, detail=f"Could not remove blank pages: {str(e)}")
+
+    finally:
+        cleanup_file(input_path)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException, Request
+
+from core.results import get_result, serve_result
+
+router = APIRouter()
+
+@router.get("/{result_id}")
+@router.head("/{result_id}", include_in_schema=False)
+async def download_result(result_id: str, request: Request):
+    """
+    Downloads a retained result. Supports If-None-Match (304) and Range requests,
+    so repeat or interrupted downloads never re-run the conversion.
+    """
+    result = get_result(result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired.")
+    return serve_result(request, result)
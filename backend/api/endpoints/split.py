@@ -1,12 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi import APIRouter, Form, HTTPException, Request, Depends
 import os
 import zipfile
-from pypdf import PdfReader, PdfWriter
+import io
+import logging
+from core.blank import blank_pages
 from core.utils import cleanup_file
+from core.metrics import observe_pages
+from core.timing import span
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_file
 from typing import List
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
@@ -28,12 +34,79 @@ def parse_page_range(range_str: str, max_pages: int) -> List[int]:
     valid_pages = sorted([p for p in pages if 0 <= p < max_pages])
     return valid_pages
 
+def split_file(input_path: str, output_dir: str, base_filename: str, pages: str, merge: bool = True, progress=None,
+               skip_blank: bool = False) -> str:
+    """
+    Extracts the pages selected by `pages` from input_path. Returns the path of a
+    single PDF (merge=True) or of a ZIP with one PDF per page (merge=False).
+    `progress(done, total)` is called after each selected page. With skip_blank,
+    blank pages (core.blank) are left out of the selection.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    with span("parse"):
+        reader = PdfReader(input_path)
+    total_pages = len(reader.pages)
+    observe_pages(total_pages)
+
+    try:
+        selected_pages = parse_page_range(pages, total_pages)
+    except ValueError:
+        raise ValueError("Invalid page range format.")
+
+    if not selected_pages:
+        raise ValueError("No valid pages selected.")
+
+    if skip_blank:
+        import fitz  # PyMuPDF
+
+        with fitz.open(input_path) as doc:
+            blank = set(blank_pages(doc, selected_pages))
+        selected_pages = [page_num for page_num in selected_pages if page_num not in blank]
+        if not selected_pages:
+            raise ValueError("Every selected page is blank.")
+
+    if merge:
+        # Create a single PDF with selected pages
+        writer = PdfWriter()
+        for done, page_num in enumerate(selected_pages, start=1):
+            writer.add_page(reader.pages[page_num])
+            if progress:
+                progress(done, len(selected_pages))
+
+        output_path = os.path.join(output_dir, f"split_{base_filename}.pdf")
+
+        with span("write"), open(output_path, "wb") as f:
+            writer.write(f)
+
+        return output_path
+
+    # Create a ZIP with separate PDFs for each selected page
+    zip_path = os.path.join(output_dir, f"split_{base_filename}.zip")
+
+    with zipfile.ZipFile(zip_path, 'w') as zipf:
+        for done, page_num in enumerate(selected_pages, start=1):
+            writer = PdfWriter()
+            writer.add_page(reader.pages[page_num])
+
+            # Written straight into the archive, no loose per-page files on disk
+            with span("write"):
+                page_buffer = io.BytesIO()
+                writer.write(page_buffer)
+                zipf.writestr(f"{base_filename}_page_{page_num + 1}.pdf", page_buffer.getvalue())
+
+            if progress:
+                progress(done, len(selected_pages))
+
+    return zip_path
+
 @router.post("/split-pdf")
 async def split_pdf(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    request: Request,
+    file: InputFile = Depends(input_file),
     pages: str = Form(...), # e.g., "1-5" or "1,3,5"
-    merge: bool = Form(True) # If True, creates one PDF with selected pages. If False, creates separate PDFs.
+    merge: bool = Form(True), # If True, creates one PDF with selected pages. If False, creates separate PDFs.
+    skip_blank: bool = Form(False) # Leaves blank pages out of the selection
 ):
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
@@ -43,61 +116,21 @@ async def split_pdf(
     
     try:
         # Save uploaded file
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with span("save"):
+            file.save(input_path)
 
-        reader = PdfReader(input_path)
-        total_pages = len(reader.pages)
-        
         try:
-            selected_pages = parse_page_range(pages, total_pages)
-        except ValueError:
-             raise HTTPException(status_code=400, detail="Invalid page range format.")
-
-        if not selected_pages:
-            raise HTTPException(status_code=400, detail="No valid pages selected.")
+            output_path = split_file(input_path, OUTPUT_DIR, base_filename, pages, merge, skip_blank=skip_blank)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        if merge:
-            # Create a single PDF with selected pages
-            writer = PdfWriter()
-            for page_num in selected_pages:
-                writer.add_page(reader.pages[page_num])
-            
-            output_filename = f"split_{base_filename}.pdf"
-            output_path = os.path.join(OUTPUT_DIR, output_filename)
-            
-            with open(output_path, "wb") as f:
-                writer.write(f)
-
-            background_tasks.add_task(cleanup_file, output_path)
-                
-            return FileResponse(output_path, media_type="application/pdf", filename=output_filename)
-        
-        else:
-            # Create a ZIP with separate PDFs for each selected page
-            zip_filename = f"split_{base_filename}.zip"
-            zip_path = os.path.join(OUTPUT_DIR, zip_filename)
-            
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
-                for page_num in selected_pages:
-                    writer = PdfWriter()
-                    writer.add_page(reader.pages[page_num])
-                    
-                    page_pdf_name = f"{base_filename}_page_{page_num + 1}.pdf"
-                    page_pdf_path = os.path.join(OUTPUT_DIR, page_pdf_name)
-                    
-                    with open(page_pdf_path, "wb") as f:
-                        writer.write(f)
-                    
-                    zipf.write(page_pdf_path, page_pdf_name)
-                    os.remove(page_pdf_path) # Clean up individual file after zipping
-            
-            background_tasks.add_task(cleanup_file, zip_path)
-
-            return FileResponse(zip_path, media_type="application/zip", filename=zip_filename)
+        media_type = "application/pdf" if merge else "application/zip"
+        return serve_result(request, retain_result(output_path, media_type, os.path.basename(output_path)))
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Split error: {e}")
+        logger.error(f"Split error: {e}")
         raise HTTPException(status_code=500, detail=f"Split failed: {str(e)}")
     
     finally:
@@ -0,0 +1,114 @@
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import hashlib
+
+from pydantic import BaseModel
+
+from core.config import CHUNKED_UPLOAD_MAX_BYTES, CHUNKED_UPLOAD_CHUNK_SIZE, CHUNKED_UPLOAD_MAX_CHUNK_BYTES
+from core.uploads import (
+    create_upload, delete_upload, finalize_upload, purge_expired_uploads, read_upload,
+    received_ranges, write_chunk,
+)
+
+router = APIRouter()
+
+class UploadInit(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None  # hex digest of the whole file, checked on finalize
+
+def get_upload_or_404(upload_id: str) -> dict:
+    state = read_upload(upload_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return state
+
+def describe(state: dict) -> dict:
+    ranges = received_ranges(state["id"]) if state["status"] != "complete" else [[0, state["size"]]]
+    return {
+        "upload_id": state["id"],
+        "filename": state["filename"],
+        "size": state["size"],
+        "status": state["status"],
+        "sha256": state["sha256"],
+        "received": ranges,
+        "received_bytes": sum(end - start for start, end in ranges),
+        "chunk_size": CHUNKED_UPLOAD_CHUNK_SIZE,
+    }
+
+@router.post("", status_code=201)
+async def initiate_upload(body: UploadInit):
+    """Starts a resumable upload. Send the chunks with PUT, then call /finalize."""
+    if body.size <= 0:
+        raise HTTPException(status_code=400, detail="Size must be greater than zero.")
+    if body.size > CHUNKED_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large. The limit is {CHUNKED_UPLOAD_MAX_BYTES} bytes.")
+
+    purge_expired_uploads()
+    return describe(create_upload(body.filename, body.size, body.sha256))
+
+@router.put("/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    Stores the request body at `offset`. An optional X-Chunk-SHA256 header is
+    checked before the chunk counts as received. Chunks may arrive in any order
+    and may be re-sent. A body larger than CHUNKED_UPLOAD_MAX_CHUNK_BYTES or than
+    what is left of the file is refused before it is read.
+    """
+    state = get_upload_or_404(upload_id)
+    if state["status"] == "complete":
+        raise HTTPException(status_code=409, detail="Upload already finalized.")
+    if not 0 <= offset < state["size"]:
+        raise HTTPException(status_code=416, detail="Chunk falls outside the declared file size.")
+
+    def check_length(length: int):
+        if length > CHUNKED_UPLOAD_MAX_CHUNK_BYTES:
+            raise HTTPException(
+                status_code=413, detail=f"Chunk too large. The limit is {CHUNKED_UPLOAD_MAX_CHUNK_BYTES} bytes."
+            )
+        if offset + length > state["size"]:
+            raise HTTPException(status_code=416, detail="Chunk falls outside the declared file size.")
+
+    declared = request.headers.get("Content-Length")
+    if declared and declared.isdigit():
+        check_length(int(declared))
+    # Content-Length may be missing (chunked transfer encoding) or wrong
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        check_length(len(data))
+    data = bytes(data)
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty chunk.")
+
+    expected = request.headers.get("X-Chunk-SHA256")
+    if expected and hashlib.sha256(data).hexdigest() != expected.lower():
+        raise HTTPException(status_code=400, detail="Chunk SHA-256 mismatch. Send it again.")
+
+    await run_in_threadpool(write_chunk, upload_id, offset, data)
+    return describe(state)
+
+@router.get("/{upload_id}")
+async def upload_status(upload_id: str):
+    """Lists the byte ranges received so far, so an interrupted client knows what to resend."""
+    return describe(get_upload_or_404(upload_id))
+
+@router.post("/{upload_id}/finalize")
+async def finalize(upload_id: str):
+    """
+    Checks that the file is complete and matches its SHA-256. The returned
+    upload_id can then be sent instead of a file to any tool endpoint.
+    """
+    get_upload_or_404(upload_id)
+    try:
+        # Hashing a large file takes a while; keep it off the event loop
+        state = await run_in_threadpool(finalize_upload, upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return describe(state)
+
+@router.delete("/{upload_id}", status_code=204)
+async def abort_upload(upload_id: str):
+    get_upload_or_404(upload_id)
+    delete_upload(upload_id)
@@ -1,74 +1,64 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-import shutil
+from fastapi import APIRouter, HTTPException, Request, Depends
 import os
-from docx import Document
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle, Image as RLImage
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
-from reportlab.lib import colors
+import logging
 from core.utils import cleanup_file
+from core.timing import span
+from core.results import retain_result, serve_result
+from core.uploads import InputFile, input_file
 from PIL import Image
 import io
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 
-@router.post("/word-to-pdf")
-async def word_to_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    if not (file.filename.endswith(".docx") or file.filename.endswith(".doc")):
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a Word document (.docx or .doc).")
-
-    # Note: .doc files (old Word format) are not supported, only .docx
-    if file.filename.endswith(".doc"):
-        raise HTTPException(status_code=400, detail="Only .docx files are supported. Please convert your .doc file to .docx first.")
-
-    input_path = os.path.join(UPLOAD_DIR, f"word_in_{file.filename}")
-    output_filename = f"{os.path.splitext(file.filename)[0]}.pdf"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
-
-    try:
-        # Save uploaded file
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+def word_to_pdf_file(input_path: str, output_path: str):
+    """Rebuilds the paragraphs, tables and images of a .docx as a PDF with reportlab."""
+    from docx import Document
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage
 
-        # Read Word document
+    # Read Word document
+    with span("parse"):
         doc = Document(input_path)
-        
-        # Create PDF
-        pdf = SimpleDocTemplate(output_path, pagesize=A4,
-                              rightMargin=72, leftMargin=72,
-                              topMargin=72, bottomMargin=18)
-        
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Define styles
-        styles = getSampleStyleSheet()
-        normal_style = styles['Normal']
-        normal_style.fontSize = 11
-        normal_style.leading = 14
-        
-        heading1_style = styles['Heading1']
-        heading2_style = styles['Heading2']
-        
+    
+    # Create PDF
+    pdf = SimpleDocTemplate(output_path, pagesize=A4,
+                          rightMargin=72, leftMargin=72,
+                          topMargin=72, bottomMargin=18)
+    
+    # Container for the 'Flowable' objects
+    elements = []
+    
+    # Define styles
+    styles = getSampleStyleSheet()
+    normal_style = styles['Normal']
+    normal_style.fontSize = 11
+    normal_style.leading = 14
+    
+    heading1_style = styles['Heading1']
+    heading2_style = styles['Heading2']
+    
+    with span("build"):
         # Count total content
         total_content = 0
-        
+    
         # Process paragraphs
         for paragraph in doc.paragraphs:
             text = paragraph.text.strip()
-            
+        
             if text:
                 total_content += 1
                 try:
                     # Clean text for PDF
                     clean_text = text.encode('utf-8', 'ignore').decode('utf-8')
-                    
+                
                     # Determine style based on paragraph style
                     if paragraph.style.name.startswith('Heading 1'):
                         para = Paragraph(clean_text, heading1_style)
@@ -76,14 +66,14 @@ async def word_to_pdf(background_tasks: BackgroundTasks, file: UploadFile = File
                         para = Paragraph(clean_text, heading2_style)
                     else:
                         para = Paragraph(clean_text, normal_style)
-                    
+                
                     elements.append(para)
                     elements.append(Spacer(1, 6))
                 except Exception as e:
-                    print(f"Error processing paragraph: {e}")
+                    logger.warning(f"Error processing paragraph: {e}")
                     elements.append(Paragraph(clean_text, normal_style))
                     elements.append(Spacer(1, 6))
-        
+    
         # Process tables
         for table in doc.tables:
             total_content += 1
@@ -94,7 +84,7 @@ async def word_to_pdf(background_tasks: BackgroundTasks, file: UploadFile = File
                     cell_text = cell.text.strip()
                     row_data.append(cell_text)
                 table_data.append(row_data)
-            
+        
             if table_data:
                 try:
                     t = Table(table_data)
@@ -111,8 +101,8 @@ async def word_to_pdf(background_tasks: BackgroundTasks, file: UploadFile = File
                     elements.append(t)
                     elements.append(Spacer(1, 12))
                 except Exception as e:
-                    print(f"Error processing table: {e}")
-        
+                    logger.warning(f"Error processing table: {e}")
+    
         # Extract and process images from Word document
         # Images are stored in the document's relationships
         try:
@@ -123,70 +113,74 @@ async def word_to_pdf(background_tasks: BackgroundTasks, file: UploadFile = File
                     try:
                         # Get image data
                         image_data = rel.target_part.blob
-                        
-                        # Save temporarily to process with PIL
-                        temp_img_path = os.path.join(OUTPUT_DIR, f"temp_img_{total_content}.png")
-                        with open(temp_img_path, 'wb') as img_file:
-                            img_file.write(image_data)
-                        
-                        # Open with PIL to get dimensions
-                        pil_img = Image.open(temp_img_path)
+                    
+                        # Open with PIL to get dimensions (in memory, so parallel
+                        # conversions never share a temp file)
+                        pil_img = Image.open(io.BytesIO(image_data))
                         img_width, img_height = pil_img.size
-                        
+                    
                         # Calculate scaled dimensions to fit page
                         max_width = 6 * inch  # Maximum width
                         max_height = 8 * inch  # Maximum height
-                        
+                    
                         # Calculate aspect ratio
                         aspect = img_height / float(img_width)
-                        
+                    
                         if img_width > max_width:
                             img_width = max_width
                             img_height = img_width * aspect
-                        
+                    
                         if img_height > max_height:
                             img_height = max_height
                             img_width = img_height / aspect
-                        
+                    
                         # Add image to PDF
-                        img = RLImage(temp_img_path, width=img_width, height=img_height)
+                        img = RLImage(io.BytesIO(image_data), width=img_width, height=img_height)
                         elements.append(img)
                         elements.append(Spacer(1, 12))
-                        
-                        # Clean up temp file
-                        cleanup_file(temp_img_path)
-                        
-                        print(f"Added image: {img_width}x{img_height}")
                     except Exception as e:
-                        print(f"Error processing image: {e}")
+                        logger.warning(f"Error processing image: {e}")
         except Exception as e:
-            print(f"Error extracting images: {e}")
-        
-        # Build PDF
-        if total_content > 0 and elements:
+            logger.warning(f"Error extracting images: {e}")
+    
+    # Build PDF
+    if total_content > 0 and elements:
+        with span("write"):
             pdf.build(elements)
-            print(f"Successfully converted document with {total_content} content items")
-        else:
-            # Create a simple PDF with a message if document appears empty
-            print("No content found in document")
-            elements.append(Paragraph("O documento não contém conteúdo visível (texto ou imagens).", normal_style))
+    else:
+        # Create a simple PDF with a message if document appears empty
+        logger.info("No content found in document")
+        elements.append(Paragraph("O documento não contém conteúdo visível (texto ou imagens).", normal_style))
+        with span("write"):
             pdf.build(elements)
 
-        if not os.path.exists(output_path):
-            raise HTTPException(status_code=500, detail="Conversion failed: Output file not created.")
+    if not os.path.exists(output_path):
+        raise Exception("Output file not created.")
+
+@router.post("/word-to-pdf")
+async def word_to_pdf(request: Request, file: InputFile = Depends(input_file)):
+    if not (file.filename.endswith(".docx") or file.filename.endswith(".doc")):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a Word document (.docx or .doc).")
+
+    # Note: .doc files (old Word format) are not supported, only .docx
+    if file.filename.endswith(".doc"):
+        raise HTTPException(status_code=400, detail="Only .docx files are supported. Please convert your .doc file to .docx first.")
+
+    input_path = os.path.join(UPLOAD_DIR, f"word_in_{file.filename}")
+    output_filename = f"{os.path.splitext(file.filename)[0]}.pdf"
+    output_path = os.path.join(OUTPUT_DIR, output_filename)
+
+    try:
+        # Save uploaded file
+        with span("save"):
+            file.save(input_path)
 
-        background_tasks.add_task(cleanup_file, output_path)
+        word_to_pdf_file(input_path, output_path)
 
-        return FileResponse(
-            output_path, 
-            media_type="application/pdf", 
-            filename=output_filename
-        )
+        return serve_result(request, retain_result(output_path, "application/pdf", output_filename))
 
     except Exception as e:
-        print(f"Conversion error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Conversion error: {e}")
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
     
     finally:
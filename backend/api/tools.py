@@ -0,0 +1,109 @@
+"""
+File-level entry points of every tool, shared by the batch and job routes.
+
+Each runner takes (input_path, output_dir, stem, params, progress) and returns
+the list of files it wrote to output_dir. They are module-level functions so
+they can be sent to the process pool.
+"""
+import os
+from typing import List
+
+from api.endpoints import (
+    compress, protect_pdf, pdf_to_jpg, pdf_to_word, pdf_to_pptx, pdf_to_excel,
+    word_to_pdf, excel_to_pdf, pptx_to_pdf, split, remove_blank,
+)
+
+
+def _compress(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"compressed_{stem}.pdf")
+    compress.compress_file(input_path, output_path, progress=progress, skip_blank=params.get("skip_blank", False))
+    return [output_path]
+
+def _protect(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"{stem}_protected.pdf")
+    protect_pdf.protect_file(input_path, output_path, params["password"])
+    return [output_path]
+
+def _split(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    return [split.split_file(input_path, output_dir, stem, params["pages"], params.get("merge", True), progress=progress,
+                             skip_blank=params.get("skip_blank", False))]
+
+def _pdf_to_jpg(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    return pdf_to_jpg.pdf_to_jpg_file(input_path, output_dir, stem, progress=progress,
+                                      skip_blank=params.get("skip_blank", False))
+
+def _remove_blank(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"{stem}_no_blank.pdf")
+    remove_blank.remove_blank_file(input_path, output_path, progress=progress)
+    return [output_path]
+
+def _pdf_to_word(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"{stem}.docx")
+    pdf_to_word.pdf_to_word_file(input_path, output_path)
+    return [output_path]
+
+def _pdf_to_pptx(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"{stem}.pptx")
+    pdf_to_pptx.pdf_to_pptx_file(input_path, output_path, progress=progress)
+    return [output_path]
+
+def _pdf_to_excel(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"{stem}.xlsx")
+    pdf_to_excel.pdf_to_excel_file(input_path, output_path)
+    return [output_path]
+
+def _word_to_pdf(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"{stem}.pdf")
+    word_to_pdf.word_to_pdf_file(input_path, output_path)
+    return [output_path]
+
+def _excel_to_pdf(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"{stem}.pdf")
+    excel_to_pdf.excel_to_pdf_file(input_path, output_path)
+    return [output_path]
+
+def _pptx_to_pdf(input_path, output_dir, stem, params, progress=None) -> List[str]:
+    output_path = os.path.join(output_dir, f"{stem}.pdf")
+    pptx_to_pdf.pptx_to_pdf_file(input_path, output_path)
+    return [output_path]
+
+
+# tool -> (accepted extension, runner)
+TOOLS = {
+    "compress-pdf": (".pdf", _compress),
+    "protect-pdf": (".pdf", _protect),
+    "split-pdf": (".pdf", _split),
+    "remove-blank-pages": (".pdf", _remove_blank),
+    "pdf-to-jpg": (".pdf", _pdf_to_jpg),
+    "pdf-to-word": (".pdf", _pdf_to_word),
+    "pdf-to-pptx": (".pdf", _pdf_to_pptx),
+    "pdf-to-excel": (".pdf", _pdf_to_excel),
+    "word-to-pdf": (".docx", _word_to_pdf),
+    "excel-to-pdf": (".xlsx", _excel_to_pdf),
+    "pptx-to-pdf": (".pptx", _pptx_to_pdf),
+}
+
+MEDIA_TYPES = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".zip": "application/zip",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def validate_params(tool: str, params: dict):
+    """Raises ValueError when the shared parameters do not suit the tool."""
+    if tool == "protect-pdf":
+        password = params.get("password")
+        if not password or len(password) < 4:
+            raise ValueError("Password must be at least 4 characters long.")
+    if tool == "split-pdf" and not params.get("pages"):
+        raise ValueError("The 'pages' field is required to split a PDF.")
+
+
+def run_tool(tool: str, input_path: str, output_dir: str, stem: str, params: dict, progress=None) -> List[str]:
+    _, runner = TOOLS[tool]
+    os.makedirs(output_dir, exist_ok=True)
+    return runner(input_path, output_dir, stem, params, progress=progress)
@@ -0,0 +1,256 @@
+"""
+Deterministic document corpus for the benchmarks.
+
+Every fixture is generated from a fixed seed with the libraries the API
+already depends on, so two runs (or two machines) benchmark the same content:
+
+- text:    PDF pages of paragraphs
+- images:  PDF pages with several embedded photos (noisy gradients)
+- scanned: PDF pages that are a single full-page grayscale JPEG, like a scanner produces
+- table:   PDF pages of ruled tables (the pdf-to-excel case)
+- docx / xlsx / pptx: inputs for the Office -> PDF converters
+
+Sizes scale the page/row/slide count. Run `python -m benchmarks.corpus` to
+(re)generate the corpus into benchmarks/.corpus.
+"""
+import argparse
+import io
+import os
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), ".corpus")
+SEED = 20240601
+
+# pages (PDF), paragraphs (docx), rows (xlsx) and slides (pptx) per size
+SIZES = {
+    "small": {"pages": 2, "paragraphs": 20, "rows": 200, "slides": 3},
+    "medium": {"pages": 12, "paragraphs": 150, "rows": 2000, "slides": 12},
+    "large": {"pages": 60, "paragraphs": 800, "rows": 20000, "slides": 40},
+}
+PDF_KINDS = ("text", "images", "scanned", "table")
+
+WORDS = (
+    "documento contrato relatório página tabela valor cliente processo arquivo análise "
+    "performance latency throughput render encode stream buffer page table invoice total "
+    "data projeto entrega prazo revisão assinatura anexo resumo capítulo seção índice"
+).split()
+
+
+def _sentence(rng: random.Random, words: int = 14) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng, rng.randint(8, 18)) for _ in range(rng.randint(3, 6)))
+
+
+def _noise(rng: random.Random, size, sigma: float) -> Image.Image:
+    """Gaussian grey noise around mid-grey, seeded from rng (PIL's effect_noise is not)."""
+    width, height = size
+    values = np.random.default_rng(rng.getrandbits(32)).normal(128, sigma, (height, width))
+    return Image.fromarray(values.clip(0, 255).astype(np.uint8), "L")
+
+
+def _photo(rng: random.Random, width: int, height: int) -> Image.Image:
+    """A noisy colour gradient: compresses like a photo, unlike flat synthetic shapes."""
+    base = Image.linear_gradient("L").resize((width, height))
+    channels = [base.rotate(rng.randint(0, 359)).resize((width, height)) for _ in range(3)]
+    image = Image.merge("RGB", channels)
+    noise = _noise(rng, (width, height), rng.randint(20, 60)).convert("RGB")
+    return Image.blend(image, noise, 0.35).filter(ImageFilter.GaussianBlur(1))
+
+
+def _jpeg_bytes(image: Image.Image, quality: int = 85) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _pdf_text(path: str, pages: int, rng: random.Random):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+    styles = getSampleStyleSheet()
+    elements = []
+    for page in range(pages):
+        elements.append(Paragraph(f"Capítulo {page + 1}", styles["Heading1"]))
+        for _ in range(9):
+            elements.append(Paragraph(_paragraph(rng), styles["Normal"]))
+        elements.append(PageBreak())
+    SimpleDocTemplate(path, pagesize=A4, invariant=1).build(elements)
+
+
+def _pdf_images(path: str, pages: int, rng: random.Random):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(path, pagesize=A4, invariant=1)
+    width, height = A4
+    for page in range(pages):
+        pdf.drawString(40, height - 40, f"Galeria {page + 1}")
+        for slot in range(4):
+            photo = _photo(rng, 900, 600)
+            x = 40 + (slot % 2) * (width - 80) / 2
+            y = height - 80 - (slot // 2 + 1) * 330
+            pdf.drawImage(ImageReader(io.BytesIO(_jpeg_bytes(photo))), x, y, width=(width - 100) / 2, height=300)
+        pdf.showPage()
+    pdf.save()
+
+
+def _pdf_scanned(path: str, pages: int, rng: random.Random):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(path, pagesize=A4, invariant=1)
+    width, height = A4
+    for _ in range(pages):
+        # 150 dpi A4 "scan": dark text lines on slightly uneven paper
+        scan = Image.new("L", (1240, 1754), 235)
+        draw = ImageDraw.Draw(scan)
+        for line in range(55):
+            draw.text((90, 90 + line * 29), _sentence(rng, 11), fill=rng.randint(20, 60))
+        scan = Image.blend(scan, _noise(rng, scan.size, 12), 0.15).rotate(rng.uniform(-0.8, 0.8), fillcolor=235)
+        pdf.drawImage(ImageReader(io.BytesIO(_jpeg_bytes(scan, 75))), 0, 0, width=width, height=height)
+        pdf.showPage()
+    pdf.save()
+
+
+def _pdf_table(path: str, pages: int, rng: random.Random):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle
+
+    elements = []
+    for _ in range(pages):
+        rows = [["ID", "Cliente", "Data", "Quantidade", "Valor"]]
+        for _ in range(38):
+            rows.append([
+                str(rng.randint(1000, 9999)),
+                rng.choice(WORDS).title(),
+                f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                str(rng.randint(1, 500)),
+                f"{rng.uniform(10, 10000):.2f}",
+            ])
+        table = Table(rows)
+        table.setStyle(TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ]))
+        elements.extend([table, PageBreak()])
+    SimpleDocTemplate(path, pagesize=A4, invariant=1).build(elements)
+
+
+def _docx(path: str, paragraphs: int, rng: random.Random):
+    from docx import Document
+    from docx.shared import Inches
+
+    doc = Document()
+    for index in range(paragraphs):
+        if index % 25 == 0:
+            doc.add_heading(f"Seção {index // 25 + 1}", level=1)
+        doc.add_paragraph(_paragraph(rng))
+        if index % 50 == 10:
+            image = io.BytesIO()
+            _photo(rng, 600, 400).save(image, "PNG")
+            image.seek(0)
+            doc.add_picture(image, width=Inches(4))
+    table = doc.add_table(rows=1, cols=4)
+    for _ in range(paragraphs // 5):
+        cells = table.add_row().cells
+        for cell in cells:
+            cell.text = rng.choice(WORDS)
+    doc.save(path)
+
+
+def _xlsx(path: str, rows: int, rng: random.Random):
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    sheets = [wb.active] + [wb.create_sheet(f"Dados {n}") for n in range(2, 4)]
+    for sheet in sheets:
+        sheet.append(["ID", "Cliente", "Região", "Quantidade", "Preço", "Total"])
+        for row in range(rows // len(sheets)):
+            quantity = rng.randint(1, 500)
+            price = round(rng.uniform(1, 900), 2)
+            sheet.append([row + 1, rng.choice(WORDS).title(), rng.choice(WORDS), quantity, price, round(quantity * price, 2)])
+    wb.save(path)
+
+
+def _pptx(path: str, slides: int, rng: random.Random):
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    for index in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {index + 1}: {_sentence(rng, 4)}"
+        slide.placeholders[1].text = "\n".join(_sentence(rng, 8) for _ in range(4))
+        if index % 2 == 0:
+            image = io.BytesIO()
+            _photo(rng, 800, 500).save(image, "JPEG", quality=85)
+            image.seek(0)
+            slide.shapes.add_picture(image, Inches(5.5), Inches(4.5), width=Inches(4))
+    prs.save(path)
+
+
+PDF_BUILDERS = {
+    "text": _pdf_text,
+    "images": _pdf_images,
+    "scanned": _pdf_scanned,
+    "table": _pdf_table,
+}
+
+
+def fixture_name(kind: str, size: str) -> str:
+    extension = kind if kind in ("docx", "xlsx", "pptx") else "pdf"
+    return f"{kind}_{size}.{extension}"
+
+
+def build_fixture(kind: str, size: str, directory: str = CORPUS_DIR) -> str:
+    """Builds one fixture (if missing) and returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, fixture_name(kind, size))
+    if os.path.exists(path):
+        return path
+
+    # Seeded per fixture, so one fixture never depends on which others were built first
+    rng = random.Random(f"{SEED}-{kind}-{size}")
+    counts = SIZES[size]
+    tmp_path = path + ".tmp"
+    if kind in PDF_BUILDERS:
+        PDF_BUILDERS[kind](tmp_path, counts["pages"], rng)
+    elif kind == "docx":
+        _docx(tmp_path, counts["paragraphs"], rng)
+    elif kind == "xlsx":
+        _xlsx(tmp_path, counts["rows"], rng)
+    elif kind == "pptx":
+        _pptx(tmp_path, counts["slides"], rng)
+    else:
+        raise ValueError(f"Unknown fixture kind: {kind}")
+    os.replace(tmp_path, path)
+    return path
+
+
+def build_corpus(sizes=("small", "medium"), directory: str = CORPUS_DIR) -> dict:
+    """Returns {(kind, size): path} for every fixture of the given sizes."""
+    corpus = {}
+    for size in sizes:
+        for kind in PDF_KINDS + ("docx", "xlsx", "pptx"):
+            corpus[(kind, size)] = build_fixture(kind, size, directory)
+    return corpus
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the benchmark corpus.")
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(SIZES))
+    parser.add_argument("--dir", default=CORPUS_DIR)
+    args = parser.parse_args()
+    for (kind, size), path in build_corpus(args.sizes, args.dir).items():
+        print(f"{kind:8} {size:7} {os.path.getsize(path):>10} bytes  {path}")
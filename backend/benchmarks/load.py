@@ -0,0 +1,434 @@
+"""
+Concurrent load test against a running API.
+
+A fixed number of clients (--concurrency) replay a weighted mix of tool
+requests built from the benchmark corpus for --duration seconds, each sending
+its next request as soon as the previous one finishes. By default the API is
+started here with uvicorn (--workers N); --url targets one that is already up.
+
+Reported:
+
+- requests/sec, error rate and p50/p95/p99 latency, overall and per route
+- event-loop lag: a probe client GETs `/` every --probe-interval seconds, on a
+  new connection each time so every worker gets probed. That handler does no
+  work, so its latency under load is the time the worker's event loop spent
+  blocked, e.g. by the CPU-bound code inside `async def` handlers
+- merge integrity: every merge response is opened and its page count checked
+  against the files that were sent, which exposes concurrent merges sharing
+  the fixed `merged_document.pdf` output path (wrong document or HTTP 500)
+- CPU% and peak RSS of every server process (uvicorn workers and their
+  process-pool children), sampled from /proc when the server runs locally;
+  its output goes to benchmarks/load_server.log
+
+    python -m benchmarks.load --concurrency 8 --duration 30
+    python -m benchmarks.load --mix compress-pdf=3,merge-pdf=2 --workers 4
+    python -m benchmarks.load --url http://localhost:8000 --pids 1234 1235
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import build_fixture
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+DEFAULT_MIX = "compress-pdf=3,pdf-to-jpg=2,merge-pdf=2,split-pdf=1,protect-pdf=1,pdf-to-word=1"
+
+# tool -> (path, fixture kind, form fields)
+ROUTES = {
+    "compress-pdf": ("/compress/compress-pdf", "images", {}),
+    "protect-pdf": ("/protect/protect-pdf", "text", {"password": "benchmark"}),
+    "split-pdf": ("/split/split-pdf", "text", {"pages": "1-2", "merge": "true"}),
+    "pdf-to-jpg": ("/convert/pdf-to-jpg", "scanned", {}),
+    "pdf-to-word": ("/convert/pdf-to-word", "text", {}),
+    "pdf-to-pptx": ("/convert/pdf-to-pptx", "text", {}),
+    "pdf-to-excel": ("/convert/pdf-to-excel", "table", {}),
+    "word-to-pdf": ("/convert/word-to-pdf", "docx", {}),
+    "excel-to-pdf": ("/convert/excel-to-pdf", "xlsx", {}),
+    "pptx-to-pdf": ("/convert/pptx-to-pdf", "pptx", {}),
+    "merge-pdf": ("/merge/merge-pdf", None, {}),
+}
+MERGE_KINDS = ("text", "images", "scanned", "table")
+
+
+def parse_mix(value: str) -> dict:
+    """Parses "compress-pdf=3,merge-pdf=1" into {tool: weight}."""
+    mix = {}
+    for item in value.split(","):
+        tool, _, weight = item.strip().partition("=")
+        if tool not in ROUTES:
+            raise ValueError(f"Unknown tool in mix: {tool}")
+        mix[tool] = float(weight or 1)
+        if mix[tool] < 0:
+            raise ValueError(f"Negative weight for {tool}")
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one positive weight.")
+    return mix
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of values (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies_ms: list) -> dict:
+    return {
+        "p50_ms": round(percentile(latencies_ms, 0.50), 1),
+        "p95_ms": round(percentile(latencies_ms, 0.95), 1),
+        "p99_ms": round(percentile(latencies_ms, 0.99), 1),
+        "max_ms": round(max(latencies_ms, default=0.0), 1),
+    }
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    """samples: [{tool, status, latency_ms}] -> overall and per-route statistics."""
+    def stats(group):
+        errors = sum(1 for s in group if s["status"] is None or s["status"] >= 400)
+        return {
+            "requests": len(group),
+            "errors": errors,
+            "error_rate": round(errors / len(group), 4) if group else 0.0,
+            "rps": round(len(group) / elapsed, 2) if elapsed else 0.0,
+            **latency_summary([s["latency_ms"] for s in group]),
+        }
+
+    by_tool = {}
+    for sample in samples:
+        by_tool.setdefault(sample["tool"], []).append(sample)
+    return {
+        "elapsed_s": round(elapsed, 1),
+        "overall": stats(samples),
+        "routes": {tool: stats(group) for tool, group in sorted(by_tool.items())},
+    }
+
+
+# -- server processes -------------------------------------------------------
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _read_proc(pid: int):
+    """Returns (parent pid, cpu seconds, rss bytes) or None when the process is gone."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces; the fields after ")" do not
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            rss_kib = next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+    except (FileNotFoundError, ProcessLookupError, IndexError, ValueError):
+        return None
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / _CLK_TCK, rss_kib * 1024
+
+
+def _descendants(root_pids: list) -> dict:
+    """Returns {pid: depth} for root_pids and every process below them."""
+    parents = {}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            info = _read_proc(int(name))
+            if info:
+                parents[int(name)] = info[0]
+    depth = {pid: 0 for pid in root_pids}
+    changed = True
+    while changed:
+        changed = False
+        for pid, parent in parents.items():
+            if pid not in depth and parent in depth:
+                depth[pid] = depth[parent] + 1
+                changed = True
+    return depth
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of the server's process tree from /proc."""
+
+    def __init__(self, root_pids: list, roles=("worker", "pool"), interval: float = 0.5):
+        self.root_pids = root_pids
+        self.roles = roles
+        self.interval = interval
+        self.processes = {}
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            now = time.monotonic()
+            for pid, depth in _descendants(self.root_pids).items():
+                info = _read_proc(pid)
+                if not info:
+                    continue
+                _, cpu, rss = info
+                entry = self.processes.setdefault(pid, {"depth": depth, "first": (now, cpu), "peak_cpu": 0.0, "peak_rss": 0})
+                last_time, last_cpu = entry.get("last", entry["first"])
+                if now > last_time:
+                    entry["peak_cpu"] = max(entry["peak_cpu"], (cpu - last_cpu) / (now - last_time) * 100)
+                entry["last"] = (now, cpu)
+                entry["peak_rss"] = max(entry["peak_rss"], rss)
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def report(self) -> list:
+        rows = []
+        for pid, entry in sorted(self.processes.items(), key=lambda item: (item[1]["depth"], item[0])):
+            (first_time, first_cpu), (last_time, last_cpu) = entry["first"], entry.get("last", entry["first"])
+            span = last_time - first_time
+            rows.append({
+                "pid": pid,
+                "role": self.roles[min(entry["depth"], len(self.roles) - 1)],
+                "avg_cpu_pct": round((last_cpu - first_cpu) / span * 100, 1) if span else 0.0,
+                "peak_cpu_pct": round(entry["peak_cpu"], 1),
+                "peak_rss_mib": round(entry["peak_rss"] / 2**20, 1),
+            })
+        return rows
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, log):
+    """Starts uvicorn on a free port, logging to the file object log; returns (process, base url)."""
+    port = _free_port()
+    env = dict(os.environ)
+    env.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="pdftools-metrics-"))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server did not answer within {timeout:.0f}s")
+
+
+# -- load -------------------------------------------------------------------
+
+def _page_count(content: bytes):
+    from pypdf import PdfReader
+
+    try:
+        return len(PdfReader(io.BytesIO(content)).pages)
+    except Exception:
+        return None
+
+
+class LoadTest:
+    def __init__(self, client, mix: dict, size: str, seed: int):
+        self.client = client
+        self.mix = mix
+        self.size = size
+        self.rng = random.Random(seed)
+        self.samples = []
+        self.merge = {"checked": 0, "mismatched": 0, "failed": 0}
+        self.fixtures = {}
+        self.page_counts = {}
+
+    def fixture(self, kind: str):
+        if kind not in self.fixtures:
+            path = build_fixture(kind, self.size)
+            with open(path, "rb") as f:
+                self.fixtures[kind] = (os.path.basename(path), f.read())
+            if path.endswith(".pdf"):
+                self.page_counts[kind] = _page_count(self.fixtures[kind][1])
+        return self.fixtures[kind]
+
+    def prepare(self):
+        for tool in self.mix:
+            kind = ROUTES[tool][1]
+            for fixture_kind in (MERGE_KINDS if kind is None else (kind,)):
+                self.fixture(fixture_kind)
+
+    async def send(self, tool: str):
+        path, kind, fields = ROUTES[tool]
+        expected_pages = None
+        if tool == "merge-pdf":
+            kinds = self.rng.sample(MERGE_KINDS, self.rng.randint(1, len(MERGE_KINDS)))
+            files = [("files", (self.fixture(k)[0], self.fixture(k)[1], "application/pdf")) for k in kinds]
+            expected_pages = sum(self.page_counts[k] for k in kinds)
+        else:
+            name, content = self.fixture(kind)
+            files = [("file", (name, content, "application/octet-stream"))]
+
+        start = time.perf_counter()
+        status = None
+        try:
+            response = await self.client.post(path, data=fields, files=files)
+            status = response.status_code
+        except Exception:
+            response = None
+        self.samples.append({"tool": tool, "status": status, "latency_ms": (time.perf_counter() - start) * 1000})
+
+        if expected_pages is not None:
+            if response is None or status != 200:
+                self.merge["failed"] += 1
+            else:
+                self.merge["checked"] += 1
+                if _page_count(response.content) != expected_pages:
+                    self.merge["mismatched"] += 1
+
+    async def client_loop(self, deadline: float):
+        tools, weights = list(self.mix), list(self.mix.values())
+        while time.monotonic() < deadline:
+            await self.send(self.rng.choices(tools, weights)[0])
+
+
+async def probe_loop(client, interval: float, stop: asyncio.Event, latencies: list):
+    """Times GET / (which does no work) until stop is set."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get("/")
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(args, base_url: str, pids: list) -> dict:
+    import httpx
+
+    mix = parse_mix(args.mix)
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+    # A fresh connection per probe, so probes spread over all uvicorn workers
+    probe_limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client, \
+            httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=probe_limits) as probe_client:
+        await wait_ready(client)
+        # The first worker to answer is not the last to finish importing
+        await asyncio.sleep(args.settle)
+        test = LoadTest(client, mix, args.size, args.seed)
+        test.prepare()
+
+        # Idle loop latency first, so the loaded numbers have a reference
+        idle = []
+        for _ in range(20):
+            start = time.perf_counter()
+            await probe_client.get("/")
+            idle.append((time.perf_counter() - start) * 1000)
+
+        stop = asyncio.Event()
+        probe = []
+        # A single uvicorn worker serves from the process we started; with more,
+        # that process only supervises the workers
+        roles = ("server", "worker", "pool") if not args.url and args.workers > 1 else ("worker", "pool")
+        sampler = ProcessSampler(pids, roles) if pids else None
+        background = [asyncio.create_task(probe_loop(probe_client, args.probe_interval, stop, probe))]
+        if sampler:
+            background.append(asyncio.create_task(sampler.run(stop)))
+
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(test.client_loop(deadline) for _ in range(args.concurrency)))
+        elapsed = time.monotonic() - start
+        stop.set()
+        await asyncio.gather(*background)
+
+    report = summarize(test.samples, elapsed)
+    report["config"] = {"url": base_url, "mix": mix, "concurrency": args.concurrency, "duration_s": args.duration, "size": args.size}
+    report["event_loop"] = {"idle": latency_summary(idle), "loaded": latency_summary(probe), "probes": len(probe)}
+    report["merge"] = test.merge
+    report["processes"] = sampler.report() if sampler else []
+    return report
+
+
+def print_report(report: dict):
+    config = report["config"]
+    print(f"{config['url']}  concurrency={config['concurrency']}  {report['elapsed_s']}s  size={config['size']}\n")
+
+    header = f"{'route':16} {'reqs':>6} {'err%':>6} {'req/s':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in list(report["routes"].items()) + [("TOTAL", report["overall"])]:
+        print(
+            f"{name:16} {stats['requests']:>6} {stats['error_rate'] * 100:>6.1f} {stats['rps']:>7.2f} "
+            f"{stats['p50_ms']:>9.0f} {stats['p95_ms']:>9.0f} {stats['p99_ms']:>9.0f}"
+        )
+
+    loop = report["event_loop"]
+    print(
+        f"\nEvent-loop probe (GET /): idle p50 {loop['idle']['p50_ms']:.1f} ms; under load "
+        f"p50 {loop['loaded']['p50_ms']:.1f} / p99 {loop['loaded']['p99_ms']:.1f} / max {loop['loaded']['max_ms']:.1f} ms "
+        f"over {loop['probes']} probes"
+    )
+
+    merge = report["merge"]
+    if merge["checked"] or merge["failed"]:
+        print(
+            f"Merge integrity: {merge['checked']} checked, {merge['mismatched']} returned the wrong document, "
+            f"{merge['failed']} failed"
+        )
+
+    if report["processes"]:
+        print(f"\n{'pid':>8} {'role':8} {'avg cpu%':>9} {'peak cpu%':>10} {'peak rss MiB':>13}")
+        for row in report["processes"]:
+            print(f"{row['pid']:>8} {row['role']:8} {row['avg_cpu_pct']:>9.1f} {row['peak_cpu_pct']:>10.1f} {row['peak_rss_mib']:>13.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a mix of tool requests at a fixed concurrency.")
+    parser.add_argument("--url", help="Target an API that is already running instead of starting one.")
+    parser.add_argument("--pids", nargs="+", type=int, default=[], help="Server pids to sample when using --url.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local server.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted tools, e.g. compress-pdf=3,merge-pdf=1.")
+    parser.add_argument("--size", default="small", choices=["small", "medium", "large"], help="Corpus size to send.")
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout in seconds.")
+    parser.add_argument("--settle", type=float, default=3, help="Seconds to wait once the server answers.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url, pids = args.url, args.pids
+    if not base_url:
+        log = open(os.path.join(BENCH_DIR, "load_server.log"), "w")
+        server, base_url = start_server(args.workers, log)
+        pids = [server.pid]
+    try:
+        report = asyncio.run(run_load(args, base_url, pids))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(30)
+            log.close()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
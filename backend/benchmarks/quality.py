@@ -0,0 +1,211 @@
+"""
+Quality-vs-size benchmark for compress-pdf.
+
+Runs every compression setting over the PDF fixtures, renders each original and
+compressed page at the same evaluation resolution and scores the pair with
+SSIM and PSNR (grayscale, computed in NumPy). Per setting we report the bytes
+saved, the time per page and the mean/worst SSIM, and mark the settings on the
+Pareto front (no other setting is both smaller and better looking), which is
+where TARGET_DPI / JPEG_QUALITY should be picked from.
+
+compress-pdf has a single mode, rasterising pages to JPEG at (dpi, quality);
+the grid covers that. A lossless rewrite (garbage collection + deflate, no
+rasterising) is included as a reference point with SSIM 1.
+
+    python -m benchmarks.quality
+    python -m benchmarks.quality --dpis 72 96 --qualities 60 70 80 --sizes medium
+
+Results are written to benchmarks/quality_last.json.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.corpus import PDF_KINDS, SIZES, build_fixture
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+LAST_RUN_PATH = os.path.join(BENCH_DIR, "quality_last.json")
+
+DEFAULT_DPIS = (50, 72, 96, 120, 150)
+DEFAULT_QUALITIES = (40, 55, 70, 85)
+EVAL_DPI = 100
+SSIM_WINDOW = 7
+
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def _box_mean(image: np.ndarray, size: int) -> np.ndarray:
+    """Mean over every size x size window ("valid" positions), via a summed-area table."""
+    table = np.pad(image, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    total = table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+    return total / (size * size)
+
+
+def ssim(a: np.ndarray, b: np.ndarray, window: int = SSIM_WINDOW) -> float:
+    """Mean structural similarity of two same-shaped 8-bit grayscale images (uniform window)."""
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    mu_a, mu_b = _box_mean(a, window), _box_mean(b, window)
+    var_a = _box_mean(a * a, window) - mu_a ** 2
+    var_b = _box_mean(b * b, window) - mu_b ** 2
+    cov = _box_mean(a * b, window) - mu_a * mu_b
+    score = ((2 * mu_a * mu_b + _C1) * (2 * cov + _C2)) / ((mu_a ** 2 + mu_b ** 2 + _C1) * (var_a + var_b + _C2))
+    return float(score.mean())
+
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    """Peak signal-to-noise ratio in dB (capped at 100 for identical images)."""
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return 100.0 if mse == 0 else float(min(100.0, 10 * np.log10(255 ** 2 / mse)))
+
+
+def _render_gray(page, dpi: int) -> np.ndarray:
+    import fitz
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def score_pages(original_path: str, compressed_path: str, eval_dpi: int = EVAL_DPI) -> list:
+    """Returns [(ssim, psnr)] per page of the two documents."""
+    import fitz
+
+    scores = []
+    with fitz.open(original_path) as original, fitz.open(compressed_path) as compressed:
+        for index in range(len(original)):
+            a = _render_gray(original[index], eval_dpi)
+            b = _render_gray(compressed[index], eval_dpi)
+            # Rounding of the page size can differ by a pixel
+            height, width = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+            a, b = a[:height, :width], b[:height, :width]
+            scores.append((ssim(a, b), psnr(a, b)))
+    return scores
+
+
+def _compress_raster(dpi: int, quality: int):
+    def run(input_path, output_path):
+        from api.endpoints.compress import compress_file
+
+        compress_file(input_path, output_path, dpi=dpi, quality=quality)
+    return run
+
+
+def _compress_lossless(input_path, output_path):
+    import fitz
+
+    with fitz.open(input_path) as doc:
+        doc.save(output_path, garbage=4, deflate=True, deflate_images=True, deflate_fonts=True)
+
+
+def build_settings(dpis, qualities) -> dict:
+    settings = {"lossless": _compress_lossless}
+    for dpi in dpis:
+        for quality in qualities:
+            settings[f"raster dpi={dpi} q={quality}"] = _compress_raster(dpi, quality)
+    return settings
+
+
+def pareto_front(rows: list) -> set:
+    """Names of the rows no other row beats on both size (lower) and mean SSIM (higher)."""
+    front = set()
+    for row in rows:
+        dominated = any(
+            other["output_ratio"] <= row["output_ratio"] and other["ssim_mean"] >= row["ssim_mean"]
+            and (other["output_ratio"], other["ssim_mean"]) != (row["output_ratio"], row["ssim_mean"])
+            for other in rows
+        )
+        if not dominated:
+            front.add(row["setting"])
+    return front
+
+
+def evaluate(settings: dict, fixtures: list, eval_dpi: int) -> list:
+    import fitz
+
+    rows = []
+    for name, compress in settings.items():
+        input_bytes = output_bytes = pages = 0
+        elapsed = 0.0
+        scores = []
+        per_kind = {}
+        for path in fixtures:
+            with fitz.open(path) as doc:
+                page_count = len(doc)
+            with tempfile.TemporaryDirectory() as output_dir:
+                output_path = os.path.join(output_dir, "compressed.pdf")
+                start = time.perf_counter()
+                compress(path, output_path)
+                elapsed += time.perf_counter() - start
+                fixture_scores = score_pages(path, output_path, eval_dpi)
+                size = os.path.getsize(output_path)
+            input_bytes += os.path.getsize(path)
+            output_bytes += size
+            pages += page_count
+            scores.extend(fixture_scores)
+            per_kind[os.path.basename(path)] = {
+                "output_ratio": round(size / os.path.getsize(path), 3),
+                "ssim_mean": round(float(np.mean([s for s, _ in fixture_scores])), 4),
+            }
+
+        ssims = [s for s, _ in scores]
+        rows.append({
+            "setting": name,
+            "input_bytes": input_bytes,
+            "output_bytes": output_bytes,
+            "output_ratio": round(output_bytes / input_bytes, 4),
+            "saved_pct": round((1 - output_bytes / input_bytes) * 100, 1),
+            "ms_per_page": round(elapsed / pages * 1000, 1),
+            "ssim_mean": round(float(np.mean(ssims)), 4),
+            "ssim_min": round(float(np.min(ssims)), 4),
+            "psnr_mean": round(float(np.mean([p for _, p in scores])), 2),
+            "fixtures": per_kind,
+        })
+
+    front = pareto_front(rows)
+    for row in rows:
+        row["pareto"] = row["setting"] in front
+    return rows
+
+
+def print_table(rows: list):
+    header = f"{'setting':24} {'saved %':>8} {'ms/page':>8} {'SSIM':>7} {'min SSIM':>9} {'PSNR dB':>8}  pareto"
+    print(header)
+    print("-" * len(header))
+    for row in sorted(rows, key=lambda row: row["output_ratio"]):
+        print(
+            f"{row['setting']:24} {row['saved_pct']:>8.1f} {row['ms_per_page']:>8.1f} {row['ssim_mean']:>7.4f} "
+            f"{row['ssim_min']:>9.4f} {row['psnr_mean']:>8.2f}  {'*' if row['pareto'] else ''}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Score compress-pdf settings by size saved vs SSIM/PSNR.")
+    parser.add_argument("--dpis", nargs="+", type=int, default=list(DEFAULT_DPIS))
+    parser.add_argument("--qualities", nargs="+", type=int, default=list(DEFAULT_QUALITIES))
+    parser.add_argument("--sizes", nargs="+", default=["small"], choices=list(SIZES))
+    parser.add_argument("--kinds", nargs="+", default=list(PDF_KINDS), choices=list(PDF_KINDS))
+    parser.add_argument("--eval-dpi", type=int, default=EVAL_DPI, help="Resolution both versions are compared at.")
+    parser.add_argument("--json", default=LAST_RUN_PATH)
+    args = parser.parse_args(argv)
+
+    fixtures = [build_fixture(kind, size) for size in args.sizes for kind in args.kinds]
+    rows = evaluate(build_settings(args.dpis, args.qualities), fixtures, args.eval_dpi)
+    print_table(rows)
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "eval_dpi": args.eval_dpi,
+            "fixtures": [os.path.basename(path) for path in fixtures],
+            "results": rows,
+        }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Benchmarks every tool's file-level function over the synthetic corpus.
+
+Each case (tool x fixture) runs in a fresh process, so peak RSS belongs to that
+case alone and one case's caches do not warm up the next. Per case we record
+the median wall time over --repeat runs (after --warmup runs), the tracemalloc
+peak of one extra run, the process peak RSS and the output size.
+
+    python -m benchmarks.run                      # small + medium corpus
+    python -m benchmarks.run --tools compress-pdf --sizes large
+    python -m benchmarks.run --save-baseline      # record benchmarks/baseline.json (not committed)
+    python -m benchmarks.run --threshold 0.10     # fail (exit 1) on >10% regressions
+    python -m benchmarks.run --tools compress-pdf --sizes medium large
+
+Tools in BOUNDED_MEMORY_TOOLS must keep a flat peak RSS as documents grow:
+when a run has the same fixture kind at several sizes, a larger size whose
+RSS exceeds the smallest one by more than RSS_GROWTH_TOLERANCE also fails.
+
+Results of the last run are written to benchmarks/last_run.json. Timings only
+compare on the same machine, so the baseline is recorded locally and is not
+part of the repository; without one the run just prints its results.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import PDF_KINDS, SIZES, build_fixture
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+LAST_RUN_PATH = os.path.join(BENCH_DIR, "last_run.json")
+
+DEFAULT_THRESHOLD = 0.15
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DELTA_MS = 20
+MIN_MEMORY_DELTA_BYTES = 2 * 1024 * 1024
+
+# Tools that process pages in bounded windows, and how much their peak RSS may
+# grow from the smallest to the largest fixture of a kind
+BOUNDED_MEMORY_TOOLS = ("compress-pdf",)
+RSS_GROWTH_TOLERANCE = 32 * 1024 * 1024
+
+TOOL_PARAMS = {
+    "split-pdf": {"pages": "1-2", "merge": True},
+    "protect-pdf": {"password": "benchmark"},
+}
+TOOL_KINDS = {
+    "pdf-to-excel": ("table",),
+}
+
+
+def _edit_operations(page_count: int):
+    from api.endpoints.edit_pdf import EditOperations
+
+    return EditOperations(
+        texts=[
+            {"id": f"t{page}", "pageIndex": page, "text": f"Revisado {page + 1}", "x": 0.1, "y": 0.05, "fontSize": 14}
+            for page in range(page_count)
+        ],
+        rectangles=[
+            {"id": f"r{page}", "pageIndex": page, "x": 0.05, "y": 0.9, "width": 0.9, "height": 0.05, "color": "#ff0000"}
+            for page in range(page_count)
+        ],
+    )
+
+
+def _run_edit(input_paths, output_dir):
+    import fitz
+    from api.endpoints.edit_pdf import apply_edits
+
+    doc = fitz.open(input_paths[0])
+    try:
+        apply_edits(doc, _edit_operations(len(doc)), [])
+        output_path = os.path.join(output_dir, "edited.pdf")
+        doc.save(output_path)
+    finally:
+        doc.close()
+    return [output_path]
+
+
+def _run_merge(input_paths, output_dir):
+    from api.endpoints.merge import merge_files
+
+    output_path = os.path.join(output_dir, "merged.pdf")
+    merge_files(input_paths, output_path)
+    return [output_path]
+
+
+def _run_tool(tool):
+    def run(input_paths, output_dir):
+        from api.tools import run_tool
+
+        return run_tool(tool, input_paths[0], output_dir, "bench", TOOL_PARAMS.get(tool, {}))
+    return run
+
+
+def build_cases(sizes, tools=None, kinds=None) -> list:
+    """Returns [{name, tool, kind, size, inputs}] for the selected tools, kinds and sizes."""
+    from api.tools import TOOLS
+
+    cases = []
+
+    def add(tool, kind, size, inputs):
+        if tools and tool not in tools:
+            return
+        if kinds and kind not in kinds:
+            return
+        cases.append({"name": f"{tool}/{kind}_{size}", "tool": tool, "kind": kind, "size": size, "inputs": inputs})
+
+    for size in sizes:
+        for tool, (extension, _) in TOOLS.items():
+            tool_kinds = TOOL_KINDS.get(tool, PDF_KINDS if extension == ".pdf" else (extension[1:],))
+            for kind in tool_kinds:
+                add(tool, kind, size, [build_fixture(kind, size)])
+        for kind in PDF_KINDS:
+            add("edit-pdf", kind, size, [build_fixture(kind, size)])
+        add("merge-pdf", "mixed", size, [build_fixture(kind, size) for kind in PDF_KINDS])
+    return cases
+
+
+def _runner(tool):
+    if tool == "edit-pdf":
+        return _run_edit
+    if tool == "merge-pdf":
+        return _run_merge
+    return _run_tool(tool)
+
+
+def _measure(case: dict, repeat: int, warmup: int, queue):
+    """Body of the per-case child process."""
+    os.chdir(os.path.dirname(BENCH_DIR))
+    # Import every tool module up front so no timed run pays for it
+    import api.tools  # noqa: F401
+    import api.endpoints.edit_pdf  # noqa: F401
+
+    run = _runner(case["tool"])
+    try:
+        timings = []
+        output_bytes = 0
+        for index in range(warmup + repeat):
+            with tempfile.TemporaryDirectory() as output_dir:
+                start = time.perf_counter()
+                outputs = run(case["inputs"], output_dir)
+                elapsed = (time.perf_counter() - start) * 1000
+                output_bytes = sum(os.path.getsize(path) for path in outputs)
+            if index >= warmup:
+                timings.append(elapsed)
+
+        # Separate run: tracemalloc slows everything down and would skew the timings
+        with tempfile.TemporaryDirectory() as output_dir:
+            tracemalloc.start()
+            run(case["inputs"], output_dir)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        queue.put({
+            "status": "ok",
+            "median_ms": round(statistics.median(timings), 1),
+            "min_ms": round(min(timings), 1),
+            "runs": len(timings),
+            "py_peak_bytes": peak,
+            # ru_maxrss is in KiB on Linux
+            "rss_peak_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None,
+            "input_bytes": sum(os.path.getsize(path) for path in case["inputs"]),
+            "output_bytes": output_bytes,
+        })
+    except Exception as e:
+        queue.put({"status": "error", "error": f"{e.__class__.__name__}: {e}"})
+
+
+def run_case(case: dict, repeat: int, warmup: int, timeout: float) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(case, repeat, warmup, queue))
+    process.start()
+    try:
+        result = queue.get(timeout=timeout)
+    except Exception:
+        result = {"status": "error", "error": f"Timed out after {timeout:.0f}s"}
+    process.join(5)
+    if process.is_alive():
+        process.kill()
+    return result
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns one message per case that got slower or hungrier than the baseline allows."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if result.get("status") != "ok" or not before or before.get("status") != "ok":
+            continue
+
+        delta_ms = result["median_ms"] - before["median_ms"]
+        if delta_ms > MIN_TIME_DELTA_MS and result["median_ms"] > before["median_ms"] * (1 + threshold):
+            regressions.append(f"{name}: {before['median_ms']:.0f} ms -> {result['median_ms']:.0f} ms")
+
+        delta_bytes = result["py_peak_bytes"] - before["py_peak_bytes"]
+        if delta_bytes > MIN_MEMORY_DELTA_BYTES and result["py_peak_bytes"] > before["py_peak_bytes"] * (1 + threshold):
+            regressions.append(
+                f"{name}: peak {before['py_peak_bytes'] / 2**20:.1f} MiB -> {result['py_peak_bytes'] / 2**20:.1f} MiB"
+            )
+    return regressions
+
+
+def check_memory_scaling(results: dict) -> list:
+    """One message per bounded-memory case whose peak RSS grew with the document size."""
+    by_kind = {}
+    for name, result in results.items():
+        tool, _, fixture = name.partition("/")
+        kind, _, size = fixture.rpartition("_")
+        if tool in BOUNDED_MEMORY_TOOLS and result.get("status") == "ok" and result.get("rss_peak_bytes"):
+            by_kind.setdefault((tool, kind), []).append((list(SIZES).index(size), size, result["rss_peak_bytes"]))
+
+    failures = []
+    for (tool, kind), rows in by_kind.items():
+        rows.sort()
+        _, smallest, base_rss = rows[0]
+        for _, size, rss in rows[1:]:
+            if rss - base_rss > RSS_GROWTH_TOLERANCE:
+                failures.append(
+                    f"{tool}/{kind}: peak RSS grew from {base_rss / 2**20:.0f} MiB ({smallest}) "
+                    f"to {rss / 2**20:.0f} MiB ({size})"
+                )
+    return failures
+
+
+def _mib(value) -> str:
+    return "-" if value is None else f"{value / 2**20:.1f}"
+
+
+def print_table(results: dict, baseline: dict):
+    header = f"{'case':42} {'median ms':>10} {'min ms':>9} {'py MiB':>8} {'rss MiB':>8} {'out KiB':>9} {'vs base':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        if result["status"] != "ok":
+            print(f"{name:42} {'error: ' + result['error']}")
+            continue
+        before = baseline.get(name, {})
+        change = ""
+        if before.get("status") == "ok" and before["median_ms"]:
+            change = f"{(result['median_ms'] / before['median_ms'] - 1) * 100:+.0f}%"
+        print(
+            f"{name:42} {result['median_ms']:>10.1f} {result['min_ms']:>9.1f} {_mib(result['py_peak_bytes']):>8} "
+            f"{_mib(result['rss_peak_bytes']):>8} {result['output_bytes'] / 1024:>9.0f} {change:>8}"
+        )
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save_results(path: str, results: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "results": results,
+        }, f, indent=2)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every tool over the synthetic corpus.")
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(SIZES))
+    parser.add_argument("--tools", nargs="+", help="Only these tools (e.g. compress-pdf pdf-to-word).")
+    parser.add_argument("--kinds", nargs="+", help="Only these fixture kinds (e.g. text scanned).")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed per case.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown, e.g. 0.15 = 15%%.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for case in build_cases(args.sizes, args.tools, args.kinds):
+        print(f"running {case['name']}...", file=sys.stderr)
+        results[case["name"]] = run_case(case, args.repeat, args.warmup, args.timeout)
+
+    baseline = {} if args.save_baseline else load_baseline(args.baseline)
+    print_table(results, baseline)
+    save_results(LAST_RUN_PATH, results)
+
+    unbounded = check_memory_scaling(results)
+    for message in unbounded:
+        print(f"\nMemory not bounded: {message}")
+
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 1 if unbounded else 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    if baseline:
+        print(f"\nNo regressions above {args.threshold:.0%}.")
+    return 1 if unbounded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Admission control per tool class.
+
+Tool routes are grouped by the resource they exhaust: "render" (rasterising
+pages), "office" (pdf2docx and the reportlab converters), "jvm" (tabula) and
+"light" (split, merge, protect, edit). Each class gets ADMISSION_LIMITS
+concurrent requests and ADMISSION_QUEUE waiting ones, shared by every uvicorn
+worker on the machine: slots and queue places are lock files under
+ADMISSION_DIR held with flock (the holder writes its pid into the file, which
+is what in_use() reads), so a worker that dies frees its slots and an
+idle worker can take work a busy one would have queued.
+
+A request that finds the queue full, or waits longer than ADMISSION_MAX_WAIT,
+gets 503 with a Retry-After estimated from how long the class's requests
+usually hold a slot. Without fcntl (Windows) the limits apply per process.
+"""
+import asyncio
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter, Histogram
+
+from core.config import ADMISSION_DIR, ADMISSION_LIMITS, ADMISSION_MAX_WAIT, ADMISSION_QUEUE
+from core.timing import add_stage
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TOOL_CLASSES = {
+    "compress-pdf": "render",
+    "pdf-to-jpg": "render",
+    "pdf-to-pptx": "render",
+    "pipeline": "render",
+    "pdf-to-word": "office",
+    "word-to-pdf": "office",
+    "excel-to-pdf": "office",
+    "pptx-to-pdf": "office",
+    "pdf-to-excel": "jvm",
+    "split-pdf": "light",
+    "merge-pdf": "light",
+    "protect-pdf": "light",
+    "remove-blank-pages": "light",
+    "edit-pdf": "light",
+}
+
+# POST routes that run a tool in the request: /compress/compress-pdf, /convert/pdf-to-jpg/stream,
+# /batch/{tool}, /pipeline/run... Jobs are bounded by the process pool instead.
+_TOOL_ROUTE = re.compile(r"^/(?:compress|split|merge|protect|organize|convert|batch)/([a-z-]+)(?:/stream)?/?$")
+
+POLL_INTERVAL = (0.01, 0.1)  # first and longest pause between attempts to take a slot
+HOLD_ESTIMATE = 5.0  # seconds a slot is assumed to be held before anything is measured
+
+REJECTED = Counter(
+    "pdftools_admission_rejected_total", "Requests turned away with 503, by tool class and reason.",
+    ["tool_class", "reason"],
+)
+QUEUE_WAIT = Histogram(
+    "pdftools_admission_wait_seconds", "Time admitted requests waited for a slot.", ["tool_class"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+def parse_limits(value: str) -> dict:
+    """Parses "render=2,office=2" into {"render": 2, "office": 2}."""
+    limits = {}
+    for item in value.split(","):
+        name, _, count = item.strip().partition("=")
+        if name:
+            limits[name] = int(count)
+    return limits
+
+
+def tool_class(path: str) -> Optional[str]:
+    if path.rstrip("/") == "/pipeline/run":
+        return TOOL_CLASSES["pipeline"]
+    match = _TOOL_ROUTE.match(path)
+    return TOOL_CLASSES.get(match.group(1)) if match else None
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class SlotPool:
+    """`size` slots shared by every process that uses the same directory and name."""
+
+    _held = set()  # fallback without fcntl: slots taken in this process
+    _held_lock = threading.Lock()
+
+    def __init__(self, directory: str, name: str, size: int):
+        self.paths = [os.path.join(directory, f"{name}.{index}.lock") for index in range(size)]
+        os.makedirs(directory, exist_ok=True)
+
+    def try_acquire(self):
+        """Returns a handle for a free slot, or None when all are taken."""
+        # A random starting point spreads the lock attempts over the files
+        offset = random.randrange(len(self.paths)) if self.paths else 0
+        for path in self.paths[offset:] + self.paths[:offset]:
+            if fcntl is None:
+                with self._held_lock:
+                    if path not in self._held:
+                        self._held.add(path)
+                        return path
+                continue
+            handle = self.try_acquire_path(path)
+            if handle is not None:
+                return handle
+        return None
+
+    def in_use(self) -> int:
+        """
+        Slots currently held by any process. Reads the holders' pid markers
+        instead of probing the locks, so counting never makes a concurrent
+        try_acquire() find a slot busy.
+        """
+        if fcntl is None:
+            with self._held_lock:
+                return sum(1 for path in self.paths if path in self._held)
+        busy = 0
+        for path in self.paths:
+            try:
+                with open(path, "rb") as f:
+                    marker = f.read().strip()
+            except FileNotFoundError:
+                continue
+            # A holder that died without releasing left a stale marker (its lock is gone)
+            if marker.isdigit() and _alive(int(marker)):
+                busy += 1
+        return busy
+
+    @staticmethod
+    def try_acquire_path(path: str):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, str(os.getpid()).encode(), 0)
+        return fd
+
+    def release(self, handle):
+        if fcntl is None:
+            with self._held_lock:
+                self._held.discard(handle)
+        else:
+            # Clear the marker while the lock is still held, then closing the
+            # descriptor drops the lock
+            os.ftruncate(handle, 0)
+            os.close(handle)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ClassGovernor:
+    def __init__(self, name: str, limit: int, queue_size: int, directory: str = ADMISSION_DIR):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.slots = SlotPool(directory, name, limit)
+        self.queue = SlotPool(directory, f"{name}.queue", queue_size)
+        self.mean_hold = HOLD_ESTIMATE
+
+    def retry_after(self) -> int:
+        """Seconds until the requests ahead (a full queue plus the running ones) should have drained."""
+        backlog = (self.queue_size + self.limit) / max(self.limit, 1)
+        return max(1, min(math.ceil(self.mean_hold * backlog), int(ADMISSION_MAX_WAIT) or 1))
+
+    async def acquire(self, max_wait: float = ADMISSION_MAX_WAIT):
+        slot = self.slots.try_acquire()
+        if slot is not None:
+            return slot
+
+        ticket = self.queue.try_acquire()
+        if ticket is None:
+            raise Rejected("queue_full", self.retry_after())
+        try:
+            deadline = time.monotonic() + max_wait
+            pause = POLL_INTERVAL[0]
+            while time.monotonic() < deadline:
+                await asyncio.sleep(pause)
+                slot = self.slots.try_acquire()
+                if slot is not None:
+                    return slot
+                pause = min(pause * 2, POLL_INTERVAL[1])
+            raise Rejected("timeout", self.retry_after())
+        finally:
+            self.queue.release(ticket)
+
+    def release(self, slot, held_seconds: float):
+        self.slots.release(slot)
+        self.mean_hold = 0.8 * self.mean_hold + 0.2 * held_seconds
+
+
+_governors = None
+
+
+def get_governors() -> dict:
+    """{tool class: ClassGovernor} from the configured limits, built once per process."""
+    global _governors
+    if _governors is None:
+        limits = parse_limits(ADMISSION_LIMITS)
+        queues = parse_limits(ADMISSION_QUEUE)
+        # A limit of 0 leaves the class ungoverned
+        _governors = {
+            name: ClassGovernor(name, limit, queues.get(name, 0))
+            for name, limit in limits.items() if limit > 0
+        }
+    return _governors
+
+
+class AdmissionMiddleware:
+    """Runs inside the CORS middleware, so browsers can read the 503 and its Retry-After."""
+
+    def __init__(self, app, governors: Optional[dict] = None):
+        self.app = app
+        self.governors = governors
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        name = tool_class(scope["path"])
+        if self.governors is None:
+            self.governors = get_governors()
+        governor = self.governors.get(name)
+        if governor is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            slot = await governor.acquire()
+        except Rejected as e:
+            REJECTED.labels(name, e.reason).inc()
+            logger.warning("Rejected %s (%s), retry after %ss", scope["path"], e.reason, e.retry_after)
+            response = JSONResponse(
+                {"detail": "The server is busy, please try again shortly."},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        waited = time.perf_counter() - start
+        QUEUE_WAIT.labels(name).observe(waited)
+        add_stage("queue", waited * 1000)
+        admitted = time.perf_counter()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                governor.release(slot, time.perf_counter() - admitted)
+
+        async def send_and_release(message):
+            # The slot covers the work, not the transfer: a response with a
+            # Content-Length was fully produced before it started, so a slow
+            # download does not hold the slot. A streamed body (pdf-to-jpg/stream)
+            # is produced as it is sent, so its slot is released with the last chunk.
+            if message["type"] == "http.response.start":
+                if any(key.lower() == b"content-length" for key, _ in message.get("headers", ())):
+                    release()
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                release()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_release)
+        finally:
+            release()
@@ -0,0 +1,100 @@
+"""
+Blank-page detection, so separator sheets and empty backsides of scanned
+batches are dropped before anything renders, compresses or converts them.
+
+Each page is decided in the cheapest way that works:
+
+1. content: MuPDF lists what the page's content streams paint (get_bboxlog(),
+   an interpretation pass with no rasterisation). Nothing painted, or only
+   invisible text (an OCR layer), means blank; visible text means not blank.
+2. render: pages that paint only images, paths or shadings (a scan of an empty
+   sheet, a white background rectangle) are rendered in grayscale at
+   BLANK_RENDER_DPI and scored with NumPy over the whole bitmap at once: the
+   fraction of pixels that differ from the paper tone by more than
+   BLANK_INK_DELTA (ink coverage) and the standard deviation. Both must stay
+   under their thresholds. BLANK_MARGIN of each edge is ignored, because scanners
+   leave shadows there.
+"""
+from typing import List, NamedTuple
+
+from core.config import BLANK_INK_DELTA, BLANK_MARGIN, BLANK_MAX_INK, BLANK_MAX_STDDEV, BLANK_RENDER_DPI
+from core.render import capped_zoom
+from core.timing import span
+
+# The low-resolution render never needs more than this, whatever the page size
+RENDER_MAX_PIXELS = 1_000_000
+
+TEXT_OPERATIONS = ("fill-text", "stroke-text")
+# Not painted: invisible text (render mode 3) and clipping
+UNPAINTED_PREFIXES = ("ignore", "clip")
+
+
+class BlankScore(NamedTuple):
+    blank: bool
+    method: str  # "content" or "render"
+    ink: float = 0.0  # fraction of pixels that differ from the paper
+    stddev: float = 0.0
+
+
+def score_pixels(gray) -> BlankScore:
+    """Scores a 2-D uint8 grayscale array (a rendered page)."""
+    import numpy as np
+
+    height, width = gray.shape
+    dy, dx = int(height * BLANK_MARGIN), int(width * BLANK_MARGIN)
+    inner = gray[dy:height - dy or None, dx:width - dx or None]
+    if inner.size == 0:
+        return BlankScore(True, "render")
+
+    # The paper is whatever most of the page is, not necessarily white
+    paper = np.median(inner)
+    ink = np.count_nonzero(np.abs(inner.astype(np.int16) - paper) > BLANK_INK_DELTA) / inner.size
+    stddev = float(inner.std())
+    return BlankScore(bool(ink <= BLANK_MAX_INK and stddev <= BLANK_MAX_STDDEV), "render", float(ink), stddev)
+
+
+def score_page(page) -> BlankScore:
+    import fitz  # PyMuPDF
+    import numpy as np
+
+    with span("blank"):
+        painted = [kind for kind, _ in page.get_bboxlog() if not kind.startswith(UNPAINTED_PREFIXES)]
+        if not painted:
+            return BlankScore(True, "content")
+        if any(kind in TEXT_OPERATIONS for kind in painted):
+            return BlankScore(False, "content")
+
+        zoom = capped_zoom(page.rect, BLANK_RENDER_DPI / 72, RENDER_MAX_PIXELS)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+        return score_pixels(gray)
+
+
+def is_blank_page(page) -> bool:
+    return score_page(page).blank
+
+
+def blank_pages(doc, pages=None, progress=None) -> List[int]:
+    """
+    Indexes (0-based) of the blank pages of an open document, among `pages` if
+    given. `progress(done, total)` is called after each page is checked.
+    """
+    pages = range(len(doc)) if pages is None else pages
+    blank = []
+    for done, index in enumerate(pages, 1):
+        if is_blank_page(doc[index]):
+            blank.append(index)
+        if progress:
+            progress(done, len(pages))
+    return blank
+
+
+def remove_blank_pages(doc, progress=None) -> List[int]:
+    """Deletes the blank pages of an open document in place and returns their indexes."""
+    blank = blank_pages(doc, progress=progress)
+    if len(blank) == len(doc):
+        raise ValueError("Every page of the PDF is blank.")
+    if blank:
+        removed = set(blank)
+        doc.select([index for index in range(len(doc)) if index not in removed])
+    return blank
@@ -0,0 +1,111 @@
+import os
+import tempfile
+
+# Tamanho do pool de processos usado pelas rotas em lote (batch)
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "2"))
+
+# Fila do pool ordenada pela duração estimada: cada segundo de espera desconta
+# SCHEDULER_AGING segundos da estimativa (evita que jobs longos esperem para
+# sempre); o modelo usa as últimas SCHEDULER_HISTORY medições de cada ferramenta,
+# e só elas são mantidas no histórico em disco
+SCHEDULER_AGING = float(os.getenv("SCHEDULER_AGING", "1.0"))
+SCHEDULER_HISTORY = int(os.getenv("SCHEDULER_HISTORY", "500"))
+
+# As bibliotecas de conversão (PyMuPDF, pdf2docx, reportlab, tabula...) só são
+# importadas no primeiro uso; os módulos listados aqui (separados por vírgula,
+# ex.: "fitz,pdf2docx") são importados já na inicialização de cada worker
+PRELOAD_MODULES = [name.strip() for name in os.getenv("PRELOAD_MODULES", "").split(",") if name.strip()]
+
+# Orçamento de memória de uma compressão: as páginas são processadas em janelas
+# que cabem nele e gravadas incrementalmente, então PDFs longos não estouram a RAM
+COMPRESS_MEMORY_BUDGET = int(os.getenv("COMPRESS_MEMORY_BUDGET_MB", "64")) * 1024 ** 2
+
+# Orçamento de pixels por página renderizada (o zoom cai para caber) e tamanho
+# máximo de cada faixa quando uma página grande é renderizada em faixas
+RENDER_MAX_PIXELS = int(os.getenv("RENDER_MAX_PIXELS", str(25_000_000)))
+RENDER_BAND_PIXELS = int(os.getenv("RENDER_BAND_PIXELS", str(4_000_000)))
+
+# Limite de arquivos aceitos em uma única requisição em lote
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+
+# Jobs assíncronos: tempo que o resultado fica disponível e intervalo mínimo
+# entre gravações/eventos de progresso
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "0.25"))
+
+# Uploads em partes (resumable): tamanho máximo do arquivo, tamanho sugerido
+# de cada parte, maior parte aceita em um PUT e tempo de vida de uploads
+# incompletos ou finalizados
+CHUNKED_UPLOAD_MAX_BYTES = int(os.getenv("CHUNKED_UPLOAD_MAX_BYTES", str(2 * 1024 ** 3)))
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv("CHUNKED_UPLOAD_CHUNK_SIZE", str(8 * 1024 ** 2)))
+CHUNKED_UPLOAD_MAX_CHUNK_BYTES = int(os.getenv("CHUNKED_UPLOAD_MAX_CHUNK_BYTES", str(32 * 1024 ** 2)))
+UPLOAD_TTL_SECONDS = int(os.getenv("UPLOAD_TTL_SECONDS", str(24 * 3600)))
+
+# Sessões de edição: o documento fica aberto no worker por até
+# EDIT_SESSION_IDLE_SECONDS sem uso (no máximo EDIT_SESSION_MAX_OPEN por worker)
+# e a sessão em disco expira EDIT_SESSION_TTL_SECONDS após a última alteração
+EDIT_SESSION_IDLE_SECONDS = int(os.getenv("EDIT_SESSION_IDLE_SECONDS", "300"))
+EDIT_SESSION_MAX_OPEN = int(os.getenv("EDIT_SESSION_MAX_OPEN", "16"))
+EDIT_SESSION_TTL_SECONDS = int(os.getenv("EDIT_SESSION_TTL_SECONDS", str(4 * 3600)))
+
+# Documentos enviados uma vez (/documents) e usados por id em qualquer
+# ferramenta: expiram DOCUMENT_TTL_SECONDS após o último uso e o armazenamento
+# fica abaixo de DOCUMENT_STORE_MAX_MB removendo os usados há mais tempo. Cada
+# worker guarda em LRU os metadados de DOCUMENT_CACHE_SIZE documentos e até
+# DOCUMENT_MAX_OPEN documentos abertos
+DOCUMENT_TTL_SECONDS = int(os.getenv("DOCUMENT_TTL_SECONDS", str(24 * 3600)))
+DOCUMENT_STORE_MAX_BYTES = int(os.getenv("DOCUMENT_STORE_MAX_MB", "4096")) * 1024 ** 2
+DOCUMENT_CACHE_SIZE = int(os.getenv("DOCUMENT_CACHE_SIZE", "256"))
+DOCUMENT_MAX_OPEN = int(os.getenv("DOCUMENT_MAX_OPEN", "8"))
+
+# Índice de texto dos documentos: a extração roda em paralelo no pool, em
+# blocos de TEXT_INDEX_CHUNK_PAGES páginas (documentos menores são extraídos
+# direto no worker), e cada worker mantém até TEXT_INDEX_CACHE_SIZE índices em
+# memória
+TEXT_INDEX_CHUNK_PAGES = int(os.getenv("TEXT_INDEX_CHUNK_PAGES", "100"))
+TEXT_INDEX_CACHE_SIZE = int(os.getenv("TEXT_INDEX_CACHE_SIZE", "8"))
+
+# Resultados ficam disponíveis para download (com ETag e Range) por este tempo
+RESULT_TTL_SECONDS = int(os.getenv("RESULT_TTL_SECONDS", "900"))
+
+# Profiling sob demanda: requisições com o header X-Profile-Token igual a este
+# valor são perfiladas (vazio desativa); PROFILE_ALL_REQUESTS perfila todas
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_ALL_REQUESTS = os.getenv("PROFILE_ALL_REQUESTS", "0") == "1"
+PROFILE_TTL_SECONDS = int(os.getenv("PROFILE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Controle de admissão: requisições simultâneas e em espera por classe de
+# ferramenta, somando todos os workers; acima disso a resposta é 503 com
+# Retry-After. Limite 0 deixa a classe sem controle
+ADMISSION_LIMITS = os.getenv("ADMISSION_LIMITS", "render=2,office=2,jvm=1,light=8")
+ADMISSION_QUEUE = os.getenv("ADMISSION_QUEUE", "render=8,office=4,jvm=2,light=32")
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+ADMISSION_DIR = os.getenv("ADMISSION_DIR", os.path.join(tempfile.gettempdir(), "pdftools-admission"))
+
+# Qualidade adaptativa: sob carga alta compress/pdf-to-jpg/pdf-to-pptx
+# renderizam com menos resolução (até QUALITY_MIN_SCALE do normal) e JPEG
+# mais leve (até QUALITY_MIN_JPEG); 0 desativa
+QUALITY_ADAPTIVE = os.getenv("QUALITY_ADAPTIVE", "1") == "1"
+QUALITY_MIN_SCALE = float(os.getenv("QUALITY_MIN_SCALE", "0.5"))
+QUALITY_MIN_JPEG = int(os.getenv("QUALITY_MIN_JPEG", "60"))
+
+# Preflight: limites verificados antes de qualquer processamento, lendo só o
+# cabeçalho/xref do PDF ou o diretório do ZIP (413 quando excedidos);
+# PREFLIGHT_MAX_IMAGE_MB vale para cada imagem, não para a soma do documento
+PREFLIGHT_MAX_PAGES = int(os.getenv("PREFLIGHT_MAX_PAGES", "5000"))
+PREFLIGHT_MAX_PAGE_INCHES = float(os.getenv("PREFLIGHT_MAX_PAGE_INCHES", "200"))
+PREFLIGHT_MAX_OBJECTS = int(os.getenv("PREFLIGHT_MAX_OBJECTS", str(2_000_000)))
+PREFLIGHT_MAX_IMAGE_BYTES = int(os.getenv("PREFLIGHT_MAX_IMAGE_MB", "2048")) * 1024 ** 2
+PREFLIGHT_MAX_UNZIPPED_BYTES = int(os.getenv("PREFLIGHT_MAX_UNZIPPED_MB", "1024")) * 1024 ** 2
+PREFLIGHT_MAX_ZIP_ENTRIES = int(os.getenv("PREFLIGHT_MAX_ZIP_ENTRIES", "20000"))
+
+# Páginas em branco: as que o conteúdo da página não decide (imagens, vetores)
+# são renderizadas em cinza a BLANK_RENDER_DPI; ficam em branco se no máximo
+# BLANK_MAX_INK (fração) dos pixels se afasta mais de BLANK_INK_DELTA do tom do
+# papel e o desvio padrão fica até BLANK_MAX_STDDEV, ignorando BLANK_MARGIN
+# (fração) de cada borda, onde scanners deixam sombras
+BLANK_RENDER_DPI = float(os.getenv("BLANK_RENDER_DPI", "36"))
+BLANK_INK_DELTA = int(os.getenv("BLANK_INK_DELTA", "48"))
+BLANK_MAX_INK = float(os.getenv("BLANK_MAX_INK", "0.002"))
+BLANK_MAX_STDDEV = float(os.getenv("BLANK_MAX_STDDEV", "12"))
+BLANK_MARGIN = float(os.getenv("BLANK_MARGIN", "0.05"))
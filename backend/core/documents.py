@@ -0,0 +1,240 @@
+"""
+Document store: a file uploaded once, under the SHA-256 of its content, that
+any tool endpoint then takes as `document_id` instead of a multipart file.
+
+Layout of uploads/documents/<sha256>/:
+    data            the file; tools get hard links to it and never change it
+    document.json   filename and the preflight report from when it was stored
+
+The same bytes always get the same id, so storing a file again costs one hash
+and no space. Preflight runs when the file is stored; requests that use the id
+reuse that report (the checks, the page count the scheduler estimates from)
+instead of preflighting the file again. What a request with an id saves is the
+upload, the spooling and the preflight: the tool itself still parses its hard
+link of the file, because tools change the document they open, often in a pool
+process, and cannot share a cached handle. The modification time of
+document.json records the last use: documents expire DOCUMENT_TTL_SECONDS after
+it, and the least recently used go first when the store grows past
+DOCUMENT_STORE_MAX_BYTES.
+
+Every uvicorn worker keeps the metadata of the last DOCUMENT_CACHE_SIZE
+documents and up to DOCUMENT_MAX_OPEN open documents (for the store's own
+read-only endpoints, like page previews) in LRU caches. Stored files never
+change, so neither cache needs invalidating; a document another worker deleted
+is dropped from them on its next read_document().
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from core.config import DOCUMENT_CACHE_SIZE, DOCUMENT_MAX_OPEN, DOCUMENT_STORE_MAX_BYTES, DOCUMENT_TTL_SECONDS
+from core.render import capped_zoom, tint_rects
+from core.timing import span
+from core.utils import cleanup_dir, file_sha256
+
+DOCUMENTS_DIR = os.path.join("uploads", "documents")
+
+_DOCUMENT_ID = re.compile(r"^[0-9a-f]{64}$")
+
+_metadata = OrderedDict()  # document id -> document.json contents, least recently used first
+_open = OrderedDict()  # document id -> open PyMuPDF document, least recently used first
+_locks = {}  # document id -> threading.Lock, held while a handle is in use
+_registry_lock = threading.Lock()
+
+
+def document_dir(document_id: str) -> str:
+    return os.path.join(DOCUMENTS_DIR, document_id)
+
+
+def data_path(document_id: str) -> str:
+    return os.path.join(document_dir(document_id), "data")
+
+
+def _forget(document_id: str):
+    with _registry_lock:
+        _metadata.pop(document_id, None)
+        lock = _locks.setdefault(document_id, threading.Lock())
+    # Waits for a render that is still using the handle
+    with lock:
+        with _registry_lock:
+            doc = _open.pop(document_id, None)
+        if doc is not None:
+            doc.close()
+
+
+def read_document(document_id: str) -> Optional[dict]:
+    """The document's metadata, or None if it is not in the store. Counts as a use."""
+    if not _DOCUMENT_ID.match(document_id or ""):
+        return None
+    path = os.path.join(document_dir(document_id), "document.json")
+    try:
+        # Records the use, and fails if another worker deleted the document
+        os.utime(path)
+    except FileNotFoundError:
+        _forget(document_id)
+        return None
+
+    with _registry_lock:
+        state = _metadata.get(document_id)
+        if state is not None:
+            _metadata.move_to_end(document_id)
+            return state
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    with _registry_lock:
+        _metadata[document_id] = state
+        while len(_metadata) > DOCUMENT_CACHE_SIZE:
+            _metadata.popitem(last=False)
+    return state
+
+
+def store_document(path: str, filename: str, preflight: dict) -> Tuple[dict, bool]:
+    """
+    Adds the file at path to the store (hard-linked when possible) and returns
+    (its metadata, whether it was new). A file already stored is not written again.
+    """
+    with span("hash"):
+        document_id = file_sha256(path)
+    state = read_document(document_id)
+    if state is not None:
+        return state, False
+
+    # Assembled under a temporary name and renamed into place, so other workers
+    # never see a half-written document
+    os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+    tmp_dir = os.path.join(DOCUMENTS_DIR, f".{uuid.uuid4().hex}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        try:
+            os.link(path, os.path.join(tmp_dir, "data"))
+        except OSError:
+            shutil.copyfile(path, os.path.join(tmp_dir, "data"))
+            # Only a copy of its own is made read-only: a link shares its mode
+            # with the caller's file (and whatever else links to it, like a
+            # chunked upload). Tools never write to their inputs in place.
+            os.chmod(os.path.join(tmp_dir, "data"), 0o444)
+        state = {
+            "id": document_id,
+            "filename": os.path.basename(filename),
+            "size": os.path.getsize(path),
+            "preflight": preflight,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(tmp_dir, "document.json"), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        try:
+            os.rename(tmp_dir, document_dir(document_id))
+        except OSError:
+            # Another worker stored the same bytes first
+            existing = read_document(document_id)
+            if existing is None:
+                raise
+            return existing, False
+    finally:
+        cleanup_dir(tmp_dir)
+    return state, True
+
+
+@contextmanager
+def open_document(document_id: str):
+    """Yields the worker's open PyMuPDF handle for a stored PDF, opening it on first use."""
+    import fitz  # PyMuPDF
+
+    with _registry_lock:
+        lock = _locks.setdefault(document_id, threading.Lock())
+    with lock:
+        with _registry_lock:
+            doc = _open.get(document_id)
+            if doc is not None:
+                _open.move_to_end(document_id)
+        if doc is None:
+            with span("parse"):
+                doc = fitz.open(data_path(document_id), filetype="pdf")
+            with _registry_lock:
+                _open[document_id] = doc
+        _close_least_recent(keep=document_id)
+        yield doc
+
+
+def _close_least_recent(keep: str):
+    with _registry_lock:
+        excess = len(_open) - DOCUMENT_MAX_OPEN
+        candidates = [document_id for document_id in _open if document_id != keep][:max(excess, 0)]
+    for document_id in candidates:
+        # A handle another thread is rendering from is left for a later call
+        lock = _locks.get(document_id)
+        if lock is not None and lock.acquire(blocking=False):
+            try:
+                with _registry_lock:
+                    doc = _open.pop(document_id, None)
+                if doc is not None:
+                    doc.close()
+            finally:
+                lock.release()
+
+
+def render_preview(document_id: str, page_index: int, zoom: float, highlights=()) -> bytes:
+    """PNG of a single page of a stored PDF, with `highlights` (rectangles in points) tinted."""
+    import fitz  # PyMuPDF
+
+    with open_document(document_id) as doc:
+        if not 0 <= page_index < len(doc):
+            raise IndexError(page_index)
+        page = doc[page_index]
+        zoom = capped_zoom(page.rect, zoom)
+        with span("render"):
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            if highlights:
+                tint_rects(pix, highlights, zoom)
+        with span("encode"):
+            return pix.tobytes("png")
+
+
+def delete_document(document_id: str):
+    _forget(document_id)
+    cleanup_dir(document_dir(document_id))
+
+
+def _last_used(document_id: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(os.path.join(document_dir(document_id), "document.json"))
+    except OSError:
+        return None
+
+
+def purge_documents():
+    """Removes documents unused for DOCUMENT_TTL_SECONDS, then the least recently used above DOCUMENT_STORE_MAX_BYTES."""
+    if not os.path.isdir(DOCUMENTS_DIR):
+        return
+    now = time.time()
+    kept = []
+    for document_id in os.listdir(DOCUMENTS_DIR):
+        if not _DOCUMENT_ID.match(document_id):
+            continue
+        last_used = _last_used(document_id)
+        if last_used is None:
+            continue
+        if now - last_used > DOCUMENT_TTL_SECONDS:
+            delete_document(document_id)
+            continue
+        try:
+            kept.append((last_used, document_id, os.path.getsize(data_path(document_id))))
+        except OSError:
+            continue
+
+    total = sum(size for _, _, size in kept)
+    for _, document_id, size in sorted(kept):
+        if total <= DOCUMENT_STORE_MAX_BYTES:
+            break
+        delete_document(document_id)
+        total -= size
@@ -0,0 +1,277 @@
+"""
+Edit sessions: a PDF that is opened once and then changed with small deltas,
+instead of re-uploading the document and every edit on each change.
+
+Layout of outputs/edit_sessions/<id>/:
+    session.json    filename, page count, version and the operations applied so far
+    document.pdf    the working document; every change is appended to it with an
+                    incremental save, so only the touched objects are written
+    lock            held with flock while a request reads or changes the session
+
+PyMuPDF appends each drawing (text, shape, image placement) to its page as new
+content streams. draw_tracked() records their xrefs with the operation, so
+deleting an operation only drops those streams from the page's /Contents, and
+moving one drops them and draws it again; the rest of the document is untouched.
+
+Every uvicorn worker keeps the sessions it used recently open (at most
+EDIT_SESSION_MAX_OPEN, closed after EDIT_SESSION_IDLE_SECONDS). The version in
+session.json tells a worker that another one changed the file under its handle,
+in which case the document is reopened.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+from core.config import EDIT_SESSION_IDLE_SECONDS, EDIT_SESSION_MAX_OPEN, EDIT_SESSION_TTL_SECONDS
+from core.render import capped_zoom
+from core.timing import span
+from core.utils import cleanup_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SESSIONS_DIR = os.path.join("outputs", "edit_sessions")
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class SessionNotFound(LookupError):
+    pass
+
+
+class _Handle:
+    def __init__(self, doc, version: int):
+        self.doc = doc
+        self.version = version
+        self.used_at = time.monotonic()
+
+
+_open = OrderedDict()  # session id -> _Handle, least recently used first
+_locks = {}  # session id -> threading.Lock
+_registry_lock = threading.Lock()
+
+
+def session_dir(session_id: str) -> str:
+    return os.path.join(SESSIONS_DIR, session_id)
+
+
+def document_path(session_id: str) -> str:
+    return os.path.join(session_dir(session_id), "document.pdf")
+
+
+def write_session(state: dict):
+    state["updated_at"] = time.time()
+    path = os.path.join(session_dir(state["id"]), "session.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def read_session(session_id: str) -> Optional[dict]:
+    if not _SESSION_ID.match(session_id or ""):
+        return None
+    try:
+        with open(os.path.join(session_dir(session_id), "session.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def create_session(filename: str, input_path: str) -> dict:
+    """Copies input_path into a new session (one full save) and returns its state."""
+    import fitz  # PyMuPDF
+
+    state = {
+        "id": uuid.uuid4().hex,
+        "filename": os.path.basename(filename),
+        "pages": 0,
+        "version": 0,
+        "operations": [],
+        "created_at": time.time(),
+    }
+    os.makedirs(session_dir(state["id"]), exist_ok=True)
+    with span("parse"):
+        doc = fitz.open(input_path)
+    try:
+        state["pages"] = len(doc)
+        # A fresh file (never the upload itself, which may be hard-linked
+        # elsewhere) that later changes can be appended to
+        with span("write"):
+            doc.save(document_path(state["id"]))
+    finally:
+        doc.close()
+    write_session(state)
+    return state
+
+
+@contextmanager
+def _session_lock(session_id: str):
+    with _registry_lock:
+        lock = _locks.setdefault(session_id, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(os.path.join(session_dir(session_id), "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # Closing the descriptor drops the lock
+            os.close(fd)
+
+
+def _close_handle(session_id: str):
+    with _registry_lock:
+        handle = _open.pop(session_id, None)
+    if handle is not None:
+        handle.doc.close()
+
+
+def _close_idle(keep: str):
+    """Closes handles unused for EDIT_SESSION_IDLE_SECONDS, and the oldest ones above EDIT_SESSION_MAX_OPEN."""
+    now = time.monotonic()
+    with _registry_lock:
+        excess = len(_open) - EDIT_SESSION_MAX_OPEN
+        candidates = [
+            session_id for index, (session_id, handle) in enumerate(_open.items())
+            if session_id != keep and (index < excess or now - handle.used_at >= EDIT_SESSION_IDLE_SECONDS)
+        ]
+    for session_id in candidates:
+        # A session another thread is working on is left for a later sweep
+        lock = _locks.get(session_id)
+        if lock is not None and lock.acquire(blocking=False):
+            try:
+                _close_handle(session_id)
+            finally:
+                lock.release()
+
+
+def _document(state: dict):
+    import fitz  # PyMuPDF
+
+    handle = _open.get(state["id"])
+    if handle is not None and handle.version != state["version"]:
+        # Another worker saved a newer version since this one opened it
+        _close_handle(state["id"])
+        handle = None
+    if handle is None:
+        with span("parse"):
+            handle = _Handle(fitz.open(document_path(state["id"])), state["version"])
+    handle.used_at = time.monotonic()
+    with _registry_lock:
+        _open[state["id"]] = handle
+        _open.move_to_end(state["id"])
+    _close_idle(keep=state["id"])
+    return handle.doc
+
+
+@contextmanager
+def locked_session(session_id: str, write: bool = False):
+    """
+    Yields (state, doc) for the session, holding its lock. With write=True the
+    document is saved incrementally and the new version recorded on exit; if the
+    block raises, the in-memory document is dropped and nothing is saved.
+    """
+    if read_session(session_id) is None:
+        raise SessionNotFound(session_id)
+    with _session_lock(session_id):
+        state = read_session(session_id)
+        if state is None:
+            raise SessionNotFound(session_id)
+        doc = _document(state)
+        try:
+            yield state, doc
+            if write:
+                with span("write"):
+                    doc.saveIncr()
+                state["version"] += 1
+                write_session(state)
+                # MuPDF cannot append a second incremental section from the
+                # same handle (the file comes out needing repair), so the
+                # handle is reopened; that reads only the xref, a few ms
+                _close_handle(session_id)
+                _document(state)
+        except BaseException:
+            if write:
+                _close_handle(session_id)
+            raise
+
+
+def draw_tracked(doc, page_index: int, draw):
+    """
+    Calls draw(page) and returns (the xrefs of the content streams it added,
+    draw's return value).
+    """
+    page = doc[page_index]
+    if not page.is_wrapped:
+        # Done once per page, so PyMuPDF's own q/Q wrapping streams are not
+        # mistaken for part of the first operation
+        page.wrap_contents()
+    before = set(page.get_contents())
+    result = draw(page)
+    return [xref for xref in page.get_contents() if xref not in before], result
+
+
+def remove_streams(doc, page_index: int, xrefs: List[int]):
+    """Drops content streams from the page's /Contents (the objects go away on the final full save)."""
+    page = doc[page_index]
+    remaining = [xref for xref in page.get_contents() if xref not in set(xrefs)]
+    doc.xref_set_key(page.xref, "Contents", "[" + " ".join(f"{xref} 0 R" for xref in remaining) + "]")
+
+
+def render_preview(session_id: str, page_index: int, zoom: float) -> bytes:
+    """PNG of a single page of the session's current document."""
+    import fitz  # PyMuPDF
+
+    with locked_session(session_id) as (state, doc):
+        if not 0 <= page_index < len(doc):
+            raise IndexError(page_index)
+        page = doc[page_index]
+        zoom = capped_zoom(page.rect, zoom)
+        with span("render"):
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        with span("encode"):
+            return pix.tobytes("png")
+
+
+def export_session(session_id: str, output_path: str):
+    """Writes a compact copy of the session's document, without the dropped objects."""
+    import fitz  # PyMuPDF
+
+    # A separate handle: garbage collection renumbers objects, which would
+    # invalidate the stream xrefs recorded for the open document
+    with locked_session(session_id):
+        with span("parse"):
+            doc = fitz.open(document_path(session_id))
+        try:
+            with span("write"):
+                doc.save(output_path, garbage=3, deflate=True)
+        finally:
+            doc.close()
+
+
+def delete_session(session_id: str):
+    with _session_lock(session_id):
+        _close_handle(session_id)
+        cleanup_dir(session_dir(session_id))
+
+
+def purge_expired_sessions():
+    """Removes sessions not changed for EDIT_SESSION_TTL_SECONDS."""
+    if not os.path.isdir(SESSIONS_DIR):
+        return
+    now = time.time()
+    for session_id in os.listdir(SESSIONS_DIR):
+        state = read_session(session_id)
+        if state is not None and now - state["updated_at"] > EDIT_SESSION_TTL_SECONDS:
+            delete_session(session_id)
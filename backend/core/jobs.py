@@ -0,0 +1,99 @@
+"""
+Disk-backed job state. Every uvicorn worker and every pool process sees the
+same jobs because state lives in outputs/jobs/<id>/job.json, not in memory.
+"""
+import json
+import os
+import re
+import time
+import uuid
+from typing import Optional
+
+from core.config import JOB_TTL_SECONDS, JOB_PROGRESS_INTERVAL
+from core.utils import cleanup_dir
+
+JOBS_DIR = os.path.join("outputs", "jobs")
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+TERMINAL_STATES = ("done", "error")
+
+
+def job_dir(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def write_job(job: dict):
+    """Writes the job state atomically so readers never see a half-written file."""
+    job["updated_at"] = time.time()
+    path = os.path.join(job_dir(job["id"]), "job.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+def read_job(job_id: str) -> Optional[dict]:
+    if not _JOB_ID.match(job_id):
+        return None
+    try:
+        with open(os.path.join(job_dir(job_id), "job.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def create_job(tool: str, filename: str) -> dict:
+    job = {
+        "id": uuid.uuid4().hex,
+        "tool": tool,
+        "filename": filename,
+        "status": "queued",
+        "progress": {"done": 0, "total": None},
+        "error": None,
+        "result_id": None,
+        "created_at": time.time(),
+    }
+    os.makedirs(job_dir(job["id"]), exist_ok=True)
+    write_job(job)
+    return job
+
+
+def update_job(job_id: str, **fields) -> Optional[dict]:
+    job = read_job(job_id)
+    if job is None:
+        return None
+    job.update(fields)
+    write_job(job)
+    return job
+
+
+def purge_expired_jobs():
+    """Removes finished jobs older than JOB_TTL_SECONDS."""
+    if not os.path.isdir(JOBS_DIR):
+        return
+    now = time.time()
+    for job_id in os.listdir(JOBS_DIR):
+        job = read_job(job_id)
+        if job is None:
+            continue
+        if job["status"] in TERMINAL_STATES and now - job["updated_at"] > JOB_TTL_SECONDS:
+            cleanup_dir(job_dir(job_id))
+
+
+class ProgressReporter:
+    """
+    progress(done, total) callback for the page loops. Writes are throttled to
+    JOB_PROGRESS_INTERVAL so a fast loop does not turn into a disk write per page.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    def __call__(self, done: int, total: int):
+        now = time.monotonic()
+        if done < total and now - self._last_write < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        update_job(self.job_id, progress={"done": done, "total": total})
@@ -0,0 +1,166 @@
+"""
+Prometheus metrics for every route.
+
+The API runs under several uvicorn workers, so when PROMETHEUS_MULTIPROC_DIR
+is set (see the Dockerfile) every process writes its samples there and
+/metrics aggregates all of them. Without it (tests, local runs) the metrics
+only cover the current process.
+"""
+import os
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(2 ** power for power in range(10, 32, 2))  # 1 KiB .. 1 GiB
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+REQUESTS = Counter(
+    "pdftools_requests_total", "Requests handled, by route and status code.", ["route", "method", "status"]
+)
+ERRORS = Counter(
+    "pdftools_request_errors_total", "Requests that ended in a 5xx or an unhandled exception.", ["route"]
+)
+LATENCY = Histogram(
+    "pdftools_request_duration_seconds", "Time until the response was fully sent.", ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+INPUT_BYTES = Histogram(
+    "pdftools_request_input_bytes", "Size of the request body.", ["route"], buckets=BYTES_BUCKETS
+)
+OUTPUT_BYTES = Histogram(
+    "pdftools_response_output_bytes", "Size of the response body.", ["route"], buckets=BYTES_BUCKETS
+)
+PAGES = Histogram(
+    "pdftools_document_pages", "Pages in the document processed by the request.", ["route"],
+    buckets=PAGE_BUCKETS,
+)
+SECONDS_PER_PAGE = Histogram(
+    "pdftools_seconds_per_page", "Request duration divided by its page count.", ["route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+IN_FLIGHT = Gauge(
+    "pdftools_requests_in_flight", "Requests currently being handled.", ["route"],
+    multiprocess_mode="livesum",
+)
+
+# Per-request record shared with the handler (sync handlers get a copy of the context,
+# but the dict itself is the same object)
+_current_request: ContextVar[Optional[dict]] = ContextVar("metrics_request", default=None)
+
+UNMATCHED_ROUTE = "unmatched"
+EXCLUDED_PATHS = ("/metrics",)
+
+
+def observe_pages(count: int, in_request: bool = True):
+    """
+    Records the page count of the document handled by the current request.
+
+    It must be called in the request's own process: pool work (batch items,
+    jobs) has no request context, so those routes count pages from the
+    preflight reports. in_request=False is for work that runs after the
+    response (jobs), whose pages are not divided into the request's duration.
+    """
+    record = _current_request.get()
+    if record is not None:
+        record["pages"] = count
+        record["timed"] = in_request
+
+
+def _template_pattern(template: str):
+    return re.compile("^" + re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(template)) + "$")
+
+
+class RouteLabels:
+    """
+    Maps a request path to its route template (e.g. /jobs/{job_id}) so label
+    cardinality stays bounded. Built lazily from the OpenAPI paths, which
+    include the router prefixes.
+    """
+
+    def __init__(self):
+        self._patterns = None
+
+    def __call__(self, app, path: str) -> str:
+        if self._patterns is None:
+            templates = sorted(app.openapi().get("paths", {}), key=lambda t: (t.count("{"), t))
+            self._patterns = [(_template_pattern(t), t) for t in templates]
+        for pattern, template in self._patterns:
+            if pattern.match(path):
+                return template
+        return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.route_label = RouteLabels()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        route = self.route_label(scope["app"], scope["path"])
+        record = {"pages": None, "timed": True, "input_bytes": 0, "output_bytes": 0, "status": 500}
+        token = _current_request.set(record)
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                record["input_bytes"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                record["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                record["output_bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        IN_FLIGHT.labels(route).inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        except Exception:
+            record["status"] = 500
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            IN_FLIGHT.labels(route).dec()
+            _current_request.reset(token)
+
+            REQUESTS.labels(route, scope["method"], str(record["status"])).inc()
+            if record["status"] >= 500:
+                ERRORS.labels(route).inc()
+            LATENCY.labels(route).observe(duration)
+            INPUT_BYTES.labels(route).observe(record["input_bytes"])
+            OUTPUT_BYTES.labels(route).observe(record["output_bytes"])
+            if record["pages"]:
+                PAGES.labels(route).observe(record["pages"])
+                if record["timed"]:
+                    SECONDS_PER_PAGE.labels(route).observe(duration / record["pages"])
+
+
+def render_metrics():
+    """Returns (body, content type) for the /metrics endpoint."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead():
+    """Drops this worker's live gauges so in-flight counts do not linger after it exits."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
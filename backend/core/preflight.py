@@ -0,0 +1,220 @@
+"""
+Preflight: cheap structural checks of an input before any tool touches it.
+
+Endpoints used to trust the file extension, so a truncated or encrypted PDF, a
+renamed Word document, a decompression bomb or a 100k-page PDF went straight
+into PyMuPDF/pdf2docx/tabula and failed minutes later. check_file() instead:
+
+- sniffs the magic bytes and compares them with the extension (a .pdf that is
+  really a .docx is rejected with a hint to the right tool)
+- for PDFs, opens the xref without rendering or decoding any content stream and
+  reports page count, encryption, largest page, declared stream bytes and the
+  decoded size the image headers claim (limited per image: that is where
+  decompression bombs show up, while long scans only add up many small ones).
+  The dictionaries cost about 6 µs per object, so a 2000-page scan of a few
+  thousand objects takes under 100 ms and PREFLIGHT_MAX_OBJECTS bounds the rest
+- for Office files, reads the ZIP directory (never the members) for the main
+  part, the entry count and the declared uncompressed size
+
+and raises PreflightError (with an HTTP status) when a limit in core.config is
+exceeded. It runs from the input_file/input_files dependencies (core.uploads),
+so every tool gets it before its handler starts.
+"""
+import logging
+import os
+import re
+import zipfile
+
+from core.config import (
+    PREFLIGHT_MAX_IMAGE_BYTES, PREFLIGHT_MAX_OBJECTS, PREFLIGHT_MAX_PAGE_INCHES, PREFLIGHT_MAX_PAGES,
+    PREFLIGHT_MAX_UNZIPPED_BYTES, PREFLIGHT_MAX_ZIP_ENTRIES,
+)
+
+# The PDF header may follow some junk, but must start within the first KiB
+PDF_HEADER_WINDOW = 1024
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGIC = b"PK\x03\x04"
+
+# Office Open XML main part -> (kind, extension, tool that converts it)
+OOXML_PARTS = {
+    "word/document.xml": ("Word document", ".docx", "/convert/word-to-pdf"),
+    "xl/workbook.xml": ("Excel workbook", ".xlsx", "/convert/excel-to-pdf"),
+    "ppt/presentation.xml": ("PowerPoint presentation", ".pptx", "/convert/pptx-to-pdf"),
+}
+LEGACY_EXTENSIONS = (".doc", ".xls", ".ppt")
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = re.compile(r"/Length\s+(\d+)(\s+\d+\s+R)?")
+_IMAGE = re.compile(r"/Subtype\s*/Image\b")
+
+_COMPONENTS = {"/DeviceGray": 1, "/CalGray": 1, "/DeviceRGB": 3, "/CalRGB": 3, "/Lab": 3, "/DeviceCMYK": 4}
+
+
+class PreflightError(ValueError):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff(path: str) -> str:
+    """Returns "pdf", "docx", "xlsx", "pptx", "ole" (legacy Office) or "unknown"."""
+    with open(path, "rb") as f:
+        head = f.read(PDF_HEADER_WINDOW)
+    # Magic bytes at offset 0 first: an Office file may contain "%PDF-" early on
+    if head.startswith(OLE_MAGIC):
+        return "ole"
+    if head.startswith(ZIP_MAGIC):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = set(archive.namelist())
+        except zipfile.BadZipFile:
+            return "unknown"
+        for part, (_, extension, _) in OOXML_PARTS.items():
+            if part in names:
+                return extension[1:]
+        return "unknown"
+    if b"%PDF-" in head:
+        return "pdf"
+    return "unknown"
+
+
+def _describe(kind: str) -> str:
+    for name, extension, tool in OOXML_PARTS.values():
+        if extension[1:] == kind:
+            return f"a {name} ({extension}); use {tool}"
+    if kind == "pdf":
+        return "a PDF"
+    return "not a supported document"
+
+
+def _int_value(doc, value):
+    """A numeric PDF value that may be an indirect reference ("12 0 R")."""
+    kind, text = value
+    if kind == "xref":
+        text = doc.xref_object(int(text.split()[0]))
+    try:
+        return int(float(text))
+    except ValueError:
+        return 0
+
+
+def inspect_pdf(path: str) -> dict:
+    import fitz  # PyMuPDF
+
+    try:
+        doc = fitz.open(path, filetype="pdf")
+    except Exception as e:
+        # MuPDF's message names the spooled path; it stays in the log
+        logger.warning(f"[PREFLIGHT] Could not open {path}: {e}")
+        raise PreflightError(400, "The PDF is damaged and could not be opened.")
+
+    try:
+        report = {
+            "kind": "pdf",
+            "size": os.path.getsize(path),
+            "pages": 0,
+            "encrypted": bool(doc.is_encrypted),
+            "repaired": bool(doc.is_repaired),
+            "objects": doc.xref_length(),
+            "max_page_width_pt": 0.0,
+            "max_page_height_pt": 0.0,
+            "declared_stream_bytes": 0,
+            "declared_image_bytes": 0,
+            "images": 0,
+        }
+        if doc.needs_pass:
+            raise PreflightError(400, "The PDF is password protected. Remove the password and try again.")
+
+        report["pages"] = doc.page_count
+        if report["pages"] == 0:
+            raise PreflightError(400, "The PDF has no readable pages; it may be truncated or damaged.")
+        if report["pages"] > PREFLIGHT_MAX_PAGES:
+            raise PreflightError(413, f"The PDF has {report['pages']} pages; the limit is {PREFLIGHT_MAX_PAGES}.")
+        if report["objects"] > PREFLIGHT_MAX_OBJECTS:
+            raise PreflightError(413, f"The PDF has {report['objects']} objects; the limit is {PREFLIGHT_MAX_OBJECTS}.")
+
+        # Page boxes come from the page dictionaries; nothing is rendered
+        for index in range(report["pages"]):
+            rect = doc.page_cropbox(index)
+            report["max_page_width_pt"] = max(report["max_page_width_pt"], rect.width)
+            report["max_page_height_pt"] = max(report["max_page_height_pt"], rect.height)
+        largest = max(report["max_page_width_pt"], report["max_page_height_pt"]) / 72
+        if largest > PREFLIGHT_MAX_PAGE_INCHES:
+            raise PreflightError(
+                413, f"A page is {largest:.0f} inches long; the limit is {PREFLIGHT_MAX_PAGE_INCHES:.0f}."
+            )
+
+        # Dictionaries only, never the stream data: /Length is what is stored,
+        # an image's header is what decoding would produce. One
+        # xref_object() per object and a regex are several times cheaper than
+        # asking MuPDF for each key, which matters near PREFLIGHT_MAX_OBJECTS;
+        # only images are read key by key.
+        for xref in range(1, report["objects"]):
+            source = doc.xref_object(xref, compressed=True)
+            length = _LENGTH.search(source)
+            if length:
+                if length.group(2):
+                    report["declared_stream_bytes"] += _int_value(doc, doc.xref_get_key(xref, "Length"))
+                else:
+                    report["declared_stream_bytes"] += int(length.group(1))
+            if not _IMAGE.search(source):
+                continue
+            report["images"] += 1
+            width = _int_value(doc, doc.xref_get_key(xref, "Width"))
+            height = _int_value(doc, doc.xref_get_key(xref, "Height"))
+            bits = _int_value(doc, doc.xref_get_key(xref, "BitsPerComponent")) or 8
+            components = _COMPONENTS.get(doc.xref_get_key(xref, "ColorSpace")[1], 3)
+            image_bytes = width * height * components * bits // 8
+            report["declared_image_bytes"] += image_bytes
+            # A decompression bomb is one image claiming a huge size; a long
+            # scan is many ordinary ones, so only single images are limited
+            if image_bytes > PREFLIGHT_MAX_IMAGE_BYTES:
+                raise PreflightError(
+                    413,
+                    f"An image in the PDF would decode to {image_bytes / 2**30:.1f} GiB; "
+                    f"the limit is {PREFLIGHT_MAX_IMAGE_BYTES / 2**30:.1f} GiB per image.",
+                )
+        return report
+    finally:
+        doc.close()
+
+
+def inspect_ooxml(path: str, kind: str) -> dict:
+    with zipfile.ZipFile(path) as archive:
+        entries = archive.infolist()
+    report = {
+        "kind": kind,
+        "size": os.path.getsize(path),
+        "entries": len(entries),
+        "declared_unzipped_bytes": sum(entry.file_size for entry in entries),
+        "media": sum(1 for entry in entries if "/media/" in entry.filename),
+    }
+    if report["entries"] > PREFLIGHT_MAX_ZIP_ENTRIES:
+        raise PreflightError(413, f"The file has {report['entries']} parts; the limit is {PREFLIGHT_MAX_ZIP_ENTRIES}.")
+    if report["declared_unzipped_bytes"] > PREFLIGHT_MAX_UNZIPPED_BYTES:
+        raise PreflightError(
+            413,
+            f"The file would unpack to {report['declared_unzipped_bytes'] / 2**30:.1f} GiB; "
+            f"the limit is {PREFLIGHT_MAX_UNZIPPED_BYTES / 2**30:.1f} GiB.",
+        )
+    return report
+
+
+def check_file(path: str, filename: str) -> dict:
+    """Validates the file at path against its name's extension; returns the preflight report."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in LEGACY_EXTENSIONS or extension not in (".pdf", ".docx", ".xlsx", ".pptx"):
+        # Endpoints reject these themselves, with a more specific message
+        return {"kind": "unchecked", "size": os.path.getsize(path)}
+
+    if os.path.getsize(path) == 0:
+        raise PreflightError(400, "The file is empty.")
+
+    kind = sniff(path)
+    if kind != extension[1:]:
+        raise PreflightError(415, f"The file is named {extension} but is {_describe(kind)}.")
+    if kind == "pdf":
+        return inspect_pdf(path)
+    return inspect_ooxml(path, kind)
@@ -0,0 +1,195 @@
+"""
+Opt-in profiling of single requests.
+
+A request is profiled when it carries `X-Profile-Token: <PROFILE_TOKEN>` or
+when PROFILE_ALL_REQUESTS is on. cProfile is switched on inside the request's
+timing spans (core.timing.span), on whichever thread runs them, so the
+profile covers the conversion work itself (pdf2docx, reportlab, openpyxl...)
+without the server around it. tracemalloc records the peak Python memory.
+
+The result is stored under outputs/profiles/<request id>/ as profile.pstats
+(open with `python -m pstats` or snakeviz) plus a summary.json, and the
+response carries the id in X-Profile-ID. Only one request per worker process
+is profiled at a time; others get `X-Profile-Status: busy`.
+"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextvars import ContextVar
+from typing import Optional
+
+from core.config import PROFILE_ALL_REQUESTS, PROFILE_TOKEN, PROFILE_TTL_SECONDS
+from core.utils import cleanup_dir
+
+PROFILES_DIR = os.path.join("outputs", "profiles")
+TOP_FUNCTIONS = 40
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+_active_lock = threading.Lock()
+
+
+def profile_dir(request_id: str) -> str:
+    return os.path.join(PROFILES_DIR, request_id)
+
+
+def token_matches(value: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and value is not None and hmac.compare_digest(value, PROFILE_TOKEN)
+
+
+class ProfileSession:
+    """One profiled request: a cProfile.Profile per thread that ran one of its spans."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self._profiles = {}
+        self._depth = {}
+        self._lock = threading.Lock()
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+
+    def enter(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(thread_id, 0)
+            self._depth[thread_id] = depth + 1
+            if depth:
+                return
+            profile = self._profiles.setdefault(thread_id, cProfile.Profile())
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows a single active profiler per interpreter
+            pass
+
+    def exit(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._depth[thread_id] -= 1
+            if self._depth[thread_id]:
+                return
+            profile = self._profiles[thread_id]
+        profile.disable()
+
+    def finish(self, method: str, path: str, status: int) -> Optional[dict]:
+        _, peak = tracemalloc.get_traced_memory()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+        summary = {
+            "request_id": self.request_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "tracemalloc_peak_bytes": peak,
+            "threads": len(self._profiles),
+            "top": [],
+        }
+
+        os.makedirs(profile_dir(self.request_id), exist_ok=True)
+        if self._profiles:
+            profiles = list(self._profiles.values())
+            stats = pstats.Stats(profiles[0], stream=io.StringIO())
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(profile_dir(self.request_id), "profile.pstats"))
+            summary["top"] = top_functions(stats)
+
+        with open(os.path.join(profile_dir(self.request_id), "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def top_functions(stats: pstats.Stats, limit: int = TOP_FUNCTIONS) -> list:
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{line}({function})",
+            "calls": calls,
+            "tottime_ms": round(tottime * 1000, 2),
+            "cumtime_ms": round(cumtime * 1000, 2),
+        })
+    rows.sort(key=lambda row: row["cumtime_ms"], reverse=True)
+    return rows[:limit]
+
+
+def span_entered():
+    session = _session.get()
+    if session is not None:
+        session.enter()
+    return session
+
+
+def read_summary(request_id: str) -> Optional[dict]:
+    if not _PROFILE_ID.match(request_id):
+        return None
+    try:
+        with open(os.path.join(profile_dir(request_id), "summary.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def purge_expired_profiles():
+    if not os.path.isdir(PROFILES_DIR):
+        return
+    now = time.time()
+    for request_id in os.listdir(PROFILES_DIR):
+        path = profile_dir(request_id)
+        if now - os.path.getmtime(path) > PROFILE_TTL_SECONDS:
+            cleanup_dir(path)
+
+
+class ProfilingMiddleware:
+    """Must run inside TimingMiddleware, which assigns the request id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILE_ALL_REQUESTS or PROFILE_TOKEN):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        requested = PROFILE_ALL_REQUESTS or token_matches(headers.get(b"x-profile-token", b"").decode("latin-1"))
+        if not requested:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = scope["state"]["request_id"]
+        acquired = _active_lock.acquire(blocking=False)
+        session = ProfileSession(request_id) if acquired else None
+        status = {"code": 500}
+
+        async def tagged_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                extra = (b"x-profile-id", request_id.encode()) if session else (b"x-profile-status", b"busy")
+                message["headers"] = list(message.get("headers", [])) + [extra]
+            await send(message)
+
+        token = _session.set(session)
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            _session.reset(token)
+            if session is not None:
+                try:
+                    purge_expired_profiles()
+                    session.finish(scope["method"], scope["path"], status["code"])
+                finally:
+                    _active_lock.release()
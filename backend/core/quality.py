@@ -0,0 +1,115 @@
+"""
+Load-adaptive render quality for compress-pdf, pdf-to-jpg and pdf-to-pptx.
+
+When the machine is saturated we would rather answer at lower fidelity than
+time out. Load is the larger of the CPU load (1-minute load average per core)
+and how full the render class's admission queue is (core.admission). It picks
+one of three tiers:
+
+    full     the tool's normal zoom/DPI, JPEG quality and encoder effort
+    reduced  between full and the configured floor, JPEG `optimize` off
+    minimal  QUALITY_MIN_SCALE x the zoom/DPI, JPEG quality capped at QUALITY_MIN_JPEG
+
+Going down happens as soon as load crosses a threshold; going back up only
+once it is RECOVERY_MARGIN below it, so the tier does not flap. The tier a
+response was rendered with is sent in X-Quality-Tier. QUALITY_ADAPTIVE=0 pins
+every request to "full".
+"""
+import os
+import threading
+import time
+from typing import NamedTuple
+
+from prometheus_client import Counter
+
+from core.config import QUALITY_ADAPTIVE, QUALITY_MIN_JPEG, QUALITY_MIN_SCALE
+
+# Load at which each degraded tier starts
+REDUCED_AT = 0.75
+MINIMAL_AT = 1.0
+RECOVERY_MARGIN = 0.15
+SAMPLE_INTERVAL = 1.0  # seconds between load readings
+
+TIER_HEADER = "X-Quality-Tier"
+
+TIERS_APPLIED = Counter(
+    "pdftools_quality_tier_total", "Render requests by the quality tier they were served at.", ["tier"]
+)
+
+
+class QualityTier(NamedTuple):
+    name: str
+    scale: float
+    jpeg_cap: int
+    optimize: bool
+
+    def zoom(self, value: float) -> float:
+        return value * self.scale
+
+    def jpeg_quality(self, value: int) -> int:
+        return min(value, self.jpeg_cap)
+
+    @property
+    def headers(self) -> dict:
+        return {TIER_HEADER: self.name}
+
+
+FULL = QualityTier("full", 1.0, 100, True)
+REDUCED = QualityTier("reduced", (1 + QUALITY_MIN_SCALE) / 2, max(QUALITY_MIN_JPEG, 80), False)
+MINIMAL = QualityTier("minimal", QUALITY_MIN_SCALE, QUALITY_MIN_JPEG, False)
+TIERS = (FULL, REDUCED, MINIMAL)
+
+
+def cpu_load() -> float:
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):  # Windows
+        return 0.0
+
+
+def queue_load() -> float:
+    from core.admission import get_governors
+
+    governor = get_governors().get("render")
+    if governor is None or not governor.queue_size:
+        return 0.0
+    return governor.queue.in_use() / governor.queue_size
+
+
+class QualityPolicy:
+    def __init__(self, load=None):
+        self.load = load or (lambda: max(cpu_load(), queue_load()))
+        self.level = 0
+        self._sampled_at = None
+        self._lock = threading.Lock()
+
+    def _target_level(self, load: float) -> int:
+        thresholds = (REDUCED_AT, MINIMAL_AT)
+        level = self.level
+        # Step down (worse quality) as soon as a threshold is crossed...
+        while level < len(thresholds) and load >= thresholds[level]:
+            level += 1
+        # ...but only step back up with some margin below it
+        while level > 0 and load < thresholds[level - 1] - RECOVERY_MARGIN:
+            level -= 1
+        return level
+
+    def current(self) -> QualityTier:
+        if not QUALITY_ADAPTIVE:
+            return FULL
+        with self._lock:
+            now = time.monotonic()
+            if self._sampled_at is None or now - self._sampled_at >= SAMPLE_INTERVAL:
+                self._sampled_at = now
+                self.level = self._target_level(self.load())
+            return TIERS[self.level]
+
+
+_policy = QualityPolicy()
+
+
+def current_tier() -> QualityTier:
+    """The tier the calling request should render at (counted in the metrics)."""
+    tier = _policy.current()
+    TIERS_APPLIED.labels(tier.name).inc()
+    return tier
@@ -0,0 +1,74 @@
+"""
+Page rasterisation with a pixel budget.
+
+A fixed zoom is fine for A4 but an A0 drawing at 3x is ~70 megapixels, and a
+banner PDF far more. render_rgb() caps every page at RENDER_MAX_PIXELS by
+lowering its zoom, and pages above RENDER_BAND_PIXELS are rendered in
+horizontal bands (clip rectangles) pasted straight into the RGB image the
+encoder reads, so MuPDF never holds more than one band and the page is not
+copied through a full-size pixmap, PNG and PIL conversion on the way.
+"""
+import logging
+import math
+from typing import Sequence
+
+from PIL import Image
+
+from core.config import RENDER_BAND_PIXELS, RENDER_MAX_PIXELS
+from core.timing import span
+
+logger = logging.getLogger(__name__)
+
+
+def capped_zoom(rect, zoom: float, max_pixels: int = RENDER_MAX_PIXELS) -> float:
+    """zoom, lowered just enough for `rect` (in points) to stay within max_pixels."""
+    pixels = rect.width * rect.height * zoom * zoom
+    if pixels <= max_pixels or pixels == 0:
+        return zoom
+    return math.sqrt(max_pixels / (rect.width * rect.height))
+
+
+def render_rgb(page, zoom: float, max_pixels: int = RENDER_MAX_PIXELS,
+               band_pixels: int = RENDER_BAND_PIXELS) -> Image.Image:
+    """Renders `page` on a white background as an RGB image, within the pixel budget."""
+    import fitz  # PyMuPDF
+
+    effective = capped_zoom(page.rect, zoom, max_pixels)
+    if effective < zoom:
+        logger.info(
+            "Page %s is %.0fx%.0f pt; rendering at %.2fx instead of %.2fx",
+            page.number + 1, page.rect.width, page.rect.height, effective, zoom,
+        )
+    matrix = fitz.Matrix(effective, effective)
+    area = (page.rect * matrix).irect
+
+    with span("render"):
+        if area.width * area.height <= band_pixels:
+            pix = page.get_pixmap(matrix=matrix, alpha=False)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+        image = Image.new("RGB", (area.width, area.height), "white")
+        band_height = max(1, band_pixels // area.width)
+        for top in range(area.y0, area.y1, band_height):
+            # The clip is in page coordinates; MuPDF rounds the band outwards,
+            # so bands may overlap by a row, which pasting makes harmless
+            clip = fitz.Rect(area.x0, top, area.x1, min(top + band_height, area.y1)) * ~matrix
+            pix = page.get_pixmap(matrix=matrix, clip=clip, alpha=False)
+            offset = (pix.x - area.x0, pix.y - area.y0)
+            band = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            pix = None
+            image.paste(band, offset)
+            band.close()
+        return image
+
+
+def tint_rects(pix, rects: Sequence[Sequence[float]], zoom: float):
+    """Highlights rectangles (in points, at `zoom`) of an RGB pixmap in yellow, in place."""
+    import numpy as np
+
+    pixels = np.ndarray((pix.height, pix.stride), dtype=np.uint8, buffer=pix.samples_mv)
+    pixels = pixels[:, :pix.width * 3].reshape(pix.height, pix.width, 3)
+    for x0, y0, x1, y1 in rects:
+        region = pixels[max(int(y0 * zoom), 0):int(y1 * zoom) + 1, max(int(x0 * zoom), 0):int(x1 * zoom) + 1]
+        # Multiplying out the blue keeps the text under the highlight legible
+        region[..., 2] = region[..., 2] * 0.3
@@ -0,0 +1,122 @@
+"""
+Retained tool outputs. Instead of deleting a result right after the response,
+endpoints hand it to retain_result(), which keeps it for RESULT_TTL_SECONDS
+under a stable /results/<id> URL. Downloads carry a strong ETag (the SHA-256 of
+the content), so a repeat fetch with If-None-Match costs a 304 and an
+interrupted download resumes with Range (handled by FileResponse).
+"""
+import json
+import os
+import re
+import time
+import uuid
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from core.config import RESULT_TTL_SECONDS
+from core.timing import span
+from core.utils import cleanup_dir, file_sha256
+
+RESULTS_DIR = os.path.join("outputs", "results")
+
+_RESULT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Expired results are swept at most this often per process, not on every retain
+PURGE_INTERVAL = 60.0
+
+_last_purge = None
+
+
+def result_dir(result_id: str) -> str:
+    return os.path.join(RESULTS_DIR, result_id)
+
+
+def result_url(result_id: str) -> str:
+    return f"/results/{result_id}"
+
+
+def retain_result(path: str, media_type: str, filename: str) -> dict:
+    """Moves a finished output into the result store and returns its metadata."""
+    global _last_purge
+    now = time.monotonic()
+    if _last_purge is None or now - _last_purge >= PURGE_INTERVAL:
+        _last_purge = now
+        purge_expired_results()
+
+    with span("retain"):
+        digest = file_sha256(path)
+
+    result = {
+        "id": uuid.uuid4().hex,
+        "filename": filename,
+        "media_type": media_type,
+        "size": os.path.getsize(path),
+        "sha256": digest,
+        "created_at": time.time(),
+    }
+    os.makedirs(result_dir(result["id"]), exist_ok=True)
+    os.replace(path, os.path.join(result_dir(result["id"]), "data"))
+    with open(os.path.join(result_dir(result["id"]), "result.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    return result
+
+
+def get_result(result_id: str) -> Optional[dict]:
+    if not _RESULT_ID.match(result_id):
+        return None
+    try:
+        with open(os.path.join(result_dir(result_id), "result.json"), encoding="utf-8") as f:
+            result = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if time.time() - result["created_at"] > RESULT_TTL_SECONDS:
+        return None
+    return result
+
+
+def purge_expired_results():
+    if not os.path.isdir(RESULTS_DIR):
+        return
+    now = time.time()
+    for result_id in os.listdir(RESULTS_DIR):
+        try:
+            with open(os.path.join(result_dir(result_id), "result.json"), encoding="utf-8") as f:
+                created_at = json.load(f)["created_at"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            continue
+        if now - created_at > RESULT_TTL_SECONDS:
+            cleanup_dir(result_dir(result_id))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def serve_result(request: Request, result: dict, headers: Optional[dict] = None) -> Response:
+    """
+    Response for a retained result: 304 when the client already has this exact
+    content, otherwise a FileResponse (which also answers Range/If-Range).
+    """
+    etag = f'"{result["sha256"]}"'
+    remaining = max(0, int(result["created_at"] + RESULT_TTL_SECONDS - time.time()))
+    response_headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={remaining}",
+        "Content-Location": result_url(result["id"]),
+        "X-Result-URL": result_url(result["id"]),
+        **(headers or {}),
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=response_headers)
+
+    return FileResponse(
+        os.path.join(result_dir(result["id"]), "data"),
+        media_type=result["media_type"],
+        filename=result["filename"],
+        headers=response_headers,
+    )
@@ -0,0 +1,269 @@
+"""
+Shortest-expected-job-first scheduling in front of the process pool.
+
+Before a job or batch item runs, its duration is estimated from signals that
+are cheap to read: page count, file size, number of embedded images and the
+tool. Inputs come with a preflight report (core.preflight) that already holds
+them, so nothing is parsed again. Each tool has a linear model
+
+    seconds = base + per_page * pages + per_mib * MiB + per_image * images
+
+that starts from rough priors and is refitted from the durations recorded in
+outputs/scheduler/timings.jsonl, which every uvicorn worker appends to. Only
+the last SCHEDULER_HISTORY samples of each tool are used, and the file is
+rewritten with just those once it holds twice as many.
+
+Each API worker hands at most WORKER_POOL_SIZE items to its pool at a time and
+keeps the rest in a heap ordered by expected duration minus SCHEDULER_AGING x
+seconds waited, so a 2-page protect no longer waits behind a 900-page
+compress, and the compress still runs once it has waited long enough.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+import zipfile
+from typing import NamedTuple, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import SCHEDULER_AGING, SCHEDULER_HISTORY, WORKER_POOL_SIZE
+from core.workers import run_in_pool
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_DIR = os.path.join("outputs", "scheduler")
+HISTORY_PATH = os.path.join(SCHEDULER_DIR, "timings.jsonl")
+
+FEATURES = ("pages", "mib", "images")
+# Samples a tool needs before its fitted model replaces the prior
+MIN_SAMPLES = 8
+REFIT_INTERVAL = 30.0
+MIN_ESTIMATE = 0.01
+
+# tool -> (base, per page, per MiB, per image) in seconds
+PRIORS = {
+    "compress-pdf": (0.05, 0.10, 0.05, 0.0),
+    "pdf-to-jpg": (0.05, 0.15, 0.02, 0.0),
+    "pdf-to-pptx": (0.10, 0.15, 0.05, 0.0),
+    "pdf-to-word": (0.30, 0.50, 0.05, 0.05),
+    "pdf-to-excel": (2.00, 0.30, 0.0, 0.0),
+    "protect-pdf": (0.02, 0.002, 0.02, 0.0),
+    "split-pdf": (0.02, 0.003, 0.02, 0.0),
+    "remove-blank-pages": (0.02, 0.005, 0.02, 0.005),
+    "word-to-pdf": (0.30, 0.0, 0.50, 0.05),
+    "excel-to-pdf": (0.30, 0.0, 1.00, 0.0),
+    "pptx-to-pdf": (0.30, 0.0, 0.30, 0.05),
+    "text-index": (0.02, 0.002, 0.0, 0.0),
+}
+DEFAULT_PRIOR = (0.5, 0.1, 0.1, 0.0)
+
+
+class Estimate(NamedTuple):
+    tool: str
+    features: dict
+    seconds: float
+
+
+def features_from_preflight(report: dict) -> Optional[dict]:
+    """The cost features held by a preflight report, or None if it was not inspected."""
+    if report.get("kind") == "pdf":
+        images = report.get("images", 0)
+    elif report.get("kind") in ("docx", "xlsx", "pptx"):
+        images = report.get("media", 0)
+    else:
+        return None
+    return {"pages": report.get("pages", 0), "mib": report["size"] / 2**20, "images": images}
+
+
+def read_features(input_path: str) -> dict:
+    """Page count, size in MiB and image count of input_path, without rendering anything."""
+    features = {"pages": 0, "mib": os.path.getsize(input_path) / 2**20, "images": 0}
+    extension = os.path.splitext(input_path)[1].lower()
+    try:
+        if extension == ".pdf":
+            import fitz
+
+            with fitz.open(input_path) as doc:
+                features["pages"] = doc.page_count
+                features["images"] = sum(
+                    1 for xref in range(1, doc.xref_length())
+                    if doc.xref_get_key(xref, "Subtype") == ("name", "/Image")
+                )
+        elif extension in (".docx", ".xlsx", ".pptx"):
+            with zipfile.ZipFile(input_path) as archive:
+                features["images"] = sum(1 for name in archive.namelist() if "/media/" in name)
+    except Exception as e:
+        # A damaged file still gets scheduled, on its size alone; the tool reports the error
+        logger.warning("Could not read cost features of %s: %s", input_path, e)
+    return features
+
+
+class CostModel:
+    """Per-tool linear duration models, refitted from the shared timing history."""
+
+    def __init__(self, history_path: str = HISTORY_PATH):
+        self.history_path = history_path
+        self.coefficients = {}
+        self._fitted_at = 0.0
+        self._history_mtime = None
+
+    def predict(self, tool: str, features: dict) -> float:
+        self._maybe_refit()
+        coefficients = self.coefficients.get(tool) or PRIORS.get(tool, DEFAULT_PRIOR)
+        row = (1.0,) + tuple(features[name] for name in FEATURES)
+        return max(MIN_ESTIMATE, float(sum(c * x for c, x in zip(coefficients, row))))
+
+    def record(self, tool: str, features: dict, seconds: float):
+        os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+        line = json.dumps({"tool": tool, "seconds": round(seconds, 4), **features}) + "\n"
+        # Single O_APPEND writes from several workers do not interleave
+        fd = os.open(self.history_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+    def _maybe_refit(self):
+        now = time.monotonic()
+        if now - self._fitted_at < REFIT_INTERVAL:
+            return
+        self._fitted_at = now
+        try:
+            mtime = os.path.getmtime(self.history_path)
+        except OSError:
+            return
+        if mtime != self._history_mtime:
+            self._history_mtime = mtime
+            self.fit(self._load_history())
+
+    def _load_history(self) -> dict:
+        samples = {}
+        total = 0
+        with open(self.history_path, encoding="utf-8") as f:
+            for line in f:
+                total += 1
+                try:
+                    sample = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line another worker is still writing
+                samples.setdefault(sample["tool"], []).append(sample)
+        samples = {tool: rows[-SCHEDULER_HISTORY:] for tool, rows in samples.items()}
+        kept = sum(len(rows) for rows in samples.values())
+        if total > 2 * max(kept, MIN_SAMPLES):
+            self._compact(samples)
+        return samples
+
+    def _compact(self, samples: dict):
+        """Rewrites the history with only the samples in use, so it stops growing."""
+        tmp_path = f"{self.history_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for rows in samples.values():
+                f.writelines(json.dumps(row) + "\n" for row in rows)
+        # A sample another worker appends meanwhile may be lost, which only
+        # costs the model one data point
+        os.replace(tmp_path, self.history_path)
+        self._history_mtime = os.path.getmtime(self.history_path)
+
+    def fit(self, samples: dict):
+        """Least-squares fit per tool with enough samples; negative coefficients are clipped."""
+        import numpy as np
+
+        for tool, rows in samples.items():
+            if len(rows) < MIN_SAMPLES:
+                continue
+            x = np.array([[1.0] + [row[name] for name in FEATURES] for row in rows])
+            y = np.array([row["seconds"] for row in rows])
+            coefficients, *_ = np.linalg.lstsq(x, y, rcond=None)
+            self.coefficients[tool] = tuple(np.clip(coefficients, 0, None))
+
+
+class PoolScheduler:
+    """Dispatches work to the pool in order of expected duration, with aging."""
+
+    def __init__(self, capacity: int = WORKER_POOL_SIZE, aging: float = SCHEDULER_AGING,
+                 runner=run_in_pool, model: Optional[CostModel] = None):
+        self.capacity = capacity
+        self.aging = aging
+        self.runner = runner
+        self.model = model or CostModel()
+        self.running = 0
+        self._heap = []
+        self._order = itertools.count()
+
+    def estimate(self, tool: str, input_path: str, preflight: Optional[dict] = None) -> Estimate:
+        """Expected duration of tool on input_path, from its preflight report when there is one."""
+        features = features_from_preflight(preflight) if preflight else None
+        if features is None:
+            features = read_features(input_path)
+        return Estimate(tool, features, self.model.predict(tool, features))
+
+    def _dispatch(self):
+        while self.running < self.capacity and self._heap:
+            *_, ready = heapq.heappop(self._heap)
+            if not ready.done():
+                self.running += 1
+                ready.set_result(None)
+
+    async def run(self, estimate: Estimate, func, *args, **kwargs):
+        """Waits for this item's turn, runs func(*args, **kwargs) in the pool and records its duration."""
+        # expected - aging * (now - enqueued) orders the same way at any "now", so
+        # the key can be fixed at enqueue time
+        ready = asyncio.get_running_loop().create_future()
+        key = estimate.seconds + self.aging * time.monotonic() if self.aging else estimate.seconds
+        heapq.heappush(self._heap, (key, next(self._order), ready))
+        self._dispatch()
+        try:
+            await ready
+        except asyncio.CancelledError:
+            if ready.done() and not ready.cancelled():
+                self.running -= 1
+                self._dispatch()
+            raise
+
+        start = time.monotonic()
+        try:
+            result = await self.runner(func, *args, **kwargs)
+        finally:
+            self.running -= 1
+            self._dispatch()
+        # Only runs that finished feed the model (a failure says nothing about
+        # how long the work takes), and the append stays off the event loop
+        try:
+            await run_in_threadpool(self.model.record, estimate.tool, estimate.features, time.monotonic() - start)
+        except OSError as e:
+            logger.warning(f"[SCHEDULER] Could not record the duration of {estimate.tool}: {e}")
+        return result
+
+    def queued(self) -> int:
+        return sum(1 for *_, ready in self._heap if not ready.done())
+
+
+_scheduler = None
+_background = set()
+
+
+def get_scheduler() -> PoolScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PoolScheduler()
+    return _scheduler
+
+
+def submit_scheduled(estimate: Estimate, func, *args, on_error=None) -> asyncio.Task:
+    """Schedules func without waiting for it (jobs). on_error(exc) is called if the pool fails."""
+    async def run():
+        try:
+            await get_scheduler().run(estimate, func, *args)
+        except Exception as e:
+            if on_error is not None:
+                on_error(e)
+
+    task = asyncio.ensure_future(run())
+    # The loop only keeps weak references to tasks
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
@@ -0,0 +1,300 @@
+"""
+Full-text index of stored documents (core.documents): "which page mentions X"
+without downloading the PDF, and the rectangles to highlight on page previews.
+
+Text comes from PyMuPDF's get_text("words"), extracted page-parallel: documents
+longer than TEXT_INDEX_CHUNK_PAGES are cut into page ranges that run in the
+process pool side by side, queued by the pool scheduler (core.scheduler) like
+any other pool work. Words are folded (case, accents) and split into
+tokens, which get ids in reading order. The index is
+
+    rects        float32 (tokens, 4)   each token's rectangle in points, in the
+                                       page's visual (rotated) coordinates
+    page_starts  int32 (pages + 1)     first token id of every page
+    page_sizes   float32 (pages, 2)    visual width and height of every page
+    terms        sorted distinct tokens
+    postings     int32 (tokens)        token ids of every term, term after term
+    term_starts  int32 (terms + 1)     where each term's ids start in postings
+
+saved once as documents/<id>/text_index.npz. A document never changes under its
+id, so its index never goes stale. Each worker keeps the last
+TEXT_INDEX_CACHE_SIZE indexes in memory, where a search is a dict lookup and a
+few NumPy set operations: a phrase is a run of consecutive token ids on one
+page. Two workers may build the same index at once; the file is replaced
+atomically, so that only costs the duplicate work.
+"""
+import asyncio
+import bisect
+import os
+import re
+import unicodedata
+import uuid
+from collections import OrderedDict
+from itertools import chain
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import TEXT_INDEX_CACHE_SIZE, TEXT_INDEX_CHUNK_PAGES
+from core.documents import data_path, document_dir
+from core.scheduler import Estimate, get_scheduler
+from core.timing import span
+
+_TOKEN = re.compile(r"\w+")
+# Name the pool scheduler learns the cost of text extraction under
+INDEX_TOOL = "text-index"
+
+_cache = OrderedDict()  # document id -> TextIndex, least recently used first
+_building = {}  # document id -> [asyncio.Lock, requests using it], while this worker loads or builds it
+
+
+def fold(text: str) -> str:
+    """Lower case without accents, so "Relatório" and "RELATORIO" match."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(fold(text))
+
+
+def index_path(document_id: str) -> str:
+    return os.path.join(document_dir(document_id), "text_index.npz")
+
+
+def extract_pages(path: str, start: int, stop: int) -> list:
+    """
+    (width, height, tokens, flat rects) of pages [start, stop) of the PDF at
+    path. Module-level so it can run in the process pool.
+    """
+    import fitz  # PyMuPDF
+
+    pages = []
+    with fitz.open(path, filetype="pdf") as doc:
+        for page_index in range(start, stop):
+            page = doc[page_index]
+            # Words come in unrotated coordinates; previews show the page rotated
+            matrix = page.rotation_matrix if page.rotation else None
+            tokens, rects = [], []
+            for x0, y0, x1, y1, word, *_ in page.get_text("words"):
+                rect = fitz.Rect(x0, y0, x1, y1)
+                if matrix is not None:
+                    rect = rect * matrix
+                for token in tokenize(word):
+                    tokens.append(token)
+                    rects.extend((rect.x0, rect.y0, rect.x1, rect.y1))
+            pages.append((page.rect.width, page.rect.height, tokens, rects))
+    return pages
+
+
+class TextIndex:
+    def __init__(self, rects, page_starts, page_sizes, terms: List[str], postings, term_starts):
+        self.rects = rects
+        self.page_starts = page_starts
+        self.page_sizes = page_sizes
+        self.terms = terms
+        self.postings = postings
+        self.term_starts = term_starts
+        self._term_ids = {term: index for index, term in enumerate(terms)}
+        self._sizes = [(round(width, 1), round(height, 1)) for width, height in page_sizes.tolist()]
+
+    @classmethod
+    def from_pages(cls, pages: list) -> "TextIndex":
+        import numpy as np
+
+        positions = {}
+        rects = []
+        page_starts = [0]
+        token_id = 0
+        for _, _, tokens, page_rects in pages:
+            for token in tokens:
+                positions.setdefault(token, []).append(token_id)
+                token_id += 1
+            rects.extend(page_rects)
+            page_starts.append(token_id)
+
+        terms = sorted(positions)
+        postings = np.fromiter(chain.from_iterable(positions[term] for term in terms), dtype=np.int32, count=token_id)
+        term_starts = np.zeros(len(terms) + 1, dtype=np.int32)
+        np.cumsum([len(positions[term]) for term in terms], out=term_starts[1:])
+        return cls(
+            np.array(rects, dtype=np.float32).reshape(-1, 4),
+            np.array(page_starts, dtype=np.int32),
+            np.array([(width, height) for width, height, _, _ in pages], dtype=np.float32).reshape(-1, 2),
+            terms, postings, term_starts,
+        )
+
+    def save(self, path: str):
+        import numpy as np
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f, rects=self.rects, page_starts=self.page_starts, page_sizes=self.page_sizes,
+                # Tokens are \w+, so a newline can separate them
+                terms=np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+                postings=self.postings, term_starts=self.term_starts,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["TextIndex"]:
+        import numpy as np
+
+        try:
+            with np.load(path) as data:
+                text = data["terms"].tobytes().decode("utf-8")
+                return cls(
+                    data["rects"], data["page_starts"], data["page_sizes"],
+                    text.split("\n") if text else [], data["postings"], data["term_starts"],
+                )
+        except FileNotFoundError:
+            return None
+
+    def _ids(self, term: str, prefix: bool):
+        """Sorted ids of the tokens equal to term (or starting with it)."""
+        import numpy as np
+
+        if not prefix:
+            index = self._term_ids.get(term)
+            if index is None:
+                return self.postings[:0]
+            return self.postings[self.term_starts[index]:self.term_starts[index + 1]]
+        # Terms sharing a prefix are adjacent, so their postings are one slice
+        low = bisect.bisect_left(self.terms, term)
+        high = bisect.bisect_left(self.terms, term + "\U0010ffff", low)
+        ids = self.postings[self.term_starts[low]:self.term_starts[high]]
+        return ids if high - low <= 1 else np.sort(ids)
+
+    def find(self, query: str, prefix: bool = False):
+        """(first token ids, page indexes, phrase length) of every hit of query."""
+        import numpy as np
+
+        tokens = tokenize(query)
+        if not tokens:
+            return self.postings[:0], self.postings[:0], 0
+        last = len(tokens) - 1
+        ids = [self._ids(token, prefix and offset == last) for offset, token in enumerate(tokens)]
+        # Start from the rarest word and keep the positions where every other
+        # word sits at its offset; membership is a binary search per candidate
+        rarest = min(range(len(ids)), key=lambda offset: len(ids[offset]))
+        starts = ids[rarest] - rarest
+        for offset, others in enumerate(ids):
+            if offset == rarest or not len(starts):
+                continue
+            wanted = starts + offset
+            found = np.searchsorted(others, wanted)
+            found[found == len(others)] = 0
+            starts = starts[others[found] == wanted] if len(others) else starts[:0]
+        # A phrase may not run from the end of one page into the next
+        first_page = np.searchsorted(self.page_starts, starts, side="right") - 1
+        last_page = np.searchsorted(self.page_starts, starts + last, side="right") - 1
+        same_page = first_page == last_page
+        return starts[same_page], first_page[same_page], len(tokens)
+
+    def hit_rects(self, start: int, length: int) -> List[List[float]]:
+        """One rectangle per line the hit covers."""
+        merged = []
+        for x0, y0, x1, y1 in self.rects[start:start + length].tolist():
+            if merged and abs(merged[-1][1] - y0) < 1 and abs(merged[-1][3] - y1) < 1:
+                merged[-1][0] = min(merged[-1][0], x0)
+                merged[-1][2] = max(merged[-1][2], x1)
+            else:
+                merged.append([x0, y0, x1, y1])
+        return [[round(value, 1) for value in rect] for rect in merged]
+
+    def search(self, query: str, prefix: bool = False, limit: int = 200) -> dict:
+        """Pages that contain query (all of them) and the first `limit` hits with their rectangles."""
+        import numpy as np
+
+        starts, pages, length = self.find(query, prefix)
+        # pages is sorted, so each page's hits are one run
+        run_starts = np.flatnonzero(np.diff(pages, prepend=-1))
+        page_numbers = pages[run_starts]
+        counts = np.diff(run_starts, append=len(pages))
+        return {
+            "total_hits": int(len(starts)),
+            "pages": [
+                {
+                    "page": page + 1,  # as split's page ranges count
+                    "page_index": page,  # as the preview URLs count
+                    "hits": count,
+                    "width": self._sizes[page][0],
+                    "height": self._sizes[page][1],
+                }
+                for page, count in zip(page_numbers.tolist(), counts.tolist())
+            ],
+            "hits": [
+                {"page": page + 1, "page_index": page, "rects": self.hit_rects(start, length)}
+                for start, page in zip(starts[:limit].tolist(), pages[:limit].tolist())
+            ],
+        }
+
+    def page_rects(self, page_index: int, query: str, prefix: bool = False) -> List[List[float]]:
+        """Rectangles of every hit of query on one page, for highlighting."""
+        starts, pages, length = self.find(query, prefix)
+        return [rect for start in starts[pages == page_index].tolist() for rect in self.hit_rects(start, length)]
+
+
+def _remember(document_id: str, index: TextIndex):
+    _cache[document_id] = index
+    _cache.move_to_end(document_id)
+    while len(_cache) > TEXT_INDEX_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _extract_scheduled(path: str, start: int, stop: int):
+    scheduler = get_scheduler()
+    features = {"pages": stop - start, "mib": 0.0, "images": 0}
+    estimate = Estimate(INDEX_TOOL, features, scheduler.model.predict(INDEX_TOOL, features))
+    return scheduler.run(estimate, extract_pages, path, start, stop)
+
+
+async def build_index(document_id: str, page_count: int) -> TextIndex:
+    path = data_path(document_id)
+    with span("extract"):
+        if page_count <= TEXT_INDEX_CHUNK_PAGES:
+            chunks = [await run_in_threadpool(extract_pages, path, 0, page_count)]
+        else:
+            chunks = await asyncio.gather(*(
+                _extract_scheduled(path, start, min(start + TEXT_INDEX_CHUNK_PAGES, page_count))
+                for start in range(0, page_count, TEXT_INDEX_CHUNK_PAGES)
+            ))
+    with span("index"):
+        index = await run_in_threadpool(TextIndex.from_pages, [page for chunk in chunks for page in chunk])
+    with span("write"):
+        await run_in_threadpool(index.save, index_path(document_id))
+    return index
+
+
+async def get_index(document_id: str, page_count: int) -> TextIndex:
+    """The document's index: from this worker's memory, from disk, or built now."""
+    index = _cache.get(document_id)
+    if index is not None:
+        _cache.move_to_end(document_id)
+        return index
+
+    # The entry lives until the last request that waited on it is done: between
+    # one holder releasing the lock and the next waiter taking it, the lock
+    # looks free, and a new lock for a later request would build again
+    entry = _building.setdefault(document_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    lock = entry[0]
+    try:
+        async with lock:
+            index = _cache.get(document_id)
+            if index is None:
+                with span("parse"):
+                    index = await run_in_threadpool(TextIndex.load, index_path(document_id))
+                if index is None:
+                    index = await build_index(document_id, page_count)
+                _remember(document_id, index)
+            return index
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            _building.pop(document_id, None)
+
+
+def forget_index(document_id: str):
+    _cache.pop(document_id, None)
@@ -0,0 +1,100 @@
+"""
+Per-request stage timing.
+
+Handlers wrap their phases in `with span("parse"):`; durations of spans with
+the same name add up (e.g. one "render" per page). The middleware sends the
+totals in a Server-Timing header and writes one JSON log line per request,
+which also includes how long the body took to send ("respond"). Outside a
+request (pool processes, scripts) span() does nothing.
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from core.profiling import span_entered
+
+logger = logging.getLogger("pdftools.request")
+
+_stages: ContextVar[Optional[dict]] = ContextVar("timing_stages", default=None)
+
+
+@contextmanager
+def span(name: str):
+    stages = _stages.get()
+    if stages is None:
+        yield
+        return
+    profile_session = span_entered()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+        if profile_session is not None:
+            profile_session.exit()
+
+
+def add_stage(name: str, duration_ms: float):
+    """Adds a duration measured outside a span (e.g. time spent queued) to the current request."""
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + duration_ms
+
+
+def server_timing(stages: dict, total_ms: float) -> str:
+    metrics = [f"{name};dur={duration:.1f}" for name, duration in stages.items()]
+    metrics.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(metrics)
+
+
+class TimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = uuid.uuid4().hex
+        scope.setdefault("state", {})["request_id"] = request_id
+        stages = {}
+        token = _stages.set(stages)
+        start = time.perf_counter()
+        response = {"status": 500, "bytes": 0, "started": None}
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["started"] = time.perf_counter()
+                total_ms = (response["started"] - start) * 1000
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing(stages, total_ms).encode("latin-1")),
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _stages.reset(token)
+            end = time.perf_counter()
+            if response["started"] is not None:
+                stages["respond"] = (end - response["started"]) * 1000
+            logger.info(
+                "request",
+                extra={"fields": {
+                    "request_id": request_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": response["status"],
+                    "bytes_out": response["bytes"],
+                    "duration_ms": round((end - start) * 1000, 1),
+                    "stages_ms": {name: round(duration, 1) for name, duration in stages.items()},
+                }},
+            )
@@ -0,0 +1,287 @@
+"""
+Resumable chunked uploads and the InputFile abstraction that lets endpoints take
+a regular multipart file, the id of a finished chunked upload or the id of a
+document in the store (core.documents).
+
+Layout of uploads/chunked/<id>/:
+    upload.json     filename, declared size/hash and status
+    data.part       pre-sized file the chunks are written into
+    data            the assembled file, once finalized
+    ranges/<a>-<b>  one marker per verified chunk (byte range [a, b))
+
+Chunks are recorded as individual marker files instead of a shared list, so
+concurrent PUTs handled by different uvicorn workers never overwrite each
+other's bookkeeping.
+
+The input_file/input_files dependencies preflight every input (core.preflight)
+before the endpoint runs. Multipart bodies are spooled to uploads/preflight/
+for that; save() then hard-links the spooled file, so it is not copied again.
+Stored documents were preflighted when they were stored and reuse that report.
+A file that fails preflight fails the request, except under batch_input_files,
+where it only fails its own item.
+"""
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+from fastapi import File, Form, HTTPException, UploadFile
+
+from core.config import UPLOAD_TTL_SECONDS
+from core.documents import data_path, read_document
+from core.preflight import PreflightError, check_file
+from core.timing import span
+from core.utils import cleanup_dir, cleanup_file, file_sha256
+
+CHUNKED_DIR = os.path.join("uploads", "chunked")
+PREFLIGHT_DIR = os.path.join("uploads", "preflight")
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def upload_dir(upload_id: str) -> str:
+    return os.path.join(CHUNKED_DIR, upload_id)
+
+
+def _write_state(state: dict):
+    path = os.path.join(upload_dir(state["id"]), "upload.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def read_upload(upload_id: str) -> Optional[dict]:
+    if not _UPLOAD_ID.match(upload_id or ""):
+        return None
+    try:
+        with open(os.path.join(upload_dir(upload_id), "upload.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def create_upload(filename: str, size: int, sha256: Optional[str]) -> dict:
+    state = {
+        "id": uuid.uuid4().hex,
+        "filename": os.path.basename(filename),
+        "size": size,
+        "sha256": sha256.lower() if sha256 else None,
+        "status": "receiving",
+        "created_at": time.time(),
+    }
+    path = upload_dir(state["id"])
+    os.makedirs(os.path.join(path, "ranges"), exist_ok=True)
+    # Pre-size the file so chunks can be written at any offset, in any order
+    with open(os.path.join(path, "data.part"), "wb") as f:
+        f.truncate(size)
+    _write_state(state)
+    return state
+
+
+def received_ranges(upload_id: str) -> List[List[int]]:
+    """Returns the verified byte ranges as sorted, merged [start, end) pairs."""
+    ranges = []
+    for name in os.listdir(os.path.join(upload_dir(upload_id), "ranges")):
+        start, _, end = name.partition("-")
+        ranges.append((int(start), int(end)))
+    ranges.sort()
+
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def write_chunk(upload_id: str, offset: int, data: bytes):
+    with open(os.path.join(upload_dir(upload_id), "data.part"), "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # Only marked as received once it is safely on disk
+    open(os.path.join(upload_dir(upload_id), "ranges", f"{offset}-{offset + len(data)}"), "wb").close()
+
+
+def finalize_upload(upload_id: str) -> dict:
+    """
+    Verifies that every byte arrived and that the file matches the declared hash,
+    then turns data.part into the final file. Raises ValueError otherwise.
+    """
+    state = read_upload(upload_id)
+    if state["status"] == "complete":
+        return state
+
+    if received_ranges(upload_id) != [[0, state["size"]]]:
+        raise ValueError("Upload is incomplete.")
+
+    part_path = os.path.join(upload_dir(upload_id), "data.part")
+    digest = file_sha256(part_path)
+    if state["sha256"] and digest != state["sha256"]:
+        # Forget every chunk so the client sends the file again
+        cleanup_dir(os.path.join(upload_dir(upload_id), "ranges"))
+        os.makedirs(os.path.join(upload_dir(upload_id), "ranges"), exist_ok=True)
+        raise ValueError(f"SHA-256 mismatch: expected {state['sha256']}, got {digest}.")
+
+    os.replace(part_path, os.path.join(upload_dir(upload_id), "data"))
+    state.update(status="complete", sha256=digest, completed_at=time.time())
+    _write_state(state)
+    return state
+
+
+def delete_upload(upload_id: str):
+    cleanup_dir(upload_dir(upload_id))
+
+
+def purge_expired_uploads():
+    if not os.path.isdir(CHUNKED_DIR):
+        return
+    now = time.time()
+    for upload_id in os.listdir(CHUNKED_DIR):
+        state = read_upload(upload_id)
+        if state is not None and now - state["created_at"] > UPLOAD_TTL_SECONDS:
+            delete_upload(upload_id)
+
+
+class InputFile:
+    """
+    A file sent to an endpoint: a multipart UploadFile, or a finalized chunked
+    upload or stored document already on disk. Endpoints only use .filename, .save() and
+    .read(), so they do not need to know where the bytes came from.
+    """
+
+    def __init__(self, filename: str, upload: Optional[UploadFile] = None, path: Optional[str] = None):
+        self.filename = filename
+        self._upload = upload
+        self._path = path
+        self.preflight: Optional[dict] = None
+        self.preflight_error: Optional[PreflightError] = None
+
+    @classmethod
+    def from_upload_id(cls, upload_id: str) -> "InputFile":
+        state = read_upload(upload_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found.")
+        if state["status"] != "complete":
+            raise HTTPException(status_code=409, detail=f"Upload {upload_id} has not been finalized.")
+        return cls(state["filename"], path=os.path.join(upload_dir(upload_id), "data"))
+
+    @classmethod
+    def from_document_id(cls, document_id: str) -> "InputFile":
+        state = read_document(document_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail=f"Document {document_id} not found.")
+        item = cls(state["filename"], path=data_path(document_id))
+        item.preflight = state["preflight"]
+        return item
+
+    def save(self, dest_path: str):
+        if self._upload is not None:
+            with open(dest_path, "wb") as buffer:
+                shutil.copyfileobj(self._upload.file, buffer)
+            return
+
+        # A hard link costs nothing even for very large files; copy if the
+        # filesystem does not allow it. Removing dest_path later leaves the
+        # upload intact, so it can be used again.
+        cleanup_file(dest_path)
+        try:
+            os.link(self._path, dest_path)
+        except OSError:
+            shutil.copyfile(self._path, dest_path)
+
+    def read(self) -> bytes:
+        if self._upload is not None:
+            return self._upload.file.read()
+        with open(self._path, "rb") as f:
+            return f.read()
+
+
+@contextmanager
+def _preflighted(inputs: List[InputFile], isolate: bool = False):
+    """
+    Spools multipart inputs to disk and preflights every input; yields them once
+    all passed and removes the spooled copies after the request. With isolate,
+    an input that fails keeps the error in .preflight_error instead.
+    """
+    spooled = []
+    try:
+        checked = []
+        for item in inputs:
+            if item._upload is not None:
+                os.makedirs(PREFLIGHT_DIR, exist_ok=True)
+                path = os.path.join(PREFLIGHT_DIR, f"{uuid.uuid4().hex}_{os.path.basename(item.filename or 'file')}")
+                item.save(path)
+                spooled.append(path)
+                item = InputFile(item.filename, path=path)
+            if item.preflight is not None:
+                checked.append(item)
+                continue
+            try:
+                with span("preflight"):
+                    item.preflight = check_file(item._path, item.filename or "")
+            except PreflightError as e:
+                if not isolate:
+                    raise HTTPException(status_code=e.status_code, detail=f"{item.filename}: {e.detail}")
+                item.preflight_error = e
+            checked.append(item)
+        yield checked
+    finally:
+        for path in spooled:
+            cleanup_file(path)
+
+
+def input_file(
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Form(None),
+    document_id: Optional[str] = Form(None),
+):
+    """FastAPI dependency: the endpoint's input, sent inline, as a chunked upload id or as a document id."""
+    if file is not None:
+        inputs = [InputFile(file.filename, upload=file)]
+    elif upload_id:
+        inputs = [InputFile.from_upload_id(upload_id)]
+    elif document_id:
+        inputs = [InputFile.from_document_id(document_id)]
+    else:
+        raise HTTPException(status_code=422, detail="Send 'file', 'upload_id' or 'document_id'.")
+    with _preflighted(inputs) as checked:
+        yield checked[0]
+
+
+def _collect_inputs(files: List[UploadFile], upload_ids: List[str], document_ids: List[str]) -> List[InputFile]:
+    inputs = [InputFile(file.filename, upload=file) for file in files]
+    inputs.extend(InputFile.from_upload_id(upload_id) for upload_id in upload_ids)
+    inputs.extend(InputFile.from_document_id(document_id) for document_id in document_ids)
+    return inputs
+
+
+def input_files(
+    files: List[UploadFile] = File(default=[]),
+    upload_ids: List[str] = Form(default=[]),
+    document_ids: List[str] = Form(default=[]),
+):
+    """FastAPI dependency for endpoints that take several files and need all of them (merge, pipeline)."""
+    with _preflighted(_collect_inputs(files, upload_ids, document_ids)) as checked:
+        yield checked
+
+
+def batch_input_files(
+    files: List[UploadFile] = File(default=[]),
+    upload_ids: List[str] = Form(default=[]),
+    document_ids: List[str] = Form(default=[]),
+):
+    """
+    FastAPI dependency for batches: like input_files, but a file that fails
+    preflight only carries its error in .preflight_error, so the other files
+    still run.
+    """
+    with _preflighted(_collect_inputs(files, upload_ids, document_ids), isolate=True) as checked:
+        yield checked
@@ -1,4 +1,11 @@
+import hashlib
+import logging
 import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
 
 def cleanup_file(path: str):
     """Removes a file if it exists."""
@@ -6,4 +13,19 @@ def cleanup_file(path: str):
         if os.path.exists(path):
             os.remove(path)
     except Exception as e:
-        print(f"Error cleaning up file {path}: {e}")
+        logger.warning(f"Error cleaning up file {path}: {e}")
+
+def cleanup_dir(path: str):
+    """Removes a directory tree if it exists."""
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+    except Exception as e:
+        logger.warning(f"Error cleaning up directory {path}: {e}")
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,70 @@
+import asyncio
+import functools
+import importlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from core.config import PRELOAD_MODULES, WORKER_POOL_SIZE
+from core.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+
+
+def preload_modules(names=PRELOAD_MODULES):
+    """
+    Imports the heavy libraries listed in PRELOAD_MODULES up front. The tool
+    modules import them on first use, so without this the first request of each
+    kind pays for the import instead of the worker's startup.
+    """
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("Could not preload %s: %s", name, e)
+
+
+def _init_child():
+    configure_logging()
+    preload_modules()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Returns the process pool shared by this API worker, creating it on first use."""
+    global _pool
+    if _pool is None:
+        # "spawn" keeps children independent of the server's threads and behaves
+        # the same on Linux and Windows.
+        _pool = ProcessPoolExecutor(
+            max_workers=WORKER_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_child,
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) in the process pool without blocking the event loop.
+    func must be a module-level function so it can be pickled.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    try:
+        return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+    except BrokenProcessPool:
+        # A crashed child (e.g. a segfault inside a native library) breaks the
+        # whole pool; drop it so the next call starts a fresh one.
+        if _pool is pool:
+            shutdown_pool()
+        raise
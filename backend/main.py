@@ -1,8 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.endpoints import compress, split, merge, pdf_to_pptx, pdf_to_excel, word_to_pdf, pptx_to_pdf, excel_to_pdf, pdf_to_jpg, protect_pdf, pdf_to_word, edit_pdf
+from api.endpoints import compress, split, merge, pdf_to_pptx, pdf_to_excel, word_to_pdf, pptx_to_pdf, excel_to_pdf, pdf_to_jpg, protect_pdf, remove_blank, pdf_to_word, edit_pdf, edit_sessions, batch, pipeline, jobs, uploads, documents, results, metrics, profiles
+from core.admission import AdmissionMiddleware
+from core.log import configure_logging
+from core.metrics import MetricsMiddleware, mark_worker_dead
+from core.profiling import ProfilingMiddleware
+from core.timing import TimingMiddleware
+from core.workers import preload_modules, shutdown_pool
+
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    preload_modules()
+    yield
+    shutdown_pool()
+    mark_worker_dead()
 
-app = FastAPI(title="PDF Tools API")
+app = FastAPI(title="PDF Tools API", lifespan=lifespan)
+
+# Added before CORS so its 503 responses still carry the CORS headers
+app.add_middleware(AdmissionMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -11,8 +31,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the retained-result URL and resume downloads
+    expose_headers=["ETag", "Content-Location", "X-Result-URL", "Content-Range", "Accept-Ranges", "Server-Timing", "X-Request-ID", "X-Profile-ID", "Retry-After", "X-Quality-Tier", "X-Removed-Pages"],
 )
 
+# Profiling runs inside the timing middleware, which assigns the request id
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TimingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 
 app.include_router(compress.router, prefix="/compress", tags=["compress"])
@@ -25,8 +52,18 @@ app.include_router(pptx_to_pdf.router, prefix="/convert", tags=["convert"])
 app.include_router(excel_to_pdf.router, prefix="/convert", tags=["convert"])
 app.include_router(pdf_to_jpg.router, prefix="/convert", tags=["convert"])
 app.include_router(protect_pdf.router, prefix="/protect", tags=["protect"])
+app.include_router(remove_blank.router, prefix="/organize", tags=["organize"])
 app.include_router(pdf_to_word.router, prefix="/convert", tags=["convert"])
 app.include_router(edit_pdf.router, prefix="/convert", tags=["edit"])
+app.include_router(edit_sessions.router, prefix="/edit-sessions", tags=["edit"])
+app.include_router(batch.router, prefix="/batch", tags=["batch"])
+app.include_router(pipeline.router, prefix="/pipeline", tags=["pipeline"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+app.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
+app.include_router(documents.router, prefix="/documents", tags=["uploads"])
+app.include_router(results.router, prefix="/results", tags=["results"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+app.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
 
 @app.get("/")
 async def root():
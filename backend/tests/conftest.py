@@ -0,0 +1,14 @@
+import fitz
+import pytest
+
+@pytest.fixture
+def make_pdf():
+    """Returns a factory that builds a small text-only PDF in memory."""
+    def _make_pdf(pages=2, text="Page"):
+        doc = fitz.open()
+        for i in range(pages):
+            doc.new_page().insert_text((72, 72), f"{text} {i + 1}")
+        data = doc.tobytes()
+        doc.close()
+        return data
+    return _make_pdf
@@ -0,0 +1,97 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.admission import AdmissionMiddleware, ClassGovernor, Rejected, tool_class
+
+def test_tool_routes_map_to_classes():
+    assert tool_class("/compress/compress-pdf") == "render"
+    assert tool_class("/convert/pdf-to-jpg/stream") == "render"
+    assert tool_class("/batch/pdf-to-word") == "office"
+    assert tool_class("/pipeline/run") == "render"
+    assert tool_class("/jobs/compress-pdf") is None
+    assert tool_class("/results/abc") is None
+
+def test_governor_queues_then_rejects(tmp_path):
+    governor = ClassGovernor("render", limit=1, queue_size=1, directory=str(tmp_path))
+
+    async def scenario():
+        running = await governor.acquire()
+        waiter = asyncio.ensure_future(governor.acquire(max_wait=5))
+        await asyncio.sleep(0.05)
+        # The only queue place is taken by the waiter
+        with pytest.raises(Rejected) as rejected:
+            await governor.acquire(max_wait=5)
+        assert rejected.value.reason == "queue_full" and rejected.value.retry_after >= 1
+
+        governor.release(running, held_seconds=1.0)
+        governor.release(await asyncio.wait_for(waiter, 2), held_seconds=1.0)
+
+        blocker = await governor.acquire()
+        with pytest.raises(Rejected) as rejected:
+            await governor.acquire(max_wait=0.05)
+        assert rejected.value.reason == "timeout"
+        governor.release(blocker, held_seconds=1.0)
+
+    asyncio.run(scenario())
+
+def test_full_class_gets_503_with_retry_after(tmp_path):
+    app = FastAPI()
+
+    @app.post("/merge/merge-pdf")
+    def merge():
+        return {"ok": True}
+
+    governor = ClassGovernor("light", limit=1, queue_size=0, directory=str(tmp_path))
+    client = TestClient(AdmissionMiddleware(app, governors={"light": governor}))
+    assert client.post("/merge/merge-pdf").status_code == 200
+
+    slot = governor.slots.try_acquire()
+    try:
+        response = client.post("/merge/merge-pdf")
+    finally:
+        governor.release(slot, held_seconds=0.1)
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+
+def test_counting_busy_slots_never_takes_a_free_one(tmp_path):
+    governor = ClassGovernor("render", limit=2, queue_size=0, directory=str(tmp_path))
+    slot = governor.slots.try_acquire()
+    assert governor.slots.in_use() == 1
+
+    # A holder that died left its pid behind; its lock is gone, so it is not busy
+    for path in governor.slots.paths:
+        if not os.path.exists(path) or not os.path.getsize(path):
+            with open(path, "w") as f:
+                f.write("999999999")
+    assert governor.slots.in_use() == 1
+
+    other = governor.slots.try_acquire()
+    assert other is not None and governor.slots.in_use() == 2
+    governor.release(other, held_seconds=0.1)
+    governor.release(slot, held_seconds=0.1)
+    assert governor.slots.in_use() == 0
+
+def test_slot_is_released_before_a_known_length_body_is_sent(tmp_path):
+    app = FastAPI()
+
+    @app.post("/merge/merge-pdf")
+    def merge():
+        return {"ok": True}
+
+    governor = ClassGovernor("light", limit=1, queue_size=0, directory=str(tmp_path))
+    held = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            held.append(governor.slots.in_use())
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "POST", "path": "/merge/merge-pdf", "headers": [], "query_string": b""}
+    asyncio.run(AdmissionMiddleware(app, governors={"light": governor})(scope, receive, send))
+    assert held == [0]
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+from main import app
+import io
+import json
+import zipfile
+
+client = TestClient(app)
+
+def test_batch_compress_isolates_bad_files(make_pdf):
+    files = [
+        ("files", ("a.pdf", make_pdf(), "application/pdf")),
+        ("files", ("a.pdf", make_pdf(), "application/pdf")),
+        ("files", ("notes.txt", b"content", "text/plain")),
+    ]
+    response = client.post("/batch/compress-pdf", files=files)
+    assert response.status_code == 200
+    assert response.headers["x-batch-succeeded"] == "2"
+    assert response.headers["x-batch-failed"] == "1"
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    manifest = json.loads(archive.read("manifest.json"))
+    assert [entry["status"] for entry in manifest] == ["ok", "ok", "error"]
+    # Equal input names must not overwrite each other inside the ZIP
+    assert len({entry["outputs"][0] for entry in manifest[:2]}) == 2
+
+def test_batch_unknown_tool(make_pdf):
+    response = client.post("/batch/unknown", files=[("files", ("a.pdf", make_pdf(), "application/pdf"))])
+    assert response.status_code == 404
+
+def test_batch_reports_a_damaged_pdf_as_that_file_failing(make_pdf):
+    files = [
+        ("files", ("a.pdf", make_pdf(), "application/pdf")),
+        ("files", ("b.pdf", b"%PDF-1.7\n1 0 obj", "application/pdf")),
+    ]
+    response = client.post("/batch/compress-pdf", files=files)
+    assert response.status_code == 200
+    manifest = json.loads(zipfile.ZipFile(io.BytesIO(response.content)).read("manifest.json"))
+    assert [entry["status"] for entry in manifest] == ["ok", "error"]
+    assert "damaged" in manifest[1]["error"]
+    assert "uploads" not in manifest[1]["error"]
@@ -0,0 +1,62 @@
+from benchmarks.corpus import build_fixture
+from benchmarks.run import compare
+
+def test_corpus_is_deterministic(tmp_path):
+    first = build_fixture("table", "small", str(tmp_path / "a"))
+    second = build_fixture("table", "small", str(tmp_path / "b"))
+    with open(first, "rb") as a, open(second, "rb") as b:
+        assert a.read() == b.read()
+
+def test_compare_flags_only_real_regressions():
+    ok = {"status": "ok", "median_ms": 100.0, "py_peak_bytes": 10 * 2**20}
+    baseline = {"slow": ok, "noise": ok, "same": ok}
+    results = {
+        "slow": {**ok, "median_ms": 150.0},
+        "noise": {**ok, "median_ms": 115.0},  # +15 ms is under the noise floor
+        "same": ok,
+        "new": ok,
+    }
+    regressions = compare(results, baseline, threshold=0.1)
+    assert len(regressions) == 1 and regressions[0].startswith("slow:")
+
+def test_load_report_percentiles_and_errors():
+    from benchmarks.load import parse_mix, summarize
+
+    assert parse_mix("compress-pdf=3,merge-pdf") == {"compress-pdf": 3.0, "merge-pdf": 1.0}
+    samples = [{"tool": "merge-pdf", "status": 200, "latency_ms": float(ms)} for ms in range(1, 101)]
+    samples[0]["status"] = 500
+    report = summarize(samples, elapsed=10.0)
+    route = report["routes"]["merge-pdf"]
+    assert (route["p50_ms"], route["p95_ms"], route["p99_ms"]) == (50.0, 95.0, 99.0)
+    assert route["error_rate"] == 0.01 and route["rps"] == 10.0
+
+def test_ssim_psnr_and_pareto_front():
+    import numpy as np
+    from benchmarks.quality import pareto_front, psnr, ssim
+
+    image = (np.indices((64, 64)).sum(axis=0) * 2).astype(np.uint8)
+    noisy = np.clip(image + np.random.default_rng(0).normal(0, 20, image.shape), 0, 255).astype(np.uint8)
+    assert ssim(image, image) == 1.0 and psnr(image, image) == 100.0
+    assert 0 < ssim(image, noisy) < 0.9 and psnr(image, noisy) < 30
+
+    rows = [
+        {"setting": "small", "output_ratio": 0.2, "ssim_mean": 0.90},
+        {"setting": "worse", "output_ratio": 0.3, "ssim_mean": 0.89},
+        {"setting": "sharp", "output_ratio": 0.5, "ssim_mean": 0.97},
+    ]
+    assert pareto_front(rows) == {"small", "sharp"}
+
+def test_memory_scaling_flags_rss_that_grows_with_pages():
+    from benchmarks.run import check_memory_scaling
+
+    mib = 2**20
+    ok = {"status": "ok"}
+    results = {
+        "compress-pdf/scanned_small": {**ok, "rss_peak_bytes": 250 * mib},
+        "compress-pdf/scanned_large": {**ok, "rss_peak_bytes": 260 * mib},
+        "compress-pdf/images_medium": {**ok, "rss_peak_bytes": 250 * mib},
+        "compress-pdf/images_large": {**ok, "rss_peak_bytes": 520 * mib},
+        "pdf-to-word/text_large": {**ok, "rss_peak_bytes": 900 * mib},
+    }
+    failures = check_memory_scaling(results)
+    assert len(failures) == 1 and failures[0].startswith("compress-pdf/images")
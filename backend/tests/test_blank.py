@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+from main import app
+import io
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from core.blank import score_pixels
+
+client = TestClient(app)
+
+def scanned_sheet(ink=False):
+    """A grayish, noisy scan with a dark scanner edge, optionally with lines of text."""
+    rng = np.random.default_rng(0)
+    sheet = np.clip(235 + rng.normal(0, 4, (1100, 850)), 0, 255).astype(np.uint8)
+    sheet[:, :30] = 60
+    if ink:
+        for row in range(150, 1000, 40):
+            sheet[row:row + 8, 100:700] = 30
+    return sheet
+
+def test_scores_scans_by_ink_coverage():
+    assert score_pixels(scanned_sheet()).blank
+    assert not score_pixels(scanned_sheet(ink=True)).blank
+
+def test_blank_pages_are_removed_or_skipped():
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Chapter 1")
+    doc.new_page()  # no content at all
+    page = doc.new_page()
+    page.draw_rect(page.rect, color=None, fill=(1, 1, 1))  # white background only
+    for ink in (False, True):
+        buffer = io.BytesIO()
+        Image.fromarray(scanned_sheet(ink)).save(buffer, "JPEG")
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    pdf = doc.tobytes()
+    doc.close()
+
+    files = {"file": ("scan.pdf", pdf, "application/pdf")}
+    response = client.post("/organize/remove-blank-pages", files=files)
+    assert response.status_code == 200
+    assert response.headers["X-Removed-Pages"] == "2,3,4"
+    with fitz.open(stream=response.content, filetype="pdf") as result:
+        assert len(result) == 2
+
+    response = client.post("/compress/compress-pdf", files=files, data={"skip_blank": "true"})
+    assert response.status_code == 200
+    with fitz.open(stream=response.content, filetype="pdf") as result:
+        assert len(result) == 2
@@ -17,3 +17,35 @@ def test_convert_pdf_to_word_invalid_file():
 
 # Note: To test success, we need a real PDF file. 
 # We can skip this for now or create a dummy PDF if possible.
+
+def test_pdf_to_jpg_stream_ndjson(make_pdf):
+    import json
+    with client.stream("POST", "/convert/pdf-to-jpg/stream",
+                       files={"file": ("doc.pdf", make_pdf(2), "application/pdf")},
+                       data={"scale": "0.5"}) as response:
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    assert [line["type"] for line in lines] == ["start", "page", "page", "end"]
+    assert lines[1]["page"] == 1 and lines[1]["data"]
+
+def test_pdf_to_jpg_multipart_escapes_the_part_filename(make_pdf):
+    response = client.post("/convert/pdf-to-jpg/stream",
+                           files={"file": ("caf\u00e9 menu.pdf", make_pdf(1), "application/pdf")},
+                           data={"scale": "0.5", "format": "multipart"})
+    assert response.status_code == 200
+    assert b"Content-Disposition: inline; filename*=utf-8''caf%C3%A9%20menu_page_1.jpg\r\n" in response.content
+
+def test_pdf_to_jpg_stream_cleans_up_when_the_body_is_never_read(tmp_path, make_pdf):
+    import asyncio
+    from api.endpoints.pdf_to_jpg import pdf_to_jpg_stream
+    from core.uploads import InputFile
+
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(make_pdf(2))
+    before = set(os.listdir("uploads")) if os.path.isdir("uploads") else set()
+    response = pdf_to_jpg_stream(InputFile("doc.pdf", path=str(path)), format="multipart", scale=0.5, skip_blank=False)
+    assert set(os.listdir("uploads")) - before
+
+    # As the response does when the client went away before the first chunk
+    asyncio.run(response.background())
+    assert set(os.listdir("uploads")) == before
@@ -0,0 +1,115 @@
+from fastapi.testclient import TestClient
+from main import app
+import hashlib
+
+import fitz
+import pytest
+
+import core.text_index
+import core.uploads
+
+client = TestClient(app)
+
+def test_document_is_uploaded_once_and_used_by_several_tools(make_pdf, monkeypatch):
+    pdf = make_pdf(4)
+    response = client.post("/documents", files={"file": ("report.pdf", pdf, "application/pdf")})
+    assert response.status_code == 201
+    document = response.json()
+    assert document["document_id"] == hashlib.sha256(pdf).hexdigest()
+    assert document["pages"] == 4
+
+    # The same bytes again are not stored twice
+    again = client.post("/documents", files={"file": ("copy.pdf", pdf, "application/pdf")})
+    assert again.status_code == 200
+    assert again.json()["document_id"] == document["document_id"]
+
+    # Tools reuse the preflight report made when the document was stored
+    def no_preflight(*args):
+        raise AssertionError("stored documents are not preflighted again")
+    monkeypatch.setattr(core.uploads, "check_file", no_preflight)
+
+    document_id = document["document_id"]
+    response = client.post("/edit-sessions", data={"document_id": document_id})
+    assert response.status_code == 201
+    assert response.json()["filename"] == "report.pdf"
+    response = client.post("/batch/split-pdf", data={"document_ids": [document_id, document_id], "pages": "2-3"})
+    assert response.status_code == 200
+
+    response = client.get(f"/documents/{document_id}/pages/1/preview", params={"scale": 0.5})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+
+    assert client.delete(f"/documents/{document_id}").status_code == 204
+    response = client.post("/edit-sessions", data={"document_id": document_id})
+    assert response.status_code == 404
+
+def test_search_finds_pages_and_hit_rectangles(monkeypatch):
+    # Two chunks, extracted in the pool through the scheduler
+    monkeypatch.setattr(core.text_index, "TEXT_INDEX_CHUNK_PAGES", 2)
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Introduction")
+    doc.new_page().insert_text((72, 72), "Relatório de faturação anual")
+    doc.new_page().insert_text((72, 72), "relatorio")  # "relatorio de" would run across pages
+    doc.new_page().insert_text((72, 72), "de faturação")
+    pdf = doc.tobytes()
+    doc.close()
+    document_id = client.post("/documents", files={"file": ("report.pdf", pdf, "application/pdf")}).json()["document_id"]
+
+    result = client.get(f"/documents/{document_id}/search", params={"q": "RELATORIO de Faturacao"}).json()
+    assert result["total_hits"] == 1
+    assert [page["page"] for page in result["pages"]] == [2]
+    x0, y0, x1, y1 = result["hits"][0]["rects"][0]
+    assert x0 == pytest.approx(72, abs=1) and y0 < 72 < y1
+
+    result = client.get(f"/documents/{document_id}/search", params={"q": "fatur", "prefix": True}).json()
+    assert [page["page"] for page in result["pages"]] == [2, 4]
+
+    response = client.get(f"/documents/{document_id}/pages/1/preview", params={"highlight": "anual"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+
+def test_storing_a_file_leaves_the_callers_copy_writable(tmp_path, make_pdf):
+    import os
+    import stat
+    from core.documents import delete_document, store_document
+
+    path = tmp_path / "report.pdf"
+    path.write_bytes(make_pdf(1))
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    state, _ = store_document(str(path), "report.pdf", {"kind": "pdf", "pages": 1})
+    assert stat.S_IMODE(os.stat(path).st_mode) == mode
+    delete_document(state["id"])
+
+def test_index_is_not_built_twice_while_a_waiter_takes_over(monkeypatch):
+    import asyncio
+
+    builds = []
+
+    async def build_index(document_id, page_count):
+        builds.append(document_id)
+        await asyncio.sleep(0.02 if len(builds) == 1 else 0.1)
+        if len(builds) == 1:
+            raise RuntimeError("pool worker died")
+        return "index"
+
+    monkeypatch.setattr(core.text_index, "build_index", build_index)
+    document_id = "f" * 64
+
+    async def late():
+        # Arrives after the first build failed, while the waiter's build is running
+        while len(builds) < 2:
+            await asyncio.sleep(0.005)
+        return await core.text_index.get_index(document_id, 1)
+
+    async def scenario():
+        return await asyncio.gather(
+            core.text_index.get_index(document_id, 1), core.text_index.get_index(document_id, 1), late(),
+            return_exceptions=True,
+        )
+
+    try:
+        first, second, third = asyncio.run(scenario())
+    finally:
+        core.text_index._cache.pop(document_id, None)
+    assert isinstance(first, RuntimeError) and second == third == "index"
+    assert len(builds) == 2 and document_id not in core.text_index._building
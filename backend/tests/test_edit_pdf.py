@@ -0,0 +1,65 @@
+import io
+import json
+
+import fitz
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from main import app
+
+client = TestClient(app)
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (60, 20), "navy").save(buffer, "PNG")
+    return buffer.getvalue()
+
+def test_repeated_image_is_embedded_once_and_edits_land_on_their_pages(make_pdf):
+    logo = _png()
+    edits = {
+        # The same logo, uploaded twice, stamped on every page
+        "images": [{"id": f"i{page}", "pageIndex": page, "x": 0.7, "y": 0.9, "width": 0.2, "height": 0.05,
+                    "fileIndex": page % 2} for page in range(12)],
+        "texts": [{"id": "t", "pageIndex": 3, "text": "Approved", "x": 0.1, "y": 0.1}],
+        "rectangles": [{"id": "r", "pageIndex": 5, "x": 0, "y": 0, "width": 0.1, "height": 0.1}],
+    }
+    response = client.post(
+        "/convert/edit-pdf",
+        files=[("file", ("doc.pdf", make_pdf(12))), ("image_files", ("a.png", logo)), ("image_files", ("b.png", logo))],
+        data={"edits": json.dumps(edits)},
+    )
+    assert response.status_code == 200
+
+    doc = fitz.open("pdf", response.content)
+    placed = {image[0] for page in doc for image in page.get_images()}
+    assert len(placed) == 1
+    assert all(page.get_images() for page in doc)
+    assert "Approved" in doc[3].get_text() and "Approved" not in doc[2].get_text()
+    assert doc[5].get_drawings()
+
+def test_stamp_is_one_form_xobject_shared_by_every_page(make_pdf):
+    source = fitz.open("pdf", make_pdf(30))
+    source[4].set_rotation(90)
+    pdf = source.tobytes(garbage=3, deflate=True)
+    edits = {"stamps": [
+        {"id": "s1", "text": "CONFIDENTIAL", "rotation": 45, "opacity": 0.2},
+        {"id": "s2", "text": "DRAFT", "pages": "2-3", "x": 0.1, "y": 0.05, "width": 0.3, "height": 0.05},
+    ]}
+    response = client.post("/convert/edit-pdf", files={"file": ("doc.pdf", pdf)}, data={"edits": json.dumps(edits)})
+    assert response.status_code == 200
+
+    doc = fitz.open("pdf", response.content)
+    assert all("CONFIDENTIAL" in page.get_text() for page in doc)
+    assert [page.number for page in doc if "DRAFT" in page.get_text()] == [1, 2]
+    forms = {xobject[0] for page in doc for xobject in page.get_xobjects()}
+    assert len(forms) == 2
+    # References and a shared content stream, not a copy of the watermark per page
+    growth = len(doc.tobytes(garbage=3, deflate=True)) - len(pdf)
+    assert growth / len(doc) < 100
+
+def test_stamp_with_an_invalid_page_range_is_rejected(make_pdf):
+    for pages in ("5-2", "abc", "0"):
+        edits = {"stamps": [{"id": "s1", "text": "DRAFT", "pages": pages}]}
+        response = client.post("/convert/edit-pdf", files={"file": ("doc.pdf", make_pdf(3))}, data={"edits": json.dumps(edits)})
+        assert response.status_code == 422
+        assert "page range" in response.json()["detail"]
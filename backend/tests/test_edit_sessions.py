@@ -0,0 +1,52 @@
+import json
+
+import fitz
+from fastapi.testclient import TestClient
+
+import core.edit_sessions as edit_sessions
+from main import app
+
+client = TestClient(app)
+
+def _add(session_id, operation):
+    return client.post(f"/edit-sessions/{session_id}/operations", data={"operation": json.dumps(operation)})
+
+def test_deltas_are_saved_incrementally_and_exported(make_pdf):
+    response = client.post("/edit-sessions", files={"file": ("doc.pdf", make_pdf(3))})
+    assert response.status_code == 201
+    session_id = response.json()["session_id"]
+    with open(edit_sessions.document_path(session_id), "rb") as f:
+        original = f.read()
+
+    response = _add(session_id, {"type": "text", "id": "t1", "pageIndex": 0, "text": "Signed", "x": 0.1, "y": 0.5})
+    assert response.status_code == 201
+    assert response.json()["pages"] == [0]
+    assert _add(session_id, {"type": "rectangle", "id": "r1", "pageIndex": 1, "x": 0, "y": 0,
+                             "width": 0.5, "height": 0.5, "color": "#FF0000"}).status_code == 201
+    assert _add(session_id, {"type": "text", "id": "t1", "pageIndex": 0, "text": "x", "x": 0, "y": 0}).status_code == 409
+
+    # Another worker's handle would be stale; it reopens the document from disk
+    edit_sessions._close_handle(session_id)
+    response = client.patch(f"/edit-sessions/{session_id}/operations/t1", json={"pageIndex": 2})
+    assert response.json()["pages"] == [0, 2]
+    assert client.delete(f"/edit-sessions/{session_id}/operations/r1").json()["pages"] == [1]
+
+    preview = client.get(f"/edit-sessions/{session_id}/pages/1/preview", params={"scale": 0.5})
+    assert preview.headers["content-type"] == "image/png"
+    assert client.get(f"/edit-sessions/{session_id}/pages/9/preview").status_code == 404
+
+    # Every change was appended to the file rather than rewriting it
+    with open(edit_sessions.document_path(session_id), "rb") as f:
+        assert f.read().startswith(original)
+    state = client.get(f"/edit-sessions/{session_id}").json()
+    assert state["version"] == 4
+    assert [operation["id"] for operation in state["operations"]] == ["t1"]
+
+    response = client.post(f"/edit-sessions/{session_id}/export")
+    assert response.status_code == 200
+    doc = fitz.open("pdf", response.content)
+    assert "Signed" not in doc[0].get_text() and "Signed" in doc[2].get_text()
+    assert not doc[1].get_drawings()
+
+    assert client.delete(f"/edit-sessions/{session_id}").status_code == 204
+    assert client.get(f"/edit-sessions/{session_id}").status_code == 404
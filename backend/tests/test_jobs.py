@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+from main import app
+import time
+
+client = TestClient(app)
+
+def wait_for(job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "error"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError("job did not finish in time")
+
+def test_job_reports_page_progress_and_result(make_pdf):
+    response = client.post("/jobs/compress-pdf", files={"file": ("a.pdf", make_pdf(5), "application/pdf")})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    job = wait_for(job_id)
+    assert job["status"] == "done"
+    assert job["progress"] == {"done": 5, "total": 5}
+
+    result = client.get(job["result_url"])
+    assert result.status_code == 200
+    assert result.headers["content-type"] == "application/pdf"
+
+def test_job_events_stream_ends_with_terminal_event(make_pdf):
+    response = client.post("/jobs/split-pdf", files={"file": ("a.pdf", make_pdf(3), "application/pdf")}, data={"pages": "2"})
+    job_id = response.json()["job_id"]
+
+    with client.stream("GET", f"/jobs/{job_id}/events") as stream:
+        events = [line for line in stream.iter_lines() if line.startswith("event:")]
+    assert events[-1] == "event: done"
+
+def test_unknown_job():
+    assert client.get("/jobs/0123456789abcdef0123456789abcdef").status_code == 404
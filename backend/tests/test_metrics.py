@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_metrics_count_requests_per_route(make_pdf):
+    response = client.post("/split/split-pdf", files={"file": ("doc.pdf", make_pdf(3), "application/pdf")}, data={"pages": "1-2"})
+    assert response.status_code == 200
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert 'pdftools_requests_total{method="POST",route="/split/split-pdf",status="200"}' in metrics.text
+    assert 'pdftools_document_pages_count{route="/split/split-pdf"}' in metrics.text
+    assert 'pdftools_requests_in_flight{route="/split/split-pdf"} 0.0' in metrics.text
+
+def test_batch_pages_are_counted_although_the_items_run_in_the_pool(make_pdf):
+    def pages_sum():
+        for line in client.get("/metrics").text.splitlines():
+            if line.startswith('pdftools_document_pages_sum{route="/batch/{tool}"}'):
+                return float(line.split()[-1])
+        return 0.0
+
+    before = pages_sum()
+    files = [("files", ("a.pdf", make_pdf(2), "application/pdf")), ("files", ("b.pdf", make_pdf(3), "application/pdf"))]
+    assert client.post("/batch/compress-pdf", files=files).status_code == 200
+    assert pages_sum() - before == 5
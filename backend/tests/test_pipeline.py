@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+from main import app
+import json
+import fitz
+
+client = TestClient(app)
+
+def test_pipeline_merge_split_protect(make_pdf):
+    steps = [
+        {"op": "merge"},
+        {"op": "split", "pages": "1-3"},
+        {"op": "protect", "password": "secret"},
+    ]
+    files = [
+        ("files", ("a.pdf", make_pdf(2), "application/pdf")),
+        ("files", ("b.pdf", make_pdf(2), "application/pdf")),
+    ]
+    response = client.post("/pipeline/run", files=files, data={"steps": json.dumps(steps)})
+    assert response.status_code == 200
+
+    doc = fitz.open(stream=response.content, filetype="pdf")
+    assert doc.needs_pass
+    assert doc.authenticate("secret")
+    assert len(doc) == 3
+
+def test_pipeline_rejects_protect_before_other_steps(make_pdf):
+    steps = [{"op": "protect", "password": "secret"}, {"op": "compress"}]
+    response = client.post(
+        "/pipeline/run",
+        files=[("files", ("a.pdf", make_pdf(), "application/pdf"))],
+        data={"steps": json.dumps(steps)},
+    )
+    assert response.status_code == 400
+
+def test_pipeline_compresses_through_the_windowed_path(make_pdf):
+    import os
+
+    steps = [{"op": "split", "pages": "2-3"}, {"op": "compress", "dpi": 50}, {"op": "protect", "password": "secret"}]
+    response = client.post(
+        "/pipeline/run",
+        files=[("files", ("a.pdf", make_pdf(4), "application/pdf"))],
+        data={"steps": json.dumps(steps)},
+    )
+    assert response.status_code == 200
+    assert "x-quality-tier" in response.headers
+    doc = fitz.open(stream=response.content, filetype="pdf")
+    assert doc.authenticate("secret") and len(doc) == 2
+    assert not [name for name in os.listdir("outputs") if name.startswith("pipeline_compressed_")]
+
+def test_pipeline_rejects_out_of_range_compress_settings(make_pdf):
+    for step in ({"op": "compress", "quality": 0}, {"op": "compress", "quality": 101}, {"op": "compress", "dpi": 0}):
+        response = client.post(
+            "/pipeline/run",
+            files=[("files", ("a.pdf", make_pdf(), "application/pdf"))],
+            data={"steps": json.dumps([step])},
+        )
+        assert response.status_code == 422
@@ -0,0 +1,98 @@
+import io
+import os
+import time
+import zipfile
+
+import fitz
+import pytest
+from fastapi.testclient import TestClient
+
+import core.preflight as preflight
+from main import app
+
+client = TestClient(app)
+
+def _docx_bytes():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", "<document/>")
+    return buffer.getvalue()
+
+def test_renamed_word_document_is_routed_to_the_right_tool():
+    response = client.post("/compress/compress-pdf", files={"file": ("report.pdf", _docx_bytes())})
+    assert response.status_code == 415
+    assert "/convert/word-to-pdf" in response.json()["detail"]
+
+def test_damaged_and_encrypted_pdfs_are_rejected_before_processing(make_pdf):
+    response = client.post("/convert/pdf-to-jpg", files={"file": ("broken.pdf", b"%PDF-1.7\n1 0 obj")})
+    assert response.status_code == 400
+
+    doc = fitz.open("pdf", make_pdf(1))
+    locked = doc.tobytes(encryption=fitz.PDF_ENCRYPT_AES_256, user_pw="secret", owner_pw="secret")
+    response = client.post("/convert/pdf-to-jpg", files={"file": ("locked.pdf", locked)})
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+
+def test_limits_are_enforced_and_the_report_is_complete(tmp_path, make_pdf, monkeypatch):
+    path = tmp_path / "doc.pdf"
+    doc = fitz.open()
+    doc.new_page(width=595, height=842).insert_text((72, 72), "A4")
+    doc.new_page(width=2384, height=3370).insert_text((72, 72), "A0")
+    doc.save(path)
+
+    report = preflight.check_file(str(path), "doc.pdf")
+    assert report["pages"] == 2
+    assert (report["max_page_width_pt"], report["max_page_height_pt"]) == (2384, 3370)
+    assert not report["encrypted"]
+    assert report["declared_stream_bytes"] > 0
+
+    monkeypatch.setattr(preflight, "PREFLIGHT_MAX_PAGES", 1)
+    response = client.post("/split/split-pdf", files={"file": ("doc.pdf", path.read_bytes())}, data={"pages": "1"})
+    assert response.status_code == 413
+    assert not os.listdir(os.path.join("uploads", "preflight"))
+
+def test_office_file_mentioning_a_pdf_header_is_still_sniffed_as_office():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("%PDF-1.7 attachment.txt", "")
+        archive.writestr("word/document.xml", "<document/>")
+    response = client.post("/compress/compress-pdf", files={"file": ("report.pdf", buffer.getvalue())})
+    assert response.status_code == 415
+    assert "/convert/word-to-pdf" in response.json()["detail"]
+
+def test_image_limit_applies_per_image_not_to_the_whole_scan(tmp_path, monkeypatch):
+    from PIL import Image
+
+    monkeypatch.setattr(preflight, "PREFLIGHT_MAX_IMAGE_BYTES", 1_000_000)
+    def scan(sizes):
+        doc = fitz.open()
+        for shade, (width, height) in enumerate(sizes):
+            image = io.BytesIO()
+            Image.new("RGB", (width, height), (200, 200, shade * 40)).save(image, "JPEG")
+            page = doc.new_page()
+            page.insert_image(page.rect, stream=image.getvalue())
+        path = tmp_path / f"scan{len(sizes)}.pdf"
+        doc.save(path)
+        return str(path)
+
+    # Five pages of ~480 KB each: 2.4 MB in total, every image under the limit
+    report = preflight.check_file(scan([(400, 400)] * 5), "scan.pdf")
+    assert report["images"] == 5
+    assert report["declared_image_bytes"] > 1_000_000
+    with pytest.raises(preflight.PreflightError) as error:
+        preflight.check_file(scan([(1000, 1000)]), "bomb.pdf")
+    assert error.value.status_code == 413
+
+def test_preflight_of_a_pdf_with_many_objects_stays_fast(tmp_path):
+    doc = fitz.open()
+    doc.new_page()
+    for number in range(20_000):
+        doc.update_object(doc.get_new_xref(), f"<< /N {number} >>")
+    path = tmp_path / "objects.pdf"
+    doc.save(path)
+
+    start = time.perf_counter()
+    assert preflight.check_file(str(path), "objects.pdf")["objects"] > 20_000
+    # About 6 µs per object, so well under a second here
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+
+import core.profiling
+import api.endpoints.profiles
+from main import app
+
+client = TestClient(app)
+
+def test_profiled_request_can_be_downloaded(make_pdf, monkeypatch):
+    monkeypatch.setattr(core.profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(api.endpoints.profiles, "PROFILE_TOKEN", "secret")
+
+    response = client.post(
+        "/split/split-pdf",
+        files={"file": ("doc.pdf", make_pdf(3), "application/pdf")},
+        data={"pages": "1-2"},
+        headers={"X-Profile-Token": "secret"},
+    )
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    assert client.get(f"/profiles/{profile_id}").status_code == 403
+
+    summary = client.get(f"/profiles/{profile_id}", headers={"X-Profile-Token": "secret"}).json()
+    assert summary["tracemalloc_peak_bytes"] > 0
+    assert any("pypdf" in row["function"] for row in summary["top"])
+
+    pstats_file = client.get(f"/profiles/{profile_id}/pstats", headers={"X-Profile-Token": "secret"})
+    assert pstats_file.status_code == 200
+
+def test_requests_without_token_are_not_profiled(make_pdf):
+    response = client.post("/compress/compress-pdf", files={"file": ("doc.pdf", make_pdf(1), "application/pdf")})
+    assert "x-profile-id" not in response.headers
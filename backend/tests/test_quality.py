@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+
+import core.quality
+from core.quality import QualityPolicy
+from main import app
+
+client = TestClient(app)
+
+def test_policy_degrades_under_load_and_recovers_with_hysteresis(monkeypatch):
+    monkeypatch.setattr(core.quality, "QUALITY_ADAPTIVE", True)
+    monkeypatch.setattr(core.quality, "SAMPLE_INTERVAL", 0)
+    load = [0.2]
+    policy = QualityPolicy(load=lambda: load[0])
+
+    tiers = []
+    for value in (0.2, 0.8, 1.3, 0.9, 0.7, 0.5, 0.2):
+        load[0] = value
+        tiers.append(policy.current().name)
+    assert tiers == ["full", "reduced", "minimal", "minimal", "reduced", "full", "full"]
+
+def test_render_responses_carry_the_tier(make_pdf, monkeypatch):
+    monkeypatch.setattr(core.quality, "_policy", QualityPolicy(load=lambda: 5.0))
+    monkeypatch.setattr(core.quality, "QUALITY_ADAPTIVE", True)
+    response = client.post("/convert/pdf-to-jpg", files={"file": ("tier.pdf", make_pdf(1), "application/pdf")})
+    assert response.status_code == 200
+    assert response.headers["x-quality-tier"] == "minimal"
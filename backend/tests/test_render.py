@@ -0,0 +1,27 @@
+import fitz
+import numpy as np
+
+from core.render import capped_zoom, render_rgb
+
+def _drawing(width, height):
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    page.draw_rect(fitz.Rect(10, 10, width - 10, height - 10), color=(1, 0, 0), width=3)
+    page.insert_text((40, 80), "Planta baixa", fontsize=40)
+    return doc, page
+
+def test_oversized_pages_are_capped_to_the_pixel_budget():
+    doc, page = _drawing(14400, 2000)  # a 200 x 28 inch banner
+    image = render_rgb(page, 3.0, max_pixels=2_000_000, band_pixels=250_000)
+    assert image.size[0] * image.size[1] <= 2_000_000 * 1.01
+    assert capped_zoom(page.rect, 3.0, 2_000_000) < 3.0
+    doc.close()
+
+def test_banded_render_matches_a_single_pixmap():
+    doc, page = _drawing(600, 800)
+    whole = np.asarray(render_rgb(page, 2.0))
+    banded = np.asarray(render_rgb(page, 2.0, band_pixels=50_000))
+    assert whole.shape == banded.shape == (1600, 1200, 3)
+    # Only anti-aliased pixels on band edges may differ
+    assert (whole != banded).any(axis=2).mean() < 0.01
+    doc.close()
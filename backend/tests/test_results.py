@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+from main import app
+
+import core.results
+
+client = TestClient(app)
+
+def test_result_is_retained_with_etag_and_range(make_pdf):
+    response = client.post("/compress/compress-pdf", files={"file": ("doc.pdf", make_pdf(2), "application/pdf")})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    url = response.headers["x-result-url"]
+
+    again = client.get(url, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+    partial = client.get(url, headers={"Range": "bytes=0-9"})
+    assert partial.status_code == 206
+    assert partial.content == response.content[:10]
+    assert partial.headers["etag"] == etag
+
+def test_unknown_result_is_404():
+    assert client.get("/results/" + "0" * 32).status_code == 404
+
+def test_expired_results_are_swept_at_most_once_per_interval(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(core.results, "purge_expired_results", lambda: calls.append(1))
+    monkeypatch.setattr(core.results, "_last_purge", None)
+    for index in range(3):
+        path = tmp_path / f"out{index}.pdf"
+        path.write_bytes(b"%PDF-1.7")
+        core.results.retain_result(str(path), "application/pdf", path.name)
+    assert len(calls) == 1
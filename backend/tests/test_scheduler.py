@@ -0,0 +1,89 @@
+import asyncio
+
+import core.scheduler
+from core.preflight import check_file
+from core.scheduler import CostModel, Estimate, PoolScheduler, features_from_preflight, read_features
+
+def _scheduler(tmp_path, aging=0.0):
+    order = []
+
+    async def runner(func, name):
+        order.append(name)
+        await asyncio.sleep(0.1 if name == "busy" else 0.01)
+
+    model = CostModel(str(tmp_path / "timings.jsonl"))
+    return PoolScheduler(capacity=1, aging=aging, runner=runner, model=model), order
+
+def _estimate(seconds):
+    return Estimate("compress-pdf", {"pages": 1, "mib": 0.1, "images": 0}, seconds)
+
+def test_shortest_expected_job_runs_first(tmp_path):
+    scheduler, order = _scheduler(tmp_path)
+
+    async def scenario():
+        # "busy" holds the only slot while the others queue up
+        await asyncio.gather(*(
+            scheduler.run(_estimate(seconds), None, name)
+            for name, seconds in [("busy", 1), ("long", 90), ("short", 0.05), ("medium", 3)]
+        ))
+
+    asyncio.run(scenario())
+    assert order == ["busy", "short", "medium", "long"]
+    assert len(open(tmp_path / "timings.jsonl").readlines()) == 4
+
+def test_failed_runs_are_not_recorded(tmp_path):
+    async def runner(func, name):
+        if name == "fails":
+            raise RuntimeError("damaged input")
+
+    model = CostModel(str(tmp_path / "timings.jsonl"))
+    scheduler = PoolScheduler(capacity=1, runner=runner, model=model)
+
+    async def scenario():
+        await scheduler.run(_estimate(1), None, "works")
+        try:
+            await scheduler.run(_estimate(1), None, "fails")
+        except RuntimeError:
+            pass
+
+    asyncio.run(scenario())
+    assert len(open(tmp_path / "timings.jsonl").readlines()) == 1
+    assert scheduler.running == 0
+
+def test_aging_lets_a_long_wait_overtake_new_short_jobs(tmp_path):
+    # 1000 s of credit per second waited: 50 ms in the queue outweighs 20 s of expected work
+    scheduler, order = _scheduler(tmp_path, aging=1000.0)
+
+    async def scenario():
+        busy = asyncio.ensure_future(scheduler.run(_estimate(1), None, "busy"))
+        await asyncio.sleep(0)
+        old = asyncio.ensure_future(scheduler.run(_estimate(20), None, "old"))
+        await asyncio.sleep(0.05)
+        new = asyncio.ensure_future(scheduler.run(_estimate(0.5), None, "new"))
+        await asyncio.gather(busy, old, new)
+
+    asyncio.run(scenario())
+    assert order == ["busy", "old", "new"]
+
+def test_cost_model_fits_recorded_timings(tmp_path, make_pdf):
+    model = CostModel(str(tmp_path / "timings.jsonl"))
+    samples = [
+        {"pages": pages, "mib": pages * 0.2, "images": 0, "seconds": 0.1 + 0.3 * pages}
+        for pages in range(1, 20)
+    ]
+    model.fit({"pdf-to-word": samples})
+    assert abs(model.predict("pdf-to-word", {"pages": 100, "mib": 20, "images": 0}) - 30.1) < 0.5
+
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(make_pdf(3))
+    assert read_features(str(path))["pages"] == 3
+    assert features_from_preflight(check_file(str(path), "doc.pdf")) == read_features(str(path))
+
+def test_timing_history_is_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.scheduler, "SCHEDULER_HISTORY", 10)
+    model = CostModel(str(tmp_path / "timings.jsonl"))
+    for seconds in range(50):
+        model.record("split-pdf", {"pages": 1, "mib": 0.1, "images": 0}, seconds)
+    samples = model._load_history()
+    assert [row["seconds"] for row in samples["split-pdf"]] == list(range(40, 50))
+    assert len(open(tmp_path / "timings.jsonl").readlines()) == 10
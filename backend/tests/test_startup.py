@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use by the tools (or through PRELOAD_MODULES), never by `import main`
+HEAVY_MODULES = (
+    "fitz", "pymupdf", "pypdf", "pikepdf", "pdf2docx", "cv2", "docx", "pptx",
+    "openpyxl", "reportlab", "tabula", "pandas", "numpy",
+)
+
+# Seconds `import main` may add on top of importing FastAPI itself (about 0.75 s
+# when every router imported its libraries eagerly)
+IMPORT_BUDGET = float(os.getenv("IMPORT_BUDGET_SECONDS", "0.4"))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import fastapi
+framework = time.perf_counter()
+import main
+done = time.perf_counter()
+print(json.dumps({"app": done - framework, "modules": sorted(m.split(".")[0] for m in sys.modules)}))
+"""
+
+def _import_main():
+    env = dict(os.environ, PRELOAD_MODULES="")
+    output = subprocess.run([sys.executable, "-c", _PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+def test_heavy_libraries_are_not_imported_at_startup():
+    loaded = set(_import_main()["modules"])
+    assert not loaded & set(HEAVY_MODULES)
+
+def test_app_import_time_stays_within_budget():
+    # The best of three runs, so a busy machine does not fail the test
+    seconds = min(_import_main()["app"] for _ in range(3))
+    assert seconds < IMPORT_BUDGET, f"import main took {seconds:.2f}s over FastAPI's own import"
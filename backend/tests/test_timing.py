@@ -0,0 +1,20 @@
+import json
+import logging
+
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_server_timing_and_request_log(make_pdf, caplog):
+    with caplog.at_level(logging.INFO, logger="pdftools.request"):
+        response = client.post("/compress/compress-pdf", files={"file": ("doc.pdf", make_pdf(2), "application/pdf")})
+    assert response.status_code == 200
+
+    stages = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+    assert {"save", "parse", "render", "encode", "write", "total"} <= set(stages)
+
+    record = next(r for r in caplog.records if r.name == "pdftools.request" and r.fields["path"] == "/compress/compress-pdf")
+    assert record.fields["request_id"] == response.headers["x-request-id"]
+    assert "respond" in record.fields["stages_ms"]
+    json.dumps(record.fields)
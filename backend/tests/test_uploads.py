@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+from main import app
+import hashlib
+
+import api.endpoints.uploads
+
+client = TestClient(app)
+
+def test_resumable_upload_can_replace_multipart_file(make_pdf):
+    pdf = make_pdf(3)
+    response = client.post("/uploads", json={
+        "filename": "scan.pdf",
+        "size": len(pdf),
+        "sha256": hashlib.sha256(pdf).hexdigest(),
+    })
+    assert response.status_code == 201
+    upload_id = response.json()["upload_id"]
+
+    # Send the second half first, as a client resuming after a failure might
+    half = len(pdf) // 2
+    for offset, chunk in ((half, pdf[half:]), (0, pdf[:half])):
+        response = client.put(f"/uploads/{upload_id}", params={"offset": offset}, content=chunk,
+                              headers={"X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()})
+        assert response.status_code == 200
+
+    assert client.get(f"/uploads/{upload_id}").json()["received"] == [[0, len(pdf)]]
+    assert client.post(f"/uploads/{upload_id}/finalize").json()["status"] == "complete"
+
+    response = client.post("/split/split-pdf", data={"upload_id": upload_id, "pages": "2"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+
+def test_finalize_rejects_incomplete_upload():
+    response = client.post("/uploads", json={"filename": "scan.pdf", "size": 10})
+    upload_id = response.json()["upload_id"]
+    client.put(f"/uploads/{upload_id}", params={"offset": 0}, content=b"12345")
+
+    response = client.post(f"/uploads/{upload_id}/finalize")
+    assert response.status_code == 422
+
+def test_oversized_chunks_are_refused(monkeypatch):
+    monkeypatch.setattr(api.endpoints.uploads, "CHUNKED_UPLOAD_MAX_CHUNK_BYTES", 8)
+    upload_id = client.post("/uploads", json={"filename": "scan.pdf", "size": 12}).json()["upload_id"]
+    assert client.put(f"/uploads/{upload_id}", params={"offset": 0}, content=b"x" * 9).status_code == 413
+    assert client.put(f"/uploads/{upload_id}", params={"offset": 6}, content=b"x" * 8).status_code == 416
+
+    # Without a Content-Length the body is cut off once it passes the limit
+    response = client.put(f"/uploads/{upload_id}", params={"offset": 0}, content=iter([b"x" * 5, b"x" * 5]))
+    assert response.status_code == 413
+    assert client.get(f"/uploads/{upload_id}").json()["received_bytes"] == 0